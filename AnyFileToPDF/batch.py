@@ -0,0 +1,313 @@
+import os
+import json
+import time
+import logging
+import shutil
+import tempfile
+from utils import IMAGE_EXTENSIONS, natural_sort_key, hash_file
+from office_backend import is_legacy_office, start_office_manager
+from worker_pool import SupervisedPool, FILE_TIMEOUT, FILE_MEMORY_MB
+from discovery import FileIndex
+from telemetry import RunTelemetry, PROFILE_DIR
+
+
+def convert_task(converter, task, cache=None, hash_input=False):
+    """转换单个任务，返回 (相对路径, 状态, 错误信息, 转换信息)
+    
+    传入 cache 时先在转换缓存中查找内容相同的文件，命中则直接复制缓存的PDF（状态为 cached），
+    未命中时转换成功后写入缓存；转换信息的 cache 字段为 hit 或 miss。
+    传入 cache 或 hash_input 为True时转换信息的 hash 字段为输入文件的内容哈希，供转换清单使用。
+    内容哈希在执行任务的进程中计算，多进程转换时不占用主进程。
+    """
+    input_path, output_path, rel_path = task
+    key = None
+    content_hash = None
+    # 相册任务以目录为输入，没有内容哈希
+    if (cache is not None or hash_input) and not os.path.isdir(input_path):
+        try:
+            content_hash = hash_file(input_path)
+            if cache is not None:
+                key = cache.key(input_path, converter.cache_signature(input_path), content_hash)
+                if cache.fetch(key, output_path):
+                    return rel_path, 'cached', None, {'cache': 'hit', 'hash': content_hash}
+        except OSError as e:
+            logging.getLogger(__name__).warning(f"读取转换缓存失败 {rel_path}: {str(e)}")
+    try:
+        status = converter.convert_file(input_path, output_path)
+    except Exception as e:
+        status, error = 'error', str(e)
+    else:
+        error = None
+        if key is not None and status in ('converted', 'text'):
+            try:
+                cache.store(key, output_path)
+            except OSError as e:
+                logging.getLogger(__name__).warning(f"写入转换缓存失败 {rel_path}: {str(e)}")
+    info = converter.file_info
+    if key is not None:
+        info['cache'] = 'miss'
+    if content_hash is not None:
+        info['hash'] = content_hash
+    return rel_path, status, error, info
+
+
+# 转换报告（统计信息和失败文件列表）保存在 outputsPDF 目录中
+REPORT_NAME = 'conversion_report.json'
+# 相册模式下每个目录中的图片合并输出的文件名
+ALBUM_NAME = 'album'
+
+
+def collect_folder_tasks(folder_path, output_dir, album=False, index=None):
+    """遍历文件夹生成转换任务，跳过 outputsPDF 目录和PDF文件
+    
+    album 为True时每个目录中的图片不单独转换，而是生成一个以该目录为输入的相册任务，
+    输出为该目录对应的 album.pdf。传入已扫描的 index（FileIndex）时直接使用其中的目录列表，
+    否则先扫描文件夹。
+    """
+    if index is None:
+        index = FileIndex([folder_path])
+        index.scan()
+    tasks = []
+    # 目录和文件已按自然顺序排列，任务顺序（以及合并PDF中的顺序）稳定
+    for root, listing in index.walk(folder_path):
+        files = list(listing.files)
+        
+        if album and any(os.path.splitext(file)[1].lower() in IMAGE_EXTENSIONS for file in files):
+            rel_path = os.path.normpath(os.path.join(os.path.relpath(root, folder_path), ALBUM_NAME))
+            tasks.append((root, os.path.join(output_dir, rel_path + '.pdf'), rel_path))
+            files = [file for file in files if os.path.splitext(file)[1].lower() not in IMAGE_EXTENSIONS]
+            
+        for file in files:
+            if not file.endswith('.pdf'):  # 排除PDF文件
+                file_path = os.path.join(root, file)
+                # 创建相对路径保持目录结构
+                rel_path = os.path.relpath(file_path, folder_path)
+                output_path = os.path.join(output_dir, rel_path + '.pdf')
+                tasks.append((file_path, output_path, rel_path))
+    return tasks
+
+
+def default_worker_count():
+    """默认工作进程数：CPU核心数"""
+    return os.cpu_count() or 1
+
+
+def format_info(info):
+    """将转换信息格式化为日志后缀"""
+    parts = []
+    if 'encoding' in info:
+        parts.append(f"编码 {info['encoding']}，检测耗时 {info['detect_ms']}ms")
+    if info.get('pages'):
+        parts.append(f"{info['pages']}页，{info['output_bytes'] / info['pages'] / 1024:.1f}KB/页")
+    return f" [{'，'.join(parts)}]" if parts else ''
+
+
+# 按文件大小估计进度时，每个文件额外计入的固定开销（字节），使大量小文件也能推进进度
+PROGRESS_FILE_BYTES = 64 * 1024
+
+# 增量转换时每隔多少秒保存一次转换清单，中断或崩溃时已完成的文件不必重新转换
+MANIFEST_SAVE_SECONDS = 30
+
+# 看门狗终止转换的原因
+FAILURE_REASONS = {
+    'timeout': '转换超时',
+    'memory': '内存占用超过上限',
+    'crashed': '工作进程异常退出',
+}
+
+
+def format_result(rel_path, status, error, info, done, total):
+    """生成单个文件的日志消息"""
+    suffix = format_info(info)
+    if status == 'converted':
+        return f"成功转换 ({done}/{total}): {rel_path}{suffix}"
+    if status == 'cached':
+        return f"从缓存复制 ({done}/{total}): {rel_path}"
+    if status == 'text':
+        return f"成功转换为文本 ({done}/{total}): {rel_path}{suffix}"
+    if status == 'failed':
+        return f"转换失败 ({done}/{total}): {rel_path}{suffix}"
+    if status == 'unconvertible':
+        return f"无法转换文件 ({done}/{total}): {rel_path}{suffix}"
+    if status in FAILURE_REASONS:
+        return f"{FAILURE_REASONS[status]}，已终止 ({done}/{total}): {rel_path} - {error}"
+    return f"处理文件失败 ({done}/{total}): {rel_path} - {error}"
+
+
+def write_report(report_path, summary):
+    """将转换统计信息和失败文件列表写入JSON文件"""
+    report = dict(summary, generated=time.strftime('%Y-%m-%dT%H:%M:%S'))
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def run_batch(converter, tasks, log_callback, progress_callback, max_workers=None,
+              manifest=None, cache=None, bundle=None, time_limit=FILE_TIMEOUT,
+              memory_limit_mb=FILE_MEMORY_MB, report_path=None, size_of=None):
+    """批量转换文件
+    
+    tasks 为 (输入路径, 输出路径, 相对路径) 列表。max_workers 大于1时
+    将任务分发到进程池，结果按完成顺序回报给 log_callback/progress_callback；
+    转换器的 cancel_flag 被置位后，收集已完成的结果并终止所有工作进程。
+    传入 manifest 时启用增量转换：跳过未变化的文件并清理已删除源文件的PDF，
+    清单每隔 MANIFEST_SAVE_SECONDS 秒以及转换结束（包括取消和出错）时保存。
+    传入 cache 时先在转换缓存中查找内容相同的文件，命中则直接复制缓存的PDF；
+    缓存的查找和写入在转换该文件的进程中进行（见 convert_task）。
+    传入 bundle 时将转换结果追加到合并PDF（任务应先经过 bundle.stage 处理）。
+    time_limit 和 memory_limit_mb 为单个文件的基础转换时间（秒，输入每MB另加 FILE_TIMEOUT_PER_MB 秒）
+    和工作进程内存（MB）上限，超过时终止该工作进程并将文件记为失败，为0时不限制；
+    两者都为0且 max_workers 为1时在当前进程中转换。
+    传入 report_path 时将统计信息和失败文件列表写入该JSON文件。
+    转换结束时汇总每个文件的总耗时、各阶段耗时、输入输出字节数和页数（summary['telemetry']），
+    并列出最慢的文件；转换器启用 profile 时最慢文件的 cProfile 结果保存在报告旁的 profiles 目录中。
+    传入 size_of（输入路径 -> 字节数，如 FileIndex.size_of）时按文件大小估计进度，否则按文件数；
+    在工作进程中转换时还按文件从大到小分发任务，耗时长的文件先开始，减少最后只剩少数进程工作的时间。
+    结果的顺序与分发顺序无关，合并PDF仍按任务原来的顺序追加。
+    返回包含统计信息的字典。
+    """
+    logger = logging.getLogger(__name__)
+    summary = {'total': len(tasks), 'converted': 0, 'failed': 0, 'skipped': 0,
+               'pruned': 0, 'cache_hits': 0, 'cache_misses': 0, 'bundles': [],
+               'cancelled': False, 'failures': []}
+               
+    if manifest is not None:
+        summary['pruned'] = manifest.prune()
+        if summary['pruned']:
+            log_callback(f"已删除 {summary['pruned']} 个源文件不存在的PDF")
+        tasks, summary['skipped'] = manifest.filter_tasks(tasks)
+        if summary['skipped']:
+            log_callback(f"跳过 {summary['skipped']} 个未修改的文件")
+            
+    total = len(tasks)
+    if total == 0:
+        # 仍然写入转换报告和合并PDF，不保留上次转换的报告
+        if manifest is not None:
+            log_callback("所有文件均已是最新，无需转换")
+        progress_callback(100)
+    tasks_by_rel_path = {task[2]: task for task in tasks}
+    # 每个任务在进度中的权重：文件大小加上固定的单个文件开销
+    weights = {task[2]: (size_of(task[0]) if size_of else 0) + PROGRESS_FILE_BYTES for task in tasks}
+    total_weight = sum(weights.values())
+    done_weight = 0
+    telemetry = RunTelemetry()
+    
+    done = 0
+    manifest_saved = time.monotonic()
+    
+    def save_manifest():
+        nonlocal manifest_saved
+        manifest_saved = time.monotonic()
+        try:
+            manifest.save()
+        except OSError as e:
+            logger.warning(f"保存转换清单失败: {str(e)}")
+            
+    def report(result):
+        nonlocal done, done_weight
+        rel_path, status, error, info = result
+        done += 1
+        done_weight += weights[rel_path]
+        succeeded = status in ('converted', 'text', 'cached')
+        if info.get('cache') == 'hit':
+            summary['cache_hits'] += 1
+        elif info.get('cache') == 'miss':
+            summary['cache_misses'] += 1
+        if succeeded:
+            summary['converted'] += 1
+            if manifest is not None:
+                try:
+                    manifest.record(*tasks_by_rel_path[rel_path], content_hash=info.get('hash'))
+                except OSError as e:
+                    logger.warning(f"记录转换清单失败 {rel_path}: {str(e)}")
+                if time.monotonic() - manifest_saved >= MANIFEST_SAVE_SECONDS:
+                    save_manifest()
+        else:
+            summary['failed'] += 1
+            summary['failures'].append({'path': rel_path, 'status': status, 'error': error})
+        if bundle is not None:
+            bundle.add(rel_path, tasks_by_rel_path[rel_path][1] if succeeded else None)
+        telemetry.add(rel_path, status, info)
+        log_callback(format_result(rel_path, status, error, info, done, total))
+        progress_callback((done_weight / total_weight) * 100)
+        
+    workers = max_workers or default_worker_count()
+    workers = max(1, min(workers, len(tasks)))
+    
+    # 两者都不限制且只有一个工作进程（或没有需要转换的文件）时在当前进程中转换
+    in_process = total == 0 or (workers == 1 and not (time_limit or memory_limit_mb))
+    
+    # 每个进程的性能分析结果先写入临时目录，转换结束后只保留全部文件中最慢的几个
+    profile_dir = None
+    if converter.profile:
+        profile_dir = converter.profile_dir = tempfile.mkdtemp(prefix='anyfiletopdf_profile_')
+        
+    # 旧版Office文件由常驻的 LibreOffice 辅助进程转换，在工作进程中转换时进程池运行在管理进程中，
+    # 由所有工作进程共享，工作进程被终止后辅助进程仍可复用；批量转换结束后关闭
+    own_office_pool = converter.office_pool is None and any(is_legacy_office(task[0]) for task in tasks)
+    office_manager = None
+    if own_office_pool and not in_process:
+        office_manager = start_office_manager()
+        converter.office_pool = office_manager.OfficePool(converter.office_workers, converter.office_timeout)
+        
+    try:
+        if in_process:
+            # 单进程模式：直接使用当前转换器
+            for task in tasks:
+                if converter.cancel_flag:
+                    summary['cancelled'] = True
+                    break
+                report(convert_task(converter, task, cache, manifest is not None))
+        else:
+            logger.info(f"使用 {workers} 个工作进程进行转换")
+            if size_of is not None:
+                # 大文件优先分发
+                tasks = sorted(tasks, key=lambda task: weights[task[2]], reverse=True)
+            # 每个文件在工作进程中转换，超时、内存超限或崩溃时终止该进程并继续转换其余文件
+            pool = SupervisedPool(workers, converter.worker_options(), time_limit, memory_limit_mb, size_of, cache,
+                                  hash_inputs=manifest is not None)
+            try:
+                for result in pool.run(tasks, lambda: converter.cancel_flag):
+                    report(result)
+                summary['cancelled'] = converter.cancel_flag and done < total
+            finally:
+                # 取消或出错时仍有未完成的任务，直接终止工作进程
+                pool.close(terminate=done < total)
+    finally:
+        if manifest is not None:
+            save_manifest()
+        if own_office_pool:
+            converter.close_office_pool()
+        if office_manager is not None:
+            office_manager.shutdown()
+        if profile_dir is not None:
+            converter.profile_dir = None
+            try:
+                if report_path:
+                    telemetry.collect_profiles(os.path.join(os.path.dirname(report_path), PROFILE_DIR))
+            except OSError as e:
+                logger.warning(f"保存性能分析结果失败: {str(e)}")
+            finally:
+                shutil.rmtree(profile_dir, ignore_errors=True)
+                
+    if bundle is not None:
+        summary['bundles'] = bundle.close()
+        for path in summary['bundles']:
+            log_callback(f"已生成合并PDF: {path}")
+    if summary['cancelled']:
+        log_callback("转换已取消！")
+    if cache is not None:
+        log_callback(f"转换缓存：命中 {summary['cache_hits']} 个，未命中 {summary['cache_misses']} 个")
+    summary['telemetry'] = telemetry.summary()
+    for line in telemetry.format_lines():
+        log_callback(line)
+    if summary['failures']:
+        log_callback(f"转换失败的文件（{len(summary['failures'])} 个）：")
+        for failure in summary['failures']:
+            log_callback(f"  {failure['path']}: {FAILURE_REASONS.get(failure['status'], failure['error'] or '转换失败')}")
+    if report_path:
+        try:
+            write_report(report_path, summary)
+        except OSError as e:
+            logger.warning(f"写入转换报告失败: {str(e)}")
+    log_callback(f"\n转换完成！共转换 {summary['converted']}/{total} 个文件")
+    return summary
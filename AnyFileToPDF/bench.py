@@ -0,0 +1,789 @@
+"""AnyFileToPDF 性能基准测试
+
+用法:
+    python bench.py text-rss --sizes 100,1024,5120
+    python bench.py clean-text
+    python bench.py fast-text
+    python bench.py xlsx --rows 500000
+    python bench.py sheets --sheets 30
+    python bench.py docx --pages 2000
+    python bench.py slides --slides 300
+    python bench.py office --count 50
+    python bench.py startup
+    python bench.py fonts --font C:/Windows/Fonts/msyh.ttf
+    python bench.py size --font C:/Windows/Fonts/msyh.ttf --baseline size.json
+    python bench.py images --count 8
+    python bench.py album --count 300
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import random
+import re
+import logging
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.join(tempfile.gettempdir(), 'anyfiletopdf_bench')
+
+
+def peak_rss_mb():
+    """当前进程的峰值内存（MB），不支持的平台返回None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位，Linux 以KB为单位
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def make_text_file(size_mb):
+    """生成指定大小的中英文混合日志文件"""
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    path = os.path.join(BENCH_DIR, f'text_{size_mb}MB.log')
+    target = size_mb * 1024 * 1024
+    if os.path.exists(path) and os.path.getsize(path) >= target:
+        return path
+    line = '2024-12-22 10:00:00 INFO 转换任务已完成 conversion finished without errors\n'
+    block = (line * 1000).encode('utf-8')
+    with open(path, 'wb') as f:
+        written = 0
+        while written < target:
+            f.write(block)
+            written += len(block)
+    return path
+
+
+def child_convert_text(input_path):
+    """在子进程中转换文本文件并输出耗时和峰值内存"""
+    logging.disable(logging.CRITICAL)
+    from converter import PDFConverter
+    converter = PDFConverter()
+    output_path = os.path.join(BENCH_DIR, os.path.basename(input_path) + '.pdf')
+    start = time.perf_counter()
+    ok = converter.convert_text(input_path, output_path)
+    print(json.dumps({
+        'ok': ok,
+        'seconds': round(time.perf_counter() - start, 2),
+        'peak_rss_mb': peak_rss_mb(),
+    }))
+
+
+def bench_text_rss(args):
+    """不同大小文本文件转换时的峰值内存"""
+    print(f"{'输入大小':>10} {'耗时(秒)':>10} {'峰值内存(MB)':>14}")
+    for size_mb in [int(s) for s in args.sizes.split(',')]:
+        path = make_text_file(size_mb)
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '_child-text', path],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        print(f"{str(size_mb) + 'MB':>10} {result['seconds']:>10} {result['peak_rss_mb']:>14.1f}")
+
+
+def make_xlsx_file(rows):
+    """生成指定行数的单工作表XLSX文件（只写模式，内存占用恒定）"""
+    from openpyxl import Workbook
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    path = os.path.join(BENCH_DIR, f'sheet_{rows}.xlsx')
+    if os.path.exists(path):
+        return path
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('数据')
+    ws.append(['序号', '日期', '名称', '数量', '单价', '备注'])
+    for i in range(rows):
+        ws.append([i, f'2024-12-{i % 28 + 1:02d}', f'商品{i % 997}', i % 50, round(i * 0.37, 2), 'note'])
+    wb.save(path)
+    return path
+
+
+def child_convert_xlsx(input_path):
+    """在子进程中转换XLSX文件并输出耗时、峰值内存和分卷数"""
+    logging.disable(logging.CRITICAL)
+    from converter import PDFConverter
+    converter = PDFConverter()
+    output_path = os.path.join(BENCH_DIR, os.path.basename(input_path) + '.pdf')
+    start = time.perf_counter()
+    ok = converter.convert_xlsx(input_path, output_path)
+    base, ext = os.path.splitext(output_path)
+    volumes = 1
+    while os.path.exists(f"{base}.part{volumes + 1}{ext}"):
+        volumes += 1
+    print(json.dumps({
+        'ok': ok,
+        'seconds': round(time.perf_counter() - start, 2),
+        'peak_rss_mb': peak_rss_mb(),
+        'volumes': volumes,
+    }))
+
+
+def bench_xlsx(args):
+    """大型XLSX文件转换的耗时和峰值内存"""
+    print(f"{'行数':>10} {'耗时(秒)':>10} {'峰值内存(MB)':>14} {'分卷数':>8}")
+    for rows in [int(r) for r in args.rows.split(',')]:
+        path = make_xlsx_file(rows)
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '_child-xlsx', path],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        print(f"{rows:>10} {result['seconds']:>10} {result['peak_rss_mb']:>14.1f} {result['volumes']:>8}")
+
+
+def make_workbook(sheets, rows):
+    """生成多工作表、包含中英文和长文本单元格的XLSX文件"""
+    from openpyxl import Workbook
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    path = os.path.join(BENCH_DIR, f'workbook_{sheets}x{rows}.xlsx')
+    if os.path.exists(path):
+        return path
+    wb = Workbook(write_only=True)
+    for s in range(sheets):
+        ws = wb.create_sheet(f'部门{s + 1}')
+        ws.append(['序号', '日期', '客户', '地址', '数量', '单价', '金额', '状态', '负责人', '备注'])
+        for i in range(rows):
+            ws.append([i, f'2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}', f'客户{(i * 7 + s) % 991} Co., Ltd.',
+                       f'上海市浦东新区世纪大道{i % 300}号{i % 40}楼', i % 50, round(i * 0.37, 2),
+                       round(i % 50 * i * 0.37, 2), ('已完成', '处理中', 'pending')[i % 3], f'员工{i % 37}',
+                       '需要跟进' * (i % 5) if i % 11 else '这是一条较长的备注内容，用于检查单元格按列宽折行' * 3])
+    wb.save(path)
+    return path
+
+
+def legacy_convert_xlsx(converter, input_path, output_path):
+    """重写前的工作表排版：所有工作表依次写入同一个文档，Table 逐个测量单元格确定列宽"""
+    from openpyxl import load_workbook
+    from reportlab.platypus import Paragraph, Spacer, Table, TableStyle
+    from reportlab.lib import colors
+    table_style = TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), converter.default_font),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e6e6e6')),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ])
+    wb = load_workbook(input_path, read_only=True)
+
+    def flowables():
+        for sheet in wb.worksheets:
+            yield Paragraph(sheet.title, converter.styles['Heading1'])
+            rows = [['' if v is None else str(v) for v in row] for row in sheet.iter_rows(values_only=True)]
+            header = rows[0]
+            for start in range(1, len(rows), 200):
+                table = Table([header] + rows[start:start + 200], repeatRows=1)
+                table.setStyle(table_style)
+                yield table
+                yield Spacer(1, 12)
+
+    try:
+        converter.build_volumes(output_path, flowables())
+    finally:
+        wb.close()
+
+
+def bench_sheets(args):
+    """多工作表XLSX：重写前的排版、预先计算列宽后逐个排版和并行排版的耗时对比"""
+    logging.disable(logging.CRITICAL)
+    from converter import PDFConverter
+    from utils import count_pdf_pages
+    path = make_workbook(args.sheets, args.rows)
+    output_dir = os.path.join(BENCH_DIR, 'sheets_output')
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"{args.sheets} 个工作表 x {args.rows} 行，{os.path.getsize(path) / 1024 / 1024:.1f}MB")
+    print(f"{'方式':>14} {'耗时(秒)':>10} {'页数':>8}")
+    serial = PDFConverter(sheet_workers=1)
+    modes = [('重写前', lambda i, o: legacy_convert_xlsx(serial, i, o)),
+             ('预算列宽', serial.convert_xlsx)]
+    for workers in [int(w) for w in args.workers.split(',')]:
+        modes.append((f'并行 {workers} 进程', PDFConverter(sheet_workers=workers).convert_xlsx))
+    for name, func in modes:
+        output_path = os.path.join(output_dir, f'{name}.pdf')
+        start = time.perf_counter()
+        func(path, output_path)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>14} {elapsed:>10.2f} {count_pdf_pages(output_path):>8}")
+
+
+def make_contract(pages):
+    """生成约指定页数的合同样式DOCX：编号条款段落中穿插表格"""
+    from docx import Document
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    path = os.path.join(BENCH_DIR, f'contract_{pages}.docx')
+    if os.path.exists(path):
+        return path
+    doc = Document()
+    clause = '甲方应按照本合同约定的期限和方式向乙方支付款项，乙方应在收到款项后五个工作日内开具等额发票。'
+    # 每页约8个条款，每5页一个付款计划表
+    for page in range(pages):
+        for i in range(8):
+            doc.add_paragraph(f'第{page * 8 + i + 1}条 {clause * 2}')
+        if page % 5 == 4:
+            table = doc.add_table(rows=6, cols=4)
+            for r, row in enumerate(table.rows):
+                for c, cell in enumerate(row.cells):
+                    cell.text = '期次' if r == 0 else f'{page}-{r}-{c} 金额 {r * 1000 + c}.00 元'
+    doc.save(path)
+    return path
+
+
+def legacy_convert_docx(converter, input_path, output_path):
+    """重写前的 convert_docx：载入完整的文档对象模型，先输出所有段落再输出所有表格"""
+    from docx import Document
+    from reportlab.platypus import Paragraph, Spacer, Table, TableStyle
+    from reportlab.lib import colors
+    import html
+    doc = Document(input_path)
+    story = []
+    for paragraph in doc.paragraphs:
+        if paragraph.text.strip():
+            story.append(Paragraph(html.escape(paragraph.text), converter.styles['Custom']))
+            story.append(Spacer(1, 6))
+    for table in doc.tables:
+        data = [[html.escape(cell.text.strip()) for cell in row.cells] for row in table.rows]
+        pdf_table = Table(data)
+        pdf_table.setStyle(TableStyle([('GRID', (0, 0), (-1, -1), 1, colors.black)]))
+        story.append(pdf_table)
+        story.append(Spacer(1, 12))
+    converter.create_document(output_path).build(story)
+
+
+def child_convert_docx(mode, input_path):
+    """在子进程中转换DOCX文件并输出耗时、峰值内存和页数"""
+    logging.disable(logging.CRITICAL)
+    from converter import PDFConverter
+    from utils import count_pdf_pages
+    converter = PDFConverter()
+    output_path = os.path.join(BENCH_DIR, f'{os.path.basename(input_path)}.{mode}.pdf')
+    start = time.perf_counter()
+    if mode == 'legacy':
+        legacy_convert_docx(converter, input_path, output_path)
+    else:
+        converter.convert_docx(input_path, output_path)
+    print(json.dumps({
+        'seconds': round(time.perf_counter() - start, 2),
+        'peak_rss_mb': peak_rss_mb(),
+        'pages': count_pdf_pages(output_path),
+    }))
+
+
+def bench_docx(args):
+    """长篇DOCX：重写前的对象模型实现与按文档顺序流式读取的耗时和峰值内存"""
+    path = make_contract(args.pages)
+    print(f"{os.path.basename(path)}，{os.path.getsize(path) / 1024 / 1024:.1f}MB")
+    print(f"{'方式':>10} {'耗时(秒)':>10} {'峰值内存(MB)':>14} {'页数':>8}")
+    for mode, name in (('legacy', '重写前'), ('stream', '流式')):
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '_child-docx', mode, path],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        print(f"{name:>10} {result['seconds']:>10} {result['peak_rss_mb']:>14.1f} {result['pages']:>8}")
+
+
+def make_deck(slides):
+    """生成每页都带有同一徽标的PPTX"""
+    from PIL import Image, ImageDraw
+    from pptx import Presentation
+    from pptx.util import Inches
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    path = os.path.join(BENCH_DIR, f'deck_{slides}.pptx')
+    if os.path.exists(path):
+        return path
+    logo_path = os.path.join(BENCH_DIR, 'logo.png')
+    logo = Image.new('RGBA', (1600, 800), (0, 0, 0, 0))
+    ImageDraw.Draw(logo).ellipse((100, 100, 1500, 700), fill=(200, 30, 30, 255))
+    logo.save(logo_path)
+    prs = Presentation()
+    for i in range(slides):
+        slide = prs.slides.add_slide(prs.slide_layouts[5])
+        slide.shapes.title.text = f'第 {i + 1} 页'
+        slide.shapes.add_picture(logo_path, Inches(0.2), Inches(0.2), width=Inches(1.5))
+    prs.save(path)
+    return path
+
+
+def per_shape_images(converter, input_path, output_path):
+    """不使用图片缓存的对照实现：每个图片形状都从原始数据解码并嵌入"""
+    import io
+    from pptx import Presentation
+    from pptx.shapes.picture import Picture
+    from reportlab.platypus import Image, Paragraph
+    story = []
+    for index, slide in enumerate(Presentation(input_path).slides, 1):
+        story.append(Paragraph(f"幻灯片 {index}", converter.styles['Heading1']))
+        for shape in slide.shapes:
+            if isinstance(shape, Picture):
+                story.append(Image(io.BytesIO(shape.image.blob), shape.width / 12700, shape.height / 12700))
+    converter.create_document(output_path).build(story)
+
+
+def bench_slides(args):
+    """每页重复徽标的PPTX：逐个形状解码与按文档缓存图片的耗时和输出大小"""
+    logging.disable(logging.CRITICAL)
+    from converter import PDFConverter
+    path = make_deck(args.slides)
+    converter = PDFConverter()
+    print(f"{args.slides} 页幻灯片，每页一个 1600x800 PNG 徽标")
+    print(f"{'方式':>10} {'耗时(秒)':>10} {'输出(KB)':>10}")
+    for name, func in (('逐个解码', lambda i, o: per_shape_images(converter, i, o)),
+                       ('图片缓存', converter.convert_pptx)):
+        output_path = os.path.join(BENCH_DIR, f'deck_{args.slides}.{name}.pdf')
+        start = time.perf_counter()
+        func(path, output_path)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>10} {elapsed:>10.2f} {os.path.getsize(output_path) / 1024:>10.0f}")
+
+
+def bench_office(args):
+    """旧版Office文件：每个文件启动新的转换进程与复用常驻进程池的耗时"""
+    logging.disable(logging.CRITICAL)
+    from office_backend import OfficePool, office_backend_name
+    office_dir = os.path.join(BENCH_DIR, 'office')
+    os.makedirs(office_dir, exist_ok=True)
+    paths = []
+    for i in range(args.count):
+        path = os.path.join(office_dir, f'legacy_{i}.doc')
+        with open(path, 'wb') as f:
+            f.write(b'legacy')
+        paths.append(path)
+    print(f"{args.count} 个 .doc 文件，转换后端 {office_backend_name()}")
+    print(f"{'方式':>12} {'耗时(秒)':>10} {'文件/秒':>10}")
+    for name, size, reuse in (('每个文件启动', 1, False), ('常驻 1 进程', 1, True), ('常驻 2 进程', 2, True)):
+        pool = OfficePool(size, args.timeout)
+        start = time.perf_counter()
+        if size == 1:
+            for path in paths:
+                pool.convert(path, path + '.pdf')
+                if not reuse:
+                    pool.close()
+                    pool = OfficePool(size, args.timeout)
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(size) as executor:
+                list(executor.map(lambda p: pool.convert(p, p + '.pdf'), paths))
+        elapsed = time.perf_counter() - start
+        pool.close()
+        print(f"{name:>12} {elapsed:>10.2f} {args.count / elapsed:>10.1f}")
+
+
+STARTUP_SCRIPT = """
+import sys, time, json, logging
+logging.disable(logging.CRITICAL)
+start = time.perf_counter()
+import converter
+imported = time.perf_counter()
+c = converter.PDFConverter()
+constructed = time.perf_counter()
+c.convert_file(sys.argv[1], sys.argv[2])
+converted = time.perf_counter()
+heavy = [m for m in ('docx', 'openpyxl', 'pptx', 'chardet') if m in sys.modules]
+print(json.dumps({'import': imported - start, 'construct': constructed - imported,
+                  'convert': converted - constructed, 'loaded': heavy}))
+"""
+
+
+def bench_startup(args):
+    """新进程中导入转换器、创建实例和转换一个小文本文件的耗时（取中位数）"""
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    source_path = os.path.join(BENCH_DIR, 'startup.txt')
+    with open(source_path, 'w', encoding='utf-8') as f:
+        f.write('hello 你好\n')
+    results = []
+    for _ in range(args.runs):
+        out = subprocess.run(
+            [sys.executable, '-c', STARTUP_SCRIPT, source_path, source_path + '.pdf'],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+    for key in ('import', 'construct', 'convert'):
+        values = sorted(r[key] for r in results)
+        print(f"{key:>10}: {values[len(values) // 2] * 1000:8.1f}ms")
+    print(f"转换文本文件后已加载的库: {', '.join(results[0]['loaded']) or '无'}")
+
+
+def legacy_construct(font_path):
+    """重写前每次创建转换器时的字体注册和样式表构建"""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    font_name = os.path.splitext(os.path.basename(font_path))[0]
+    pdfmetrics.registerFont(TTFont(font_name, font_path))
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(name='Custom', parent=styles['Normal'], fontSize=10, leading=14,
+                              fontName=font_name, wordWrap='CJK'))
+    return styles
+
+
+def bench_fonts(args):
+    """同一进程中重复创建转换器的耗时：每次解析字体与共享字体注册表对比"""
+    logging.disable(logging.CRITICAL)
+    from converter import PDFConverter
+    print(f"字体: {args.font}（{os.path.getsize(args.font) / 1024 / 1024:.1f}MB），创建 {args.count} 次")
+    for name, construct in (('每次解析', lambda: legacy_construct(args.font)),
+                            ('共享注册表', lambda: PDFConverter(font_paths=[args.font]))):
+        start = time.perf_counter()
+        for _ in range(args.count):
+            construct()
+        elapsed = time.perf_counter() - start
+        print(f"{name:>10}: 共 {elapsed * 1000:8.1f}ms，平均每次 {elapsed * 1000 / args.count:7.2f}ms")
+
+
+CJK_SAMPLE = ('本项目所有值得注意的变更都将记录在此文件中。文件转换分发到可配置大小的进程池，'
+              '每个工作进程拥有独立的转换器和字体。The quick brown fox jumps over the lazy dog. ')
+
+
+def make_cjk_corpus(count):
+    """生成中英文混合的文本、Word和PowerPoint样本文件"""
+    from docx import Document
+    from pptx import Presentation
+    from pptx.util import Inches
+    corpus_dir = os.path.join(BENCH_DIR, 'cjk_corpus')
+    os.makedirs(corpus_dir, exist_ok=True)
+    rng = random.Random(0)
+    chars = list(dict.fromkeys(CJK_SAMPLE))
+    files = {'text': [], 'docx': [], 'pptx': []}
+    for i in range(count):
+        paragraphs = [''.join(rng.choice(chars) for _ in range(rng.randint(40, 200)))
+                      for _ in range(rng.randint(5, 60))]
+        path = os.path.join(corpus_dir, f'doc_{i}.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n\n'.join(paragraphs))
+        files['text'].append(path)
+
+        path = os.path.join(corpus_dir, f'doc_{i}.docx')
+        doc = Document()
+        for paragraph in paragraphs:
+            doc.add_paragraph(paragraph)
+        doc.save(path)
+        files['docx'].append(path)
+
+        path = os.path.join(corpus_dir, f'doc_{i}.pptx')
+        prs = Presentation()
+        for paragraph in paragraphs[:10]:
+            slide = prs.slides.add_slide(prs.slide_layouts[6])
+            box = slide.shapes.add_textbox(Inches(1), Inches(1), Inches(8), Inches(5))
+            box.text_frame.text = paragraph
+        prs.save(path)
+        files['pptx'].append(path)
+    return files
+
+
+def bench_size(args):
+    """中英文样本转换后的文件大小和每页字节数，可与基线比较检测体积回退"""
+    logging.disable(logging.CRITICAL)
+    from converter import PDFConverter
+    files = make_cjk_corpus(args.count)
+    font_paths = [args.font] if args.font else []
+    output_dir = os.path.join(BENCH_DIR, 'cjk_output')
+    os.makedirs(output_dir, exist_ok=True)
+
+    results = {}
+    print(f"{'模式':>8} {'类型':>6} {'文件数':>6} {'总大小(KB)':>12} {'页数':>6} {'字节/页':>10}")
+    for mode, compact, no_embed_font in (('默认', False, False), ('紧凑', True, False), ('不嵌入', True, True)):
+        converter = PDFConverter(font_paths=font_paths, compact=compact, no_embed_font=no_embed_font)
+        for kind, paths in files.items():
+            total_bytes = pages = 0
+            for path in paths:
+                output_path = os.path.join(output_dir, f'{mode}_{os.path.basename(path)}.pdf')
+                converter.convert_file(path, output_path)
+                total_bytes += converter.file_info.get('output_bytes', 0)
+                pages += converter.file_info.get('pages', 0)
+            per_page = total_bytes / pages if pages else 0
+            results[f'{mode}/{kind}'] = per_page
+            print(f"{mode:>8} {kind:>6} {len(paths):>6} {total_bytes / 1024:>12.1f} {pages:>6} {per_page:>10.0f}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = [key for key, value in results.items()
+                       if key in baseline and value > baseline[key] * (1 + args.tolerance)]
+        for key in regressions:
+            print(f"体积回退: {key} {baseline[key]:.0f} -> {results[key]:.0f} 字节/页")
+        if regressions:
+            sys.exit(1)
+        print("未发现体积回退")
+
+
+def make_photos(count, width=6000, height=4000):
+    """生成指定数量的24MP相机照片大小的JPEG（渐变加噪点，压缩率接近真实照片）"""
+    from PIL import Image, ImageFilter
+    photo_dir = os.path.join(BENCH_DIR, 'photos')
+    os.makedirs(photo_dir, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(photo_dir, f'photo_{i}.jpg')
+        paths.append(path)
+        if os.path.exists(path):
+            continue
+        noise = Image.effect_noise((width // 4, height // 4), 40 + i).filter(ImageFilter.GaussianBlur(1))
+        gradient = Image.linear_gradient('L').resize((width // 4, height // 4))
+        image = Image.merge('RGB', (noise, gradient, gradient.transpose(Image.Transpose.ROTATE_180)
+                                    .resize(noise.size))).resize((width, height), Image.BICUBIC)
+        image.save(path, 'JPEG', quality=92)
+    return paths
+
+
+def legacy_convert_image(input_path, output_path):
+    """重写前的 convert_image：读取尺寸后由 drawImage 再次解码原图并按原始分辨率嵌入"""
+    from PIL import Image
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+    image = Image.open(input_path)
+    if image.mode == 'RGBA':
+        image = image.convert('RGB')
+    a4_width, a4_height = A4
+    img_width, img_height = image.size
+    ratio = min((a4_width - 2*72) / img_width, (a4_height - 2*72) / img_height)
+    new_width, new_height = img_width * ratio, img_height * ratio
+    c = canvas.Canvas(output_path, pagesize=A4)
+    c.drawImage(input_path, (a4_width - new_width) / 2, (a4_height - new_height) / 2,
+                width=new_width, height=new_height)
+    c.save()
+
+
+def bench_images(args):
+    """24MP照片转换的吞吐量和输出大小：重写前的实现与不同DPI设置对比"""
+    logging.disable(logging.CRITICAL)
+    from converter import PDFConverter
+    photos = make_photos(args.count)
+    input_mb = sum(os.path.getsize(p) for p in photos) / 1024 / 1024
+    output_dir = os.path.join(BENCH_DIR, 'photo_output')
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"{args.count} 张 6000x4000 JPEG，共 {input_mb:.1f}MB")
+    print(f"{'方式':>16} {'耗时(秒)':>10} {'张/秒':>8} {'输出(MB)':>10}")
+
+    modes = [('重写前', legacy_convert_image)]
+    for dpi in (0, 300, 200, 150):
+        converter = PDFConverter(image_dpi=dpi)
+        modes.append((f'{dpi}dpi' if dpi else '原始像素', converter.convert_image))
+    for name, func in modes:
+        start = time.perf_counter()
+        output_bytes = 0
+        for path in photos:
+            output_path = os.path.join(output_dir, f'{name}_{os.path.basename(path)}.pdf')
+            func(path, output_path)
+            output_bytes += os.path.getsize(output_path)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>16} {elapsed:>10.2f} {args.count / elapsed:>8.2f} {output_bytes / 1024 / 1024:>10.1f}")
+
+
+def make_scans(count):
+    """生成指定数量的A4 300DPI扫描件大小的JPEG"""
+    from PIL import Image, ImageDraw
+    scan_dir = os.path.join(BENCH_DIR, f'scans_{count}')
+    os.makedirs(scan_dir, exist_ok=True)
+    for i in range(count):
+        path = os.path.join(scan_dir, f'receipt_{i + 1}.jpg')
+        if os.path.exists(path):
+            continue
+        image = Image.new('L', (2480, 3508), 245)
+        draw = ImageDraw.Draw(image)
+        for line in range(40):
+            draw.rectangle((200, 300 + line * 75, 200 + (i * 37 + line * 53) % 1900, 330 + line * 75), fill=30)
+        image.save(path, 'JPEG', quality=90)
+    return scan_dir
+
+
+def child_convert_album(mode, scan_dir, per_page):
+    """在子进程中按相册或逐张转换扫描件并输出耗时、峰值内存和输出大小"""
+    logging.disable(logging.CRITICAL)
+    from converter import PDFConverter
+    converter = PDFConverter(album_per_page=per_page)
+    output_dir = os.path.join(BENCH_DIR, f'album_output_{mode}')
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+    if mode == 'album':
+        output_path = os.path.join(output_dir, 'album.pdf')
+        converter.convert_file(scan_dir, output_path)
+        output_bytes = converter.file_info['output_bytes']
+    else:
+        output_bytes = 0
+        for name in os.listdir(scan_dir):
+            output_path = os.path.join(output_dir, name + '.pdf')
+            converter.convert_file(os.path.join(scan_dir, name), output_path)
+            output_bytes += converter.file_info['output_bytes']
+    print(json.dumps({
+        'seconds': round(time.perf_counter() - start, 2),
+        'peak_rss_mb': peak_rss_mb(),
+        'output_mb': round(output_bytes / 1024 / 1024, 1),
+    }))
+
+
+def bench_album(args):
+    """扫描件逐张转换与相册模式的耗时、峰值内存和输出大小对比"""
+    scan_dir = make_scans(args.count)
+    print(f"{args.count} 张 2480x3508 JPEG")
+    print(f"{'方式':>12} {'耗时(秒)':>10} {'峰值内存(MB)':>14} {'输出(MB)':>10}")
+    for mode, per_page in (('single', 1), ('album', 1), ('album', 4)):
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '_child-album', mode, scan_dir, str(per_page)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        name = '逐张转换' if mode == 'single' else f'相册 {per_page}张/页'
+        print(f"{name:>12} {result['seconds']:>10} {result['peak_rss_mb']:>14.1f} {result['output_mb']:>10}")
+
+
+def legacy_clean_text(text):
+    """重写前的 clean_text 实现，用于验证新实现的输出一致"""
+    if not text:
+        return ""
+    text = re.sub(r'[\u200b-\u200f\u202a-\u202e\ufeff\u2028\u2029]', '', text)
+    text = ''.join(char for char in text if ord(char) >= 32 or char in '\n\r\t')
+    text = text.replace('\x00', '')
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    text = text.encode('utf-8', errors='ignore').decode('utf-8')
+    lines = [line.rstrip() for line in text.split('\n')]
+    text = '\n'.join(lines)
+    return text.strip()
+
+
+def bench_clean_text(args):
+    """clean_text 与旧实现的一致性模糊测试和10MB中英文混合文本的耗时对比"""
+    logging.disable(logging.CRITICAL)
+    from converter import PDFConverter
+    converter = PDFConverter()
+
+    # 覆盖控制字符、零宽字符、各类空白、换行符、代理字符和中英文
+    alphabet = ('ab 中文\t\n\r\x00\x01\x0b\x0c\x1c\x1f\x7f\x85\xa0'
+                '\u200b\u200e\u202a\u2028\u2029\u3000\ufeff\ud800\udfff\U0001f600')
+    rng = random.Random(args.seed)
+    for _ in range(args.cases):
+        text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        expected = legacy_clean_text(text)
+        actual = converter.clean_text(text)
+        if actual != expected:
+            print(f"输出不一致: {text!r}\n  旧实现: {expected!r}\n  新实现: {actual!r}")
+            sys.exit(1)
+    print(f"模糊测试通过: {args.cases} 个样本")
+
+    line = '2024-12-22 10:00:00 INFO 转换任务已完成 conversion finished\u200b  \r\n中文内容\t\n\n\n'
+    text = line * (10 * 1024 * 1024 // len(line.encode('utf-8')))
+    for name, func in (('旧实现', legacy_clean_text), ('新实现', converter.clean_text)):
+        start = time.perf_counter()
+        func(text)
+        print(f"{name}: {time.perf_counter() - start:.3f}秒")
+
+
+def bench_fast_text(args):
+    """快速文本模式与Platypus排版的每秒页数对比"""
+    logging.disable(logging.CRITICAL)
+    from converter import PDFConverter
+    from utils import count_pdf_pages
+    converter = PDFConverter()
+
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    source_path = os.path.join(BENCH_DIR, f'source_{args.lines}.txt')
+    with open(source_path, 'w', encoding='utf-8') as f:
+        for i in range(args.lines):
+            f.write(f"    def method_{i}(self, value):  # 第{i}行 源代码示例\n")
+
+    print(f"{'模式':>10} {'页数':>8} {'耗时(秒)':>10} {'页/秒':>10}")
+    for name, func in (('Platypus', converter.convert_text), ('快速文本', converter.convert_text_fast)):
+        output_path = os.path.join(BENCH_DIR, f'source_{name}.pdf')
+        start = time.perf_counter()
+        func(source_path, output_path)
+        elapsed = time.perf_counter() - start
+        pages = count_pdf_pages(output_path)
+        print(f"{name:>10} {pages:>8} {elapsed:>10.2f} {pages / elapsed:>10.1f}")
+
+
+def main():
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description='AnyFileToPDF 性能基准测试')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('text-rss', help='大文本文件流式转换的峰值内存')
+    p.add_argument('--sizes', default='100,1024,5120', help='输入文件大小（MB），逗号分隔')
+    p.set_defaults(func=bench_text_rss)
+
+    p = sub.add_parser('clean-text', help='clean_text 一致性验证和耗时对比')
+    p.add_argument('--cases', type=int, default=200000, help='模糊测试样本数')
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_clean_text)
+
+    p = sub.add_parser('fast-text', help='快速文本模式与Platypus的每秒页数对比')
+    p.add_argument('--lines', type=int, default=50000, help='生成的源代码行数')
+    p.set_defaults(func=bench_fast_text)
+
+    p = sub.add_parser('xlsx', help='大型XLSX文件转换的耗时和峰值内存')
+    p.add_argument('--rows', default='500000', help='工作表行数，逗号分隔')
+    p.set_defaults(func=bench_xlsx)
+
+    p = sub.add_parser('sheets', help='多工作表XLSX的逐个排版与并行排版对比')
+    p.add_argument('--sheets', type=int, default=30, help='工作表数量')
+    p.add_argument('--rows', type=int, default=2000, help='每个工作表的行数')
+    p.add_argument('--workers', default='2,4', help='并行排版的进程数，逗号分隔')
+    p.set_defaults(func=bench_sheets)
+
+    p = sub.add_parser('docx', help='长篇DOCX流式转换的耗时和峰值内存')
+    p.add_argument('--pages', type=int, default=2000, help='大约的页数')
+    p.set_defaults(func=bench_docx)
+
+    p = sub.add_parser('_child-docx')
+    p.add_argument('mode')
+    p.add_argument('path')
+    p.set_defaults(func=lambda a: child_convert_docx(a.mode, a.path))
+
+    p = sub.add_parser('slides', help='每页重复徽标的PPTX的图片缓存效果')
+    p.add_argument('--slides', type=int, default=300, help='幻灯片页数')
+    p.set_defaults(func=bench_slides)
+
+    p = sub.add_parser('office', help='旧版Office文件转换进程的复用效果')
+    p.add_argument('--count', type=int, default=50, help='文件数量')
+    p.add_argument('--timeout', type=int, default=120, help='单个文件的超时时间（秒）')
+    p.set_defaults(func=bench_office)
+
+    p = sub.add_parser('startup', help='导入转换器和创建实例的耗时')
+    p.add_argument('--runs', type=int, default=9, help='重复次数')
+    p.set_defaults(func=bench_startup)
+
+    p = sub.add_parser('fonts', help='重复创建转换器时字体注册的耗时')
+    p.add_argument('--font', default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+                   help='用于测试的TrueType字体文件')
+    p.add_argument('--count', type=int, default=50, help='创建转换器的次数')
+    p.set_defaults(func=bench_fonts)
+
+    p = sub.add_parser('size', help='中英文样本转换后的每页字节数和体积回退检查')
+    p.add_argument('--count', type=int, default=20, help='每种类型的样本文件数')
+    p.add_argument('--font', help='默认模式使用的中文字体文件（默认按系统字体查找）')
+    p.add_argument('--save', help='将结果保存为基线JSON文件')
+    p.add_argument('--baseline', help='与基线JSON文件比较，每页字节数超出容差时返回非零退出码')
+    p.add_argument('--tolerance', type=float, default=0.05, help='允许的体积增长比例')
+    p.set_defaults(func=bench_size)
+
+    p = sub.add_parser('images', help='24MP照片转换的吞吐量和输出大小')
+    p.add_argument('--count', type=int, default=8, help='照片数量')
+    p.set_defaults(func=bench_images)
+
+    p = sub.add_parser('_child-text')
+    p.add_argument('path')
+    p.set_defaults(func=lambda a: child_convert_text(a.path))
+
+    p = sub.add_parser('_child-xlsx')
+    p.add_argument('path')
+    p.set_defaults(func=lambda a: child_convert_xlsx(a.path))
+
+    p = sub.add_parser('album', help='扫描件逐张转换与相册模式对比')
+    p.add_argument('--count', type=int, default=300, help='扫描件数量')
+    p.set_defaults(func=bench_album)
+
+    p = sub.add_parser('_child-album')
+    p.add_argument('mode')
+    p.add_argument('path')
+    p.add_argument('per_page', type=int)
+    p.set_defaults(func=lambda a: child_convert_album(a.mode, a.path, a.per_page))
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
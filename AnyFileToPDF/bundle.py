@@ -0,0 +1,360 @@
+import os
+import re
+import shutil
+import logging
+from utils import output_volumes
+
+# 合并PDF的默认大小上限，超过后写入新的分卷
+BUNDLE_MAX_BYTES = 512 * 1024 * 1024
+# 合并模式下单个文件的转换结果暂存在输出目录中的该目录，追加到合并PDF后删除
+STAGING_DIR = '.bundle_staging'
+
+OBJ_HEADER = re.compile(rb'(\d+)\s+(\d+)\s+obj\b')
+STREAM_START = re.compile(rb'stream\r?\n')
+DIRECT_LENGTH = re.compile(rb'/Length\s+(\d+)\b(?!\s+\d+\s+R)')
+REFERENCE = re.compile(rb'(\d+)\s+0\s+R\b')
+TYPE = re.compile(rb'/Type\s*/(\w+)')
+KIDS = re.compile(rb'/Kids\s*\[([^\]]*)\]')
+TRAILER_REF = re.compile(rb'/(Root|Info)\s+(\d+)\s+0\s+R')
+CATALOG_REF = re.compile(rb'/(Pages|Outlines)\s+(\d+)\s+0\s+R')
+INDIRECT_LENGTH = re.compile(rb'/Length\s+(\d+)\s+\d+\s+R')
+XREF_SUBSECTION = re.compile(rb'\s*(\d+)\s+(\d+)\s')
+XREF_ENTRY = re.compile(rb'\s*(\d{10})\s+\d{5}\s+([nf])')
+# 页面树节点上可被页面继承的属性（LibreOffice 等通常写在 /Pages 节点上）
+INHERITABLE = (b'Resources', b'MediaBox', b'CropBox', b'Rotate')
+DELIMITERS = b'()<>[]{}/%'
+
+# 合并PDF中预留的对象编号：目录、页面树和书签根节点在关闭时写入
+CATALOG_NUM, PAGES_NUM, OUTLINES_NUM = 1, 2, 3
+
+
+def pdf_text_string(text):
+    """将文本编码为PDF文本字符串（UTF-16BE十六进制，支持中文）"""
+    return b'<FEFF' + text.encode('utf-16-be').hex().upper().encode('ascii') + b'>'
+
+
+def read_pdf_objects(data):
+    """解析PDF的交叉引用表，返回 (对象编号 -> (字典部分, 流数据), 根对象编号, 信息对象编号)
+
+    支持使用传统交叉引用表的PDF（ReportLab 和 LibreOffice 的输出），流长度可以是间接对象；
+    使用交叉引用流（对象流）、增量更新或加密的PDF无法逐对象复制，抛出 ValueError。
+    """
+    startxref = data.rindex(b'startxref')
+    xref_offset = int(data[startxref + 9:].split()[0])
+    if not data.startswith(b'xref', xref_offset):
+        raise ValueError("不支持使用交叉引用流（对象流）的PDF")
+    trailer = data.index(b'trailer', xref_offset)
+    trailer_dict = data[trailer:startxref]
+    if b'/Prev' in trailer_dict:
+        raise ValueError("不支持经过增量更新的PDF")
+    if b'/Encrypt' in trailer_dict:
+        raise ValueError("不支持加密的PDF")
+    refs = dict((name.decode(), int(num)) for name, num in TRAILER_REF.findall(trailer_dict))
+
+    # 交叉引用表由若干小节组成，每个小节第一行为 "起始编号 数量"，之后每行对应一个对象
+    offsets = {}
+    pos = xref_offset + 4
+    while True:
+        subsection = XREF_SUBSECTION.match(data, pos, trailer)
+        if subsection is None:
+            break
+        first, count = int(subsection.group(1)), int(subsection.group(2))
+        pos = subsection.end()
+        for index in range(count):
+            entry = XREF_ENTRY.match(data, pos)
+            pos = entry.end()
+            if entry.group(2) == b'n':
+                offsets[first + index] = int(entry.group(1))
+
+    def body(num):
+        match = OBJ_HEADER.match(data, offsets[num])
+        start = match.end()
+        return start, data.index(b'endobj', start)
+
+    objects = {}
+    for num in offsets:
+        start, end = body(num)
+        stream = STREAM_START.search(data, start, end)
+        if stream is None:
+            objects[num] = (data[start:end].strip(), None)
+            continue
+        head = data[start:stream.start()].strip()
+        length = DIRECT_LENGTH.search(head)
+        indirect = INDIRECT_LENGTH.search(head)
+        if indirect and int(indirect.group(1)) in offsets:
+            # 流长度保存在另一个对象中
+            length_start, length_end = body(int(indirect.group(1)))
+            stream_length = int(data[length_start:length_end].strip())
+        elif length:
+            stream_length = int(length.group(1))
+        else:
+            stream_length = data.index(b'endstream', stream.end()) - stream.end()
+        objects[num] = (head, data[stream.end():stream.end() + stream_length])
+    return objects, refs.get('Root'), refs.get('Info')
+
+
+def skip_value(data, pos):
+    """跳过字典或数组中从 pos 开始的一个值（不含前导空白），返回值结束的位置"""
+    char = data[pos:pos + 1]
+    if data.startswith(b'<<', pos) or char == b'[':
+        # 嵌套的字典或数组：跳过其中的值直到对应的结束符
+        close = b'>>' if char == b'<' else b']'
+        pos += len(close)
+        while True:
+            pos = skip_space(data, pos)
+            if data.startswith(close, pos):
+                return pos + len(close)
+            pos = skip_value(data, pos)
+    if char == b'(':
+        # 字符串：括号可以嵌套，反斜杠转义下一个字符
+        depth = 0
+        while True:
+            char = data[pos:pos + 1]
+            if char == b'\\':
+                pos += 2
+                continue
+            if char == b'(':
+                depth += 1
+            elif char == b')':
+                depth -= 1
+                if depth == 0:
+                    return pos + 1
+            pos += 1
+    if char == b'<':
+        return data.index(b'>', pos) + 1
+    # 名称、数字、布尔值等：读到空白或分隔符为止（名称以 / 开头）
+    pos += 1
+    while pos < len(data) and not data[pos:pos + 1].isspace() and data[pos:pos + 1] not in DELIMITERS:
+        pos += 1
+    return pos
+
+
+def skip_space(data, pos):
+    while pos < len(data) and data[pos:pos + 1].isspace():
+        pos += 1
+    return pos
+
+
+def dict_entries(head):
+    """解析字典最外层的键值，返回 名称 -> 值的原始字节（间接引用如 b'5 0 R'）"""
+    entries = {}
+    pos = skip_space(head, head.index(b'<<') + 2)
+    while not head.startswith(b'>>', pos):
+        key_end = skip_value(head, pos)
+        key = head[pos + 1:key_end]
+        start = skip_space(head, key_end)
+        end = skip_value(head, start)
+        # 间接引用 "编号 版本 R" 由三个记号组成
+        reference = REFERENCE.match(head, start)
+        if reference:
+            end = reference.end()
+        entries[key] = head[start:end]
+        pos = skip_space(head, end)
+    return entries
+
+
+class PDFBundle:
+    """将多个转换结果流式合并为一个或多个PDF
+
+    每个源文件转换完成后按任务顺序追加到合并PDF，并添加以源文件相对路径为标题的书签。
+    已追加的对象直接写入磁盘，内存中只保留对象偏移、页面编号和书签，
+    文件超过大小上限时开始新的分卷（xxx.part2.pdf 等）。
+    """
+
+    def __init__(self, output_dir, name='bundle', max_bytes=BUNDLE_MAX_BYTES):
+        self.logger = logging.getLogger(__name__)
+        self.output_dir = output_dir
+        self.output_path = os.path.join(output_dir, name + '.pdf')
+        self.staging_dir = os.path.join(output_dir, STAGING_DIR)
+        self.max_bytes = max_bytes
+        self.paths = []
+        self.file = None
+        self.staged = False
+        # 相对路径 -> 在合并PDF中的顺序
+        self.order = {}
+        # 按顺序追加：序号 -> (相对路径, 转换结果路径)，None 表示转换失败
+        self.pending = {}
+        self.next_index = 0
+
+    def stage(self, tasks):
+        """将任务的输出路径改为暂存目录，返回新的任务列表
+
+        合并PDF中的顺序为任务列表的顺序，与转换完成的顺序无关。
+        """
+        os.makedirs(self.staging_dir, exist_ok=True)
+        self.staged = True
+        self.order = {rel_path: index for index, (_, _, rel_path) in enumerate(tasks)}
+        return [(input_path, os.path.join(self.staging_dir, rel_path + '.pdf'), rel_path)
+                for input_path, _, rel_path in tasks]
+
+    def open_volume(self):
+        """开始写入新的合并PDF分卷"""
+        volume = len(self.paths) + 1
+        base, ext = os.path.splitext(self.output_path)
+        path = self.output_path if volume == 1 else f"{base}.part{volume}{ext}"
+        self.paths.append(path)
+        self.file = open(path, 'wb')
+        self.file.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        # 对象编号 -> 文件偏移，预留的对象在关闭分卷时写入
+        self.offsets = {}
+        self.next_num = OUTLINES_NUM + 1
+        self.page_nums = []
+        # 书签：(标题, 第一页的对象编号)
+        self.outlines = []
+
+    def write_object(self, num, head, stream_data=None):
+        """写入一个间接对象"""
+        self.offsets[num] = self.file.tell()
+        self.file.write(b'%d 0 obj\n' % num + head)
+        if stream_data is not None:
+            self.file.write(b'\nstream\n' + stream_data + b'\nendstream')
+        self.file.write(b'\nendobj\n')
+
+    def add(self, rel_path, output_path):
+        """登记一个任务的转换结果，output_path 为None表示转换失败"""
+        self.pending[self.order[rel_path]] = (rel_path, output_path)
+        while self.next_index in self.pending:
+            rel_path, output_path = self.pending.pop(self.next_index)
+            self.next_index += 1
+            if output_path is None:
+                continue
+            volumes = [path for path in output_volumes(output_path) if os.path.exists(path)]
+            try:
+                self.append(rel_path, volumes)
+            except Exception as e:
+                self.logger.warning(f"追加到合并PDF失败 {rel_path}: {str(e)}")
+            finally:
+                for path in volumes:
+                    os.remove(path)
+
+    def ensure_volume(self):
+        """尚未开始写入或当前分卷超过大小上限时打开新的分卷"""
+        if self.file is None:
+            self.open_volume()
+        elif self.page_nums and self.file.tell() >= self.max_bytes:
+            self.close_volume()
+            self.open_volume()
+
+    def append(self, rel_path, volumes):
+        """将一个源文件的转换结果（可能有多个分卷）追加到合并PDF"""
+        self.ensure_volume()
+        first_page = None
+        for path in volumes:
+            with open(path, 'rb') as f:
+                data = f.read()
+            page_nums = self.copy_document(data)
+            if first_page is None and page_nums:
+                first_page = page_nums[0]
+        if first_page is not None:
+            self.outlines.append((rel_path.replace(os.sep, '/'), first_page))
+
+    def append_pages(self, data, titles):
+        """追加内存中的PDF数据，titles 为每页的书签标题，为空的页面不添加书签"""
+        self.ensure_volume()
+        for page_num, title in zip(self.copy_document(data), titles):
+            if title:
+                self.outlines.append((title, page_num))
+
+    def copy_document(self, data):
+        """复制一个PDF的页面及其引用的对象，返回新的页面对象编号列表"""
+        objects, root_num, info_num = read_pdf_objects(data)
+        catalog = dict((name.decode(), int(num))
+                       for name, num in CATALOG_REF.findall(objects[root_num][0]))
+
+        # 按页面树顺序收集页面，丢弃原文档的目录、页面树、书签和文档信息；
+        # 页面树节点上的可继承属性复制到没有该属性的页面上
+        pages = []
+        page_tree = set()
+
+        def walk(num, inherited):
+            head, stream_data = objects[num]
+            node_type = TYPE.search(head)
+            if node_type and node_type.group(1) == b'Pages':
+                page_tree.add(num)
+                entries = dict_entries(head)
+                inherited = dict(inherited, **{key.decode(): entries[key] for key in INHERITABLE if key in entries})
+                kids = KIDS.search(head)
+                for kid in REFERENCE.findall(kids.group(1) if kids else b''):
+                    walk(int(kid), inherited)
+                return
+            missing = [key for key in inherited if key.encode() not in dict_entries(head)]
+            if missing:
+                end = head.rindex(b'>>')
+                extra = b''.join(b' /' + key.encode() + b' ' + inherited[key] for key in missing)
+                objects[num] = (head[:end] + extra + b' ' + head[end:], stream_data)
+            pages.append(num)
+
+        walk(catalog['Pages'], {})
+        dropped = {root_num, info_num, catalog.get('Outlines')} | page_tree
+        mapping = {}
+        for num in objects:
+            if num not in dropped:
+                mapping[num] = self.next_num
+                self.next_num += 1
+
+        def renumber(match):
+            num = int(match.group(1))
+            if num in page_tree:
+                return b'%d 0 R' % PAGES_NUM
+            if num in mapping:
+                return b'%d 0 R' % mapping[num]
+            return b'null'
+
+        for num, (head, stream_data) in objects.items():
+            if num in mapping:
+                self.write_object(mapping[num], REFERENCE.sub(renumber, head), stream_data)
+        page_nums = [mapping[num] for num in pages]
+        self.page_nums.extend(page_nums)
+        return page_nums
+
+    def write_outlines(self):
+        """写入书签根节点和每个源文件的书签"""
+        first_num = self.next_num
+        count = len(self.outlines)
+        for index, (title, page_num) in enumerate(self.outlines):
+            num = first_num + index
+            head = [b'<< /Title ' + pdf_text_string(title),
+                    b' /Parent %d 0 R' % OUTLINES_NUM,
+                    b' /Dest [ %d 0 R /Fit ]' % page_num]
+            if index > 0:
+                head.append(b' /Prev %d 0 R' % (num - 1))
+            if index < count - 1:
+                head.append(b' /Next %d 0 R' % (num + 1))
+            self.write_object(num, b''.join(head) + b' >>')
+        self.next_num += count
+        if count:
+            self.write_object(OUTLINES_NUM, b'<< /Type /Outlines /First %d 0 R /Last %d 0 R /Count %d >>'
+                              % (first_num, first_num + count - 1, count))
+        else:
+            self.write_object(OUTLINES_NUM, b'<< /Type /Outlines /Count 0 >>')
+
+    def close_volume(self):
+        """写入目录、页面树、书签和交叉引用表，结束当前分卷"""
+        kids = b' '.join(b'%d 0 R' % num for num in self.page_nums)
+        self.write_object(PAGES_NUM, b'<< /Type /Pages /Kids [ ' + kids + b' ] /Count %d >>'
+                          % len(self.page_nums))
+        self.write_outlines()
+        self.write_object(CATALOG_NUM, b'<< /Type /Catalog /Pages %d 0 R /Outlines %d 0 R'
+                          b' /PageMode /UseOutlines >>' % (PAGES_NUM, OUTLINES_NUM))
+
+        xref_offset = self.file.tell()
+        size = self.next_num
+        lines = [b'xref\n0 %d\n' % size, b'0000000000 65535 f \n']
+        for num in range(1, size):
+            if num in self.offsets:
+                lines.append(b'%010d 00000 n \n' % self.offsets[num])
+            else:
+                lines.append(b'0000000000 65535 f \n')
+        self.file.write(b''.join(lines))
+        self.file.write(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                        % (size, CATALOG_NUM, xref_offset))
+        self.file.close()
+        self.file = None
+
+    def close(self):
+        """结束合并并删除暂存目录，返回生成的合并PDF路径列表"""
+        if self.file is not None:
+            self.close_volume()
+        if self.staged:
+            shutil.rmtree(self.staging_dir, ignore_errors=True)
+        return self.paths
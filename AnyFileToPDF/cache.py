@@ -0,0 +1,131 @@
+import os
+import shutil
+import hashlib
+import logging
+from utils import hash_file, output_volumes
+
+# 缓存目录的默认大小上限
+CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+# 可通过环境变量指定缓存目录
+CACHE_DIR_ENV = 'ANYFILETOPDF_CACHE_DIR'
+
+
+def default_cache_dir():
+    """默认缓存目录：Windows 为 %LOCALAPPDATA%，其他系统为 ~/.cache"""
+    if os.environ.get(CACHE_DIR_ENV):
+        return os.environ[CACHE_DIR_ENV]
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') \
+        or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'AnyFileToPDF')
+
+
+def link_or_copy(source, target):
+    """优先创建硬链接，跨分区等无法链接时复制文件"""
+    if os.path.exists(target):
+        os.remove(target)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+class ConversionCache:
+    """按内容寻址的转换结果缓存
+
+    键为输入文件内容哈希与转换器设置（含扩展名等，见 PDFConverter.cache_signature）的组合哈希，
+    值为转换得到的PDF（含分卷）。
+    不同文件夹中内容相同的文件只需转换一次，超过大小上限时按最近使用时间淘汰。
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=CACHE_MAX_BYTES):
+        self.logger = logging.getLogger(__name__)
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # 缓存总大小在首次写入时统计，之后增量维护
+        self.total_bytes = None
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, input_path, signature, content_hash=None):
+        """计算缓存键，已知输入文件的内容哈希时传入 content_hash，不再读取文件"""
+        digest = hashlib.sha256((content_hash or hash_file(input_path)).encode('ascii'))
+        digest.update(signature.encode('utf-8'))
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        """缓存键对应的PDF路径（按前两位分子目录，避免单个目录文件过多）"""
+        return os.path.join(self.cache_dir, key[:2], key + '.pdf')
+
+    def fetch(self, key, output_path):
+        """命中时将缓存的PDF链接或复制到输出路径，返回是否命中"""
+        entry = self.entry_path(key)
+        if not os.path.exists(entry):
+            self.misses += 1
+            return False
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        # 删除上次转换的输出，上次的分卷可能比缓存的多
+        for path in output_volumes(output_path):
+            if os.path.exists(path):
+                os.remove(path)
+        base, ext = os.path.splitext(output_path)
+        for volume, path in enumerate(output_volumes(entry), 1):
+            target = output_path if volume == 1 else f"{base}.part{volume}{ext}"
+            link_or_copy(path, target)
+        # 更新访问时间，淘汰时按最近使用排序
+        os.utime(entry)
+        self.hits += 1
+        return True
+
+    def store(self, key, output_path):
+        """将转换得到的PDF存入缓存"""
+        entry = self.entry_path(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        base, ext = os.path.splitext(entry)
+        volumes = output_volumes(output_path)
+        # 先写入分卷，最后写入主文件，主文件存在即表示缓存完整
+        for volume, path in reversed(list(enumerate(volumes, 1))):
+            target = entry if volume == 1 else f"{base}.part{volume}{ext}"
+            # 多个工作进程可能同时写入同一个条目
+            tmp_path = f"{target}.{os.getpid()}.tmp"
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, target)
+        if self.total_bytes is None:
+            self.total_bytes = sum(size for _, size, _ in self.scan())
+        else:
+            self.total_bytes += sum(os.path.getsize(path) for path in volumes)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def scan(self):
+        """列出缓存中的所有条目，返回 (键, 大小, 最近使用时间) 列表"""
+        entries = {}
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.pdf'):
+                    continue
+                path = os.path.join(root, name)
+                key = name.split('.', 1)[0]
+                stat = os.stat(path)
+                size, mtime = entries.get(key, (0, 0))
+                if name == key + '.pdf':
+                    mtime = stat.st_mtime
+                entries[key] = (size + stat.st_size, mtime)
+        return [(key, size, mtime) for key, (size, mtime) in entries.items()]
+
+    def evict(self):
+        """按最近使用时间从旧到新删除条目，直到低于大小上限"""
+        entries = sorted(self.scan(), key=lambda entry: entry[2])
+        self.total_bytes = sum(size for _, size, _ in entries)
+        for key, size, _ in entries:
+            if self.total_bytes <= self.max_bytes:
+                break
+            entry = self.entry_path(key)
+            try:
+                # 先删除主文件，使该条目立即失效
+                for path in ([entry] if os.path.exists(entry) else []) + output_volumes(entry)[1:]:
+                    os.remove(path)
+            except OSError as e:
+                self.logger.warning(f"删除缓存条目失败 {key}: {str(e)}")
+                continue
+            self.total_bytes -= size
@@ -0,0 +1,205 @@
+"""AnyFileToPDF 命令行批量转换
+
+不导入PyQt5，可在没有图形界面的服务器或定时任务中运行。
+
+用法:
+    python cli.py 文件夹或文件 [...] [-o 输出目录] [-j 进程数]
+                  [--include 模式] [--exclude 模式] [--ext 扩展名] [--exclude-ext 扩展名]
+                  [--incremental] [--cache]
+                  [--fast-text .py,.log] [--bundle 名称] [--album] [--json 汇总文件]
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+
+
+def parse_args(argv=None):
+    from converter import IMAGE_DPI, IMAGE_JPEG_QUALITY
+    from office_backend import OFFICE_WORKERS, OFFICE_TIMEOUT
+    from worker_pool import FILE_TIMEOUT, FILE_TIMEOUT_PER_MB, FILE_MEMORY_MB
+    parser = argparse.ArgumentParser(description='AnyFileToPDF 命令行批量转换')
+    parser.add_argument('paths', nargs='+', help='要转换的文件夹或文件')
+    parser.add_argument('-o', '--output', help='输出目录（默认为源文件夹下的 outputsPDF）')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='并行转换的进程数（默认为CPU核心数，1为单进程顺序转换）')
+    parser.add_argument('--include', action='append', default=[], metavar='GLOB',
+                        help='只转换匹配的文件（匹配相对路径或文件名，可多次指定）')
+    parser.add_argument('--exclude', action='append', default=[], metavar='GLOB',
+                        help='跳过匹配的文件（匹配相对路径或文件名，可多次指定）')
+    parser.add_argument('--ext', default='', metavar='EXTS',
+                        help='只转换这些扩展名的文件，逗号分隔，例如 .docx,.xlsx')
+    parser.add_argument('--exclude-ext', default='', metavar='EXTS',
+                        help='跳过这些扩展名的文件，逗号分隔，例如 .log,.csv')
+    parser.add_argument('--include-binary', action='store_true',
+                        help='不检测二进制文件，所有没有专用转换器的文件都尝试按文本转换')
+    parser.add_argument('--no-default-excludes', action='store_true',
+                        help='也扫描 .git、node_modules 等版本控制和依赖目录')
+    parser.add_argument('--incremental', action='store_true', help='只转换新增或修改过的文件')
+    parser.add_argument('--cache', action='store_true', help='使用按内容寻址的转换缓存')
+    parser.add_argument('--fast-text', default='', metavar='EXTS',
+                        help='使用快速文本模式的扩展名，逗号分隔，例如 .py,.log')
+    parser.add_argument('--font-path', action='append', default=[], metavar='PATH',
+                        help='额外的字体目录或TrueType字体文件，优先于系统字体（可多次指定）')
+    parser.add_argument('--bundle', metavar='NAME',
+                        help='将所有结果按路径顺序合并为 NAME.pdf，每个源文件一个书签，不保留单个PDF')
+    parser.add_argument('--bundle-max-mb', type=int, default=512,
+                        help='合并PDF的大小上限（MB），超过后写入新的分卷')
+    parser.add_argument('--album', action='store_true',
+                        help='相册模式：每个文件夹中的图片按自然顺序合并为一个 album.pdf')
+    parser.add_argument('--album-per-page', type=int, default=1, metavar='N',
+                        help='相册模式下每页排列的图片数量')
+    parser.add_argument('--compact', action='store_true',
+                        help='紧凑输出：以二进制写入数据流（不使用ASCII85编码），减小PDF体积；中文字体仍然嵌入')
+    parser.add_argument('--no-embed-font', action='store_true',
+                        help='不嵌入中文字体，使用阅读器自带的宋体（STSong-Light）显示，'
+                             'PDF更小但显示效果取决于阅读器的中文字体')
+    parser.add_argument('--image-dpi', type=int, default=IMAGE_DPI,
+                        help=f'图片缩小到的目标分辨率（默认{IMAGE_DPI}），0表示保留原始像素')
+    parser.add_argument('--jpeg-quality', type=int, default=IMAGE_JPEG_QUALITY,
+                        help=f'缩小后的JPEG重新压缩的质量（默认{IMAGE_JPEG_QUALITY}）')
+    parser.add_argument('--office-workers', type=int, default=OFFICE_WORKERS, metavar='N',
+                        help=f'转换 .doc/.xls/.ppt 的常驻 LibreOffice 进程数（默认{OFFICE_WORKERS}）')
+    parser.add_argument('--office-timeout', type=int, default=OFFICE_TIMEOUT, metavar='SECONDS',
+                        help=f'单个 .doc/.xls/.ppt 文件的转换超时时间（秒，默认{OFFICE_TIMEOUT}），超时后重启 LibreOffice')
+    parser.add_argument('--file-timeout', type=int, default=FILE_TIMEOUT, metavar='SECONDS',
+                        help=f'单个文件的基础转换时间上限（秒，默认{FILE_TIMEOUT}），输入每MB另加{FILE_TIMEOUT_PER_MB}秒，'
+                             '超过时终止并记为失败，0表示不限制')
+    parser.add_argument('--memory-limit', type=int, default=FILE_MEMORY_MB, metavar='MB',
+                        help=f'转换进程的内存上限（MB，默认{FILE_MEMORY_MB}），超过时终止并记为失败，0表示不限制')
+    parser.add_argument('--profile', action='store_true',
+                        help='用 cProfile 分析每个文件的转换，保留最慢的文件的结果（outputsPDF/profiles）')
+    parser.add_argument('--json', metavar='FILE',
+                        help='将转换汇总写入JSON文件，"-" 表示输出到标准输出')
+    parser.add_argument('-q', '--quiet', action='store_true', help='不输出每个文件的转换日志和警告，只输出错误')
+    parser.add_argument('-v', '--verbose', action='store_true', help='输出详细的运行日志')
+    return parser.parse_args(argv)
+
+
+def plan_jobs(paths, output, album=False, exclude_dirs=None):
+    """为每个输入路径确定输出目录和转换任务，返回 (输入路径, 输出目录, 任务列表, 文件索引) 列表
+
+    指定的输出目录位于输入文件夹中时不扫描该目录，上次的转换结果不会被当作输入。
+    """
+    from batch import collect_folder_tasks
+    from discovery import FileIndex, DEFAULT_EXCLUDE_DIRS
+    jobs = []
+    for path in paths:
+        path = os.path.abspath(path)
+        if output is None:
+            base = path if os.path.isdir(path) else os.path.dirname(path)
+            output_dir = os.path.join(base, 'outputsPDF')
+        elif len(paths) == 1 or not os.path.isdir(path):
+            output_dir = os.path.abspath(output)
+        else:
+            # 多个输入共用输出目录时，各文件夹按名称分别存放
+            output_dir = os.path.join(os.path.abspath(output), os.path.basename(path))
+
+        index = FileIndex([path], DEFAULT_EXCLUDE_DIRS if exclude_dirs is None else exclude_dirs,
+                          exclude_paths=(output_dir, os.path.abspath(output)) if output is not None else ())
+        index.scan()
+        if os.path.isdir(path):
+            tasks = collect_folder_tasks(path, output_dir, album, index)
+        else:
+            rel_path = os.path.basename(path)
+            tasks = [(path, os.path.join(output_dir, rel_path + '.pdf'), rel_path)]
+        jobs.append((path, output_dir, tasks, index))
+    return jobs
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from utils import LOG_FORMAT
+    # 工作进程使用相同的日志级别
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.ERROR if args.quiet else logging.WARNING,
+        format=LOG_FORMAT
+    )
+
+    missing = [path for path in args.paths if not os.path.exists(path)]
+    if missing:
+        print(f"路径不存在: {', '.join(missing)}", file=sys.stderr)
+        return 2
+
+    from converter import PDFConverter
+    from batch import run_batch, REPORT_NAME
+    from manifest import ConversionManifest
+    from cache import ConversionCache
+    from bundle import PDFBundle
+    from discovery import FileFilter, format_skipped
+
+    fast_text = [ext if ext.startswith('.') else '.' + ext
+                 for ext in args.fast_text.split(',') if ext]
+    converter = PDFConverter(fast_text_extensions=fast_text, font_paths=args.font_path,
+                             compact=args.compact, no_embed_font=args.no_embed_font, image_dpi=args.image_dpi,
+                             jpeg_quality=args.jpeg_quality, album_per_page=args.album_per_page,
+                             office_workers=args.office_workers, office_timeout=args.office_timeout,
+                             profile=args.profile)
+    cache = ConversionCache() if args.cache else None
+    file_filter = FileFilter(args.include, args.exclude, args.ext.split(','), args.exclude_ext.split(','),
+                             converter.known_extensions(), skip_binary=not args.include_binary)
+
+    def log(message):
+        if not args.quiet:
+            print(message, file=sys.stderr)
+
+    start = time.perf_counter()
+    results = []
+    interrupted = False
+    try:
+        jobs = plan_jobs(args.paths, args.output, args.album, () if args.no_default_excludes else None)
+        for path, output_dir, tasks, index in jobs:
+            tasks, skipped = file_filter.filter_tasks(tasks)
+            log(f"{path}: 找到 {len(tasks)} 个文件")
+            if format_skipped(skipped):
+                log(format_skipped(skipped))
+            os.makedirs(output_dir, exist_ok=True)
+            manifest = None
+            if args.incremental and not args.bundle:
+                manifest = ConversionManifest(output_dir, converter.settings_signature())
+            bundle = None
+            if args.bundle:
+                bundle = PDFBundle(output_dir, args.bundle, args.bundle_max_mb * 1024 * 1024)
+                tasks = bundle.stage(tasks)
+            summary = run_batch(converter, tasks, log, lambda progress: None,
+                                args.jobs, manifest, cache, bundle, args.file_timeout, args.memory_limit,
+                                os.path.join(output_dir, REPORT_NAME), index.size_of)
+            results.append({'path': path, 'output_dir': output_dir, **summary,
+                            'excluded': skipped['excluded'], 'binary': skipped['binary']})
+    except KeyboardInterrupt:
+        # 进程池在 run_batch 中已被终止
+        interrupted = True
+        log("转换已取消！")
+
+    report = {
+        'inputs': results,
+        'total': sum(r['total'] for r in results),
+        'converted': sum(r['converted'] for r in results),
+        'failed': sum(r['failed'] for r in results),
+        'skipped': sum(r['skipped'] for r in results),
+        'excluded': sum(r['excluded'] for r in results),
+        'binary': sum(r['binary'] for r in results),
+        'cache_hits': sum(r['cache_hits'] for r in results),
+        'cache_misses': sum(r['cache_misses'] for r in results),
+        'failures': [dict(failure, input=r['path']) for r in results for failure in r['failures']],
+        'cancelled': interrupted or any(r['cancelled'] for r in results),
+        'seconds': round(time.perf_counter() - start, 2),
+    }
+    if args.json == '-':
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    elif args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if report['cancelled']:
+        return 130
+    return 1 if report['failed'] else 0
+
+
+if __name__ == '__main__':
+    # 打包后的程序需要此调用才能正确启动转换工作进程
+    multiprocessing.freeze_support()
+    sys.exit(main())
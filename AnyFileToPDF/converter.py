@@ -1,109 +1,273 @@
 import os
 import mimetypes
-import chardet
-from PIL import Image
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib import colors
+from reportlab import rl_config
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.styles import ParagraphStyle
 from reportlab.lib.units import inch
-from docx import Document
-from openpyxl import load_workbook
-from pptx import Presentation
+# openpyxl、python-pptx 和 PIL 导入较慢，在对应的转换方法中首次用到时才导入，
+# 只转换文本文件时（包括每个工作进程）无需加载
 import threading
 import logging
 from pathlib import Path
 import io
 import html
 import re
+import itertools
+import math
+import time
+import multiprocessing
+from multiprocessing.managers import BaseProxy
+import zipfile
+import functools
+import tempfile
+import contextlib
+from batch import run_batch, collect_folder_tasks, REPORT_NAME
+from discovery import FileIndex, FileFilter, format_skipped
+from manifest import ConversionManifest
+from cache import ConversionCache
+from fonts import get_font_registry
+from bundle import PDFBundle
+from utils import output_volumes, count_pdf_pages, natural_sort_key, setup_worker_logging, IMAGE_EXTENSIONS
+from text_encoding import EncodingDetector, FALLBACK_ENCODINGS
+from docx_reader import iter_docx_blocks
+from embedded_images import EmbeddedImageCache, EMU_PER_POINT
+from office_backend import OfficePool, office_backend_name, OFFICE_WORKERS, OFFICE_TIMEOUT
+from telemetry import StageTimer, ProfileKeeper, timed
+
+# 转换器版本，转换结果发生变化时需要更新，使增量转换重新生成旧的PDF
+CONVERTER_VERSION = '0.1.3'
+
+# 超过此大小的文本文件使用流式转换，峰值内存与文件大小无关
+STREAMING_THRESHOLD = 8 * 1024 * 1024
+# 流式转换时每个PDF分卷容纳的最大字符数，超过后写入新的分卷
+STREAM_VOLUME_CHARS = 4 * 1024 * 1024
+# 流式转换时单行的最大字符数，超长的行会被拆分
+STREAM_LINE_CHARS = 1000
+
+# 电子表格每个表格的最大行数和列数，超出的部分拆分为多个表格
+XLSX_TABLE_ROWS = 200
+XLSX_TABLE_COLUMNS = 20
+# 电子表格每个PDF分卷的最大行数
+XLSX_VOLUME_ROWS = 20000
+# 电子表格的字号、单元格左右内边距和计算列宽时每个单元格测量的最大字符数
+XLSX_FONT_SIZE = 10
+XLSX_CELL_PADDING = 6
+XLSX_MEASURE_CHARS = 100
+# 电子表格的最大列宽，更宽的内容按此宽度折行
+XLSX_MAX_COLUMN_WIDTH = 240
+# 超过此大小且有多个工作表的电子表格由多个进程并行排版
+XLSX_PARALLEL_BYTES = 1024 * 1024
+# 图片嵌入PDF时的默认分辨率和JPEG重新压缩的质量
+IMAGE_DPI = 200
+IMAGE_JPEG_QUALITY = 85
+# 相册模式的页边距和图片间距
+ALBUM_MARGIN = 36
+ALBUM_GAP = 12
+# DOCX正文中各种块的名称，用于日志
+DOCX_BLOCK_NAMES = {'paragraph': '段落', 'image': '图片', 'table': '表格'}
+# EXIF中的图片方向标签
+EXIF_ORIENTATION = 0x0112
+# 快速文本模式的字号
+FAST_TEXT_FONT_SIZE = 9
+
+# clean_text 移除的字符：除换行、回车、制表符以外的控制字符，以及零宽和方向控制字符
+INVISIBLE_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\u200b-\u200f\u202a-\u202e\ufeff\u2028\u2029]+')
+# 三个及以上的连续换行
+EXTRA_BLANK_LINES = re.compile(r'\n{3,}')
+
+
+# 流式生成的元素中表示开始新的PDF分卷的标记
+VOLUME_BREAK = object()
+
+
+class FlowableStream(list):
+    """按需从迭代器补充元素的列表"""
+    # doc.build 会不断取出列表头部的元素进行排版，这里在列表为空时才从迭代器中
+    # 取出下一批元素，使内存中只保留少量尚未排版的段落；
+    # 传入 timer（StageTimer）时生成元素的耗时计入 flowables 阶段
+    def __init__(self, iterable, batch_size=200, timer=None):
+        super().__init__()
+        self._iterator = iter(iterable)
+        self._batch_size = batch_size
+        self._timer = timer
+        
+    def __len__(self):
+        if not super().__len__():
+            if self._timer is None:
+                self.extend(itertools.islice(self._iterator, self._batch_size))
+            else:
+                with self._timer.stage('flowables'):
+                    self.extend(itertools.islice(self._iterator, self._batch_size))
+        return super().__len__()
+
+
+class TimedCanvas(canvas.Canvas):
+    """保存PDF（序列化并写入文件）的耗时计入 write 阶段的画布"""
+    
+    def __init__(self, *args, stage_timer=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stage_timer = stage_timer
+        
+    def save(self):
+        with self.stage_timer.stage('write'):
+            super().save()
+
+
+class TimedDocTemplate(SimpleDocTemplate):
+    """排版耗时计入 build 阶段、保存PDF的耗时计入 write 阶段的文档模板"""
+    
+    def __init__(self, filename, stage_timer, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.stage_timer = stage_timer
+        
+    def build(self, flowables, **kwargs):
+        kwargs.setdefault('canvasmaker', functools.partial(TimedCanvas, stage_timer=self.stage_timer))
+        with self.stage_timer.stage('build'):
+            super().build(flowables, **kwargs)
+
+
+# 并行排版工作表的进程中的转换器，以及最近打开的工作簿 (路径, 工作簿)
+_sheet_converter = None
+_sheet_workbook = (None, None)
+
+
+def _init_sheet_worker(options, log_level):
+    """工作表排版进程初始化：使用主进程的日志级别并创建相同配置的转换器"""
+    global _sheet_converter
+    setup_worker_logging(log_level)
+    _sheet_converter = PDFConverter(**options)
+
+
+def _render_sheet_in_worker(job):
+    """在工作表排版进程中排版一个工作表，同一工作簿只打开一次"""
+    global _sheet_workbook
+    input_path, index, output_path = job
+    if _sheet_workbook[0] != input_path:
+        from openpyxl import load_workbook
+        _sheet_workbook = (input_path, load_workbook(input_path, read_only=True))
+    return _sheet_converter.render_sheet(_sheet_workbook[1], index, output_path)
+
 
 class PDFConverter:
-    def __init__(self):
+    def __init__(self, fast_text_extensions=(), font_paths=(), compact=False, no_embed_font=False,
+                 image_dpi=IMAGE_DPI, jpeg_quality=IMAGE_JPEG_QUALITY, album_per_page=1,
+                 sheet_workers=None, office_workers=OFFICE_WORKERS, office_timeout=OFFICE_TIMEOUT,
+                 office_pool=None, profile=False, profile_dir=None):
         self.cancel_flag = False
+        # 为每个文件记录 cProfile 结果，保留最慢的文件的结果（批量转换时 profile_dir 由 run_batch 设置）
+        self.profile = profile
+        self.profile_dir = profile_dir
+        self.profiles = None  # ProfileKeeper
+        # 转换旧版Office文件的常驻辅助进程数和单个文件的超时时间（秒）
+        self.office_workers = office_workers
+        self.office_timeout = office_timeout
+        # 旧版Office文件的转换进程池，批量转换时由主进程共享给工作进程，否则在首次使用时创建
+        self.office_pool = office_pool
+        # 并行排版电子表格工作表的最大进程数（None为CPU核心数，1为逐个排版）
+        self.sheet_workers = sheet_workers
+        # 批量转换时由工作进程按当前空闲的CPU核心数设置的进程数上限
+        self.sheet_worker_limit = None
+        # 相册模式每页排列的图片数
+        self.album_per_page = max(1, album_per_page)
+        # 图片缩小到的目标分辨率（为0时保留原始像素）和重新压缩JPEG的质量
+        self.image_dpi = image_dpi
+        self.jpeg_quality = jpeg_quality
+        # 紧凑输出模式：以二进制写入数据流，减小输出文件（嵌入的字体本身只包含用到的字形）
+        self.compact = compact
+        # 不嵌入中文字体，使用阅读器自带的宋体显示（显示效果取决于阅读器）
+        self.no_embed_font = no_embed_font
+        # 额外的字体搜索路径（目录或字体文件），优先于系统字体目录
+        self.font_paths = tuple(font_paths)
+        # 使用快速文本模式（等宽排版，不经过Platypus）转换的扩展名
+        self.fast_text_extensions = {ext.lower() for ext in fast_text_extensions}
         self.logger = logging.getLogger(__name__)
+        self.encoding_detector = EncodingDetector()
+        self.file_info = {}  # 当前文件的转换信息（编码、检测耗时等），输出到转换日志
+        self.timer = StageTimer()  # 当前文件各阶段的耗时
+        self.char_widths = {}  # (字体, 字号) -> {字符: 宽度}，折行时使用
         self.setup_fonts()
         self.setup_styles()
         self.setup_mime_types()
         
+    def cancel_conversion(self):
+        """取消正在进行的转换"""
+        self.cancel_flag = True
+        
     def setup_fonts(self):
         """设置字体"""
+        # 字体在进程内只查找和解析一次，多个转换器共享
+        self.font_registry = get_font_registry(self.font_paths)
         try:
-            # 注册中文字体（如果系统中有的话）
-            font_paths = [
-                "C:/Windows/Fonts/msyh.ttf",  # 微软雅黑
-                "C:/Windows/Fonts/simsun.ttc", # 宋体
-                "C:/Windows/Fonts/simhei.ttf", # 黑体
-                "C:/Windows/Fonts/STSONG.TTF", # 华文宋体
-                "C:/Windows/Fonts/STKAITI.TTF", # 华文楷体
-            ]
-            
-            for font_path in font_paths:
-                if os.path.exists(font_path):
-                    font_name = os.path.splitext(os.path.basename(font_path))[0]
-                    try:
-                        pdfmetrics.registerFont(TTFont(font_name, font_path))
-                        self.default_font = font_name
-                        self.logger.info(f"成功注册字体: {font_name}")
-                        return
-                    except Exception as e:
-                        self.logger.warning(f"注册字体失败 {font_name}: {str(e)}")
-                        continue
-                        
-            # 如果没有找到中文字体，使用默认的Helvetica
-            self.default_font = 'Helvetica'
-            self.logger.warning("未找到中文字体，使用Helvetica")
+            if self.no_embed_font:
+                self.default_font = self.font_registry.no_embed_font()
+            else:
+                self.default_font = self.font_registry.default_font()
         except Exception as e:
             self.logger.warning(f"字体设置失败: {str(e)}")
             self.default_font = 'Helvetica'
             
     def setup_styles(self):
         """设置PDF样式"""
-        self.styles = getSampleStyleSheet()
-        # 添加自定义样式
-        self.styles.add(ParagraphStyle(
-            name='Custom',
-            parent=self.styles['Normal'],
-            fontSize=10,
-            leading=14,
-            firstLineIndent=0,
-            fontName=self.default_font,
-            wordWrap='CJK',  # 支持中文换行
-            encoding='utf-8',
-            allowWidows=0,
-            allowOrphans=0,
-            alignment=0,  # 左对齐
-        ))
+        self.styles = self.font_registry.stylesheet(self.default_font)
+        
+    def worker_options(self):
+        """在工作进程中创建相同配置的转换器所需的参数"""
+        return {'fast_text_extensions': sorted(self.fast_text_extensions),
+                'font_paths': self.font_paths,
+                'compact': self.compact,
+                'no_embed_font': self.no_embed_font,
+                'image_dpi': self.image_dpi,
+                'jpeg_quality': self.jpeg_quality,
+                'album_per_page': self.album_per_page,
+                'sheet_workers': self.sheet_workers,
+                'office_workers': self.office_workers,
+                'office_timeout': self.office_timeout,
+                'profile': self.profile,
+                'profile_dir': self.profile_dir,
+                # 只有管理进程中的共享进程池可以传给工作进程
+                'office_pool': self.office_pool if isinstance(self.office_pool, BaseProxy) else None}
         
+    def settings_signature(self):
+        """影响转换结果的版本和设置，用于判断已有的PDF是否仍然有效"""
+        fast_text = ','.join(sorted(self.fast_text_extensions))
+        return (f"{CONVERTER_VERSION}|font={self.default_font}|fast_text={fast_text}"
+                f"|compact={int(self.compact)}|image={self.image_dpi}dpi,q{self.jpeg_quality}"
+                f"|album={self.album_per_page}|office={office_backend_name()}")
+        
+    def cache_signature(self, input_path):
+        """转换缓存使用的设置签名：扩展名决定使用的转换器，按未知类型转换的文件在PDF中写入文件名"""
+        name = os.path.basename(input_path)
+        ext = os.path.splitext(name)[1].lower()
+        signature = f"{self.settings_signature()}|ext={ext}"
+        if ext not in self.supported_extensions and ext not in self.fast_text_extensions:
+            signature += f"|name={name}"
+        return signature
+        
+    @timed('clean')
     def clean_text(self, text):
         """清理文本内容"""
         if not text:
             return ""
             
         try:
-            # 移除零宽字符和其他不可见字符
-            text = re.sub(r'[\u200b-\u200f\u202a-\u202e\ufeff\u2028\u2029]', '', text)
-            
-            # 移除控制字符，但保留换行和制表符
-            text = ''.join(char for char in text if ord(char) >= 32 or char in '\n\r\t')
-            
-            # 处理特殊字符
-            text = text.replace('\x00', '')  # 移除 null 字符
+            # 一次移除零宽字符、方向控制字符和控制字符（包括 null 字符），保留换行、回车和制表符
+            text = INVISIBLE_CHARS.sub('', text)
             
             # 统一换行符
             text = text.replace('\r\n', '\n').replace('\r', '\n')
             
             # 移除连续的空行，但保留段落格式
-            text = re.sub(r'\n{3,}', '\n\n', text)
+            text = EXTRA_BLANK_LINES.sub('\n\n', text)
             
-            # 确保文本是有效的UTF-8
+            # 确保文本是有效的UTF-8（移除孤立的代理字符）
             text = text.encode('utf-8', errors='ignore').decode('utf-8')
             
             # 移除行尾空白字符
-            lines = [line.rstrip() for line in text.split('\n')]
-            text = '\n'.join(lines)
+            text = '\n'.join([line.rstrip() for line in text.split('\n')])
             
             return text.strip()
         except Exception as e:
@@ -114,34 +278,21 @@ class PDFConverter:
         """尝试以文本方式读取文件内容"""
         try:
             # 首先尝试使用二进制模式读取文件
-            with open(file_path, 'rb') as f:
+            with self.timer.stage('read'), open(file_path, 'rb') as f:
                 raw_data = f.read()
                 
-            # 检测编码
-            result = chardet.detect(raw_data)
-            
-            # 尝试不同的编码
-            encodings = [
-                result['encoding'] if result['confidence'] > 0.7 else None,
-                'utf-8-sig',  # 处理带BOM的UTF-8
-                'utf-8',
-                'gbk',
-                'gb2312',
-                'gb18030',
-                'big5',
-                'ascii'
-            ]
-            
-            # 过滤掉None值
-            encodings = [enc for enc in encodings if enc]
-            
-            # 记录尝试的编码
-            self.logger.info(f"尝试编码: {encodings}")
+            # 检测编码，检测结果失效时再依次尝试常见编码
+            detected = self.detect_encoding(file_path, raw_data)
+            encodings = [detected] if detected else []
+            encodings += [enc for enc in FALLBACK_ENCODINGS if enc != detected]
             
             for enc in encodings:
                 try:
-                    text = raw_data.decode(enc)
-                    self.logger.info(f"成功使用编码 {enc}")
+                    with self.timer.stage('read'):
+                        text = raw_data.decode(enc)
+                    if enc != detected:
+                        self.logger.info(f"成功使用编码 {enc}")
+                        self.file_info['encoding'] = enc
                     return self.clean_text(text)
                 except Exception as e:
                     self.logger.debug(f"使用编码 {enc} 失败: {str(e)}")
@@ -154,6 +305,94 @@ class PDFConverter:
         except Exception as e:
             raise Exception(f"无法读取文件内容: {str(e)}")
             
+    @timed('detect')
+    def detect_encoding(self, file_path, raw_data=None):
+        """检测文件编码并记录检测耗时，未传入文件内容时只读取采样窗口"""
+        start = time.perf_counter()
+        encoding, method = self.encoding_detector.detect(file_path, raw_data)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        
+        self.file_info['encoding'] = encoding or '未知'
+        self.file_info['detect_ms'] = round(elapsed_ms, 2)
+        self.logger.info(f"检测到编码 {encoding}（{method}，耗时 {elapsed_ms:.2f}ms）: {file_path}")
+        return encoding
+        
+    def iter_text_lines(self, file_path, encoding):
+        """逐行增量解码并清理文本，跳过空行，超长的行按固定长度拆分"""
+        with open(file_path, 'r', encoding=encoding, errors='replace') as f:
+            for line in self.timer.iterate(iter(lambda: f.readline(STREAM_LINE_CHARS), ''), 'read'):
+                line = self.clean_text(line)
+                if line:
+                    yield line
+                    
+    def convert_text_stream(self, input_path, output_path, style, spacing=0, header=()):
+        """流式转换大文本文件"""
+        # 段落在排版时才按需生成，内容超过 STREAM_VOLUME_CHARS 后写入新的分卷
+        # （xxx.part2.pdf 等），使峰值内存保持恒定
+        encoding = self.detect_encoding(input_path) or 'utf-8'
+        self.logger.info(f"流式转换，使用编码 {encoding}: {input_path}")
+        lines = self.iter_text_lines(input_path, encoding)
+        
+        first_line = next(lines, None)
+        if first_line is None:
+            self.logger.warning(f"文件无有效内容，已跳过: {input_path}")
+            return False
+            
+        def flowables():
+            yield from header
+            size = 0
+            for line in itertools.chain([first_line], lines):
+                if size >= STREAM_VOLUME_CHARS:
+                    yield VOLUME_BREAK
+                    size = 0
+                size += len(line)
+                yield Paragraph(html.escape(line), style)
+                if spacing:
+                    yield Spacer(1, spacing)
+                    
+        volumes = self.build_volumes(output_path, flowables())
+        if volumes > 1:
+            self.logger.info(f"文件较大，已拆分为 {volumes} 个PDF: {input_path}")
+        return True
+        
+    def build_volumes(self, output_path, flowables):
+        """将流式生成的元素写入PDF，遇到 VOLUME_BREAK 时开始新的分卷，返回分卷数"""
+        base, ext = os.path.splitext(output_path)
+        flowables = iter(flowables)
+        volume = 0
+        has_more = True
+        
+        def until_break():
+            nonlocal has_more
+            for flowable in flowables:
+                if flowable is VOLUME_BREAK:
+                    return
+                yield flowable
+            has_more = False
+            
+        while has_more:
+            volume += 1
+            volume_path = output_path if volume == 1 else f"{base}.part{volume}{ext}"
+            self.create_document(volume_path).build(FlowableStream(until_break(), timer=self.timer))
+        return volume
+        
+    def create_document(self, output_path):
+        """创建A4页面的PDF文档模板，排版和保存的耗时分别计入 build 和 write 阶段"""
+        return TimedDocTemplate(
+            output_path,
+            self.timer,
+            pagesize=A4,
+            rightMargin=72,
+            leftMargin=72,
+            topMargin=72,
+            bottomMargin=72,
+            encoding='utf-8'
+        )
+        
+    def frame_size(self):
+        """create_document 生成的文档中可用于排版的宽度和高度（页面减去页边距和框架内边距）"""
+        return A4[0] - 144 - 12, A4[1] - 144 - 12
+        
     def create_paragraph(self, text, style):
         """创建段落，处理特殊字符"""
         try:
@@ -177,28 +416,6 @@ class PDFConverter:
     def convert_unknown_file(self, input_path, output_path):
         """转换未知类型的文件"""
         try:
-            # 尝试读取文件内容
-            content = self.try_read_as_text(input_path)
-            
-            # 如果内容为空，跳过此文件
-            if not content or not content.strip():
-                self.logger.warning(f"文件内容为空，已跳过: {input_path}")
-                return False
-                
-            # 创建PDF文档
-            doc = SimpleDocTemplate(
-                output_path,
-                pagesize=A4,
-                rightMargin=72,
-                leftMargin=72,
-                topMargin=72,
-                bottomMargin=72,
-                encoding='utf-8'
-            )
-            
-            # 创建内容
-            story = []
-            
             # 添加文件信息
             info_style = ParagraphStyle(
                 'InfoStyle',
@@ -215,8 +432,7 @@ class PDFConverter:
             
             # 添加文件信息
             file_info = f"原始文件: {os.path.basename(input_path)}"
-            story.append(Paragraph(file_info, info_style))
-            story.append(Spacer(1, 20))
+            header = [Paragraph(file_info, info_style), Spacer(1, 20)]
             
             # 添加文件内容
             content_style = ParagraphStyle(
@@ -227,20 +443,40 @@ class PDFConverter:
                 fontName=self.default_font
             )
             
+            # 大文件使用流式转换
+            if os.path.getsize(input_path) > STREAMING_THRESHOLD:
+                return self.convert_text_stream(input_path, output_path, content_style,
+                                                spacing=6, header=header)
+                                                
+            # 尝试读取文件内容
+            content = self.try_read_as_text(input_path)
+            
+            # 如果内容为空，跳过此文件
+            if not content or not content.strip():
+                self.logger.warning(f"文件内容为空，已跳过: {input_path}")
+                return False
+                
+            # 创建PDF文档
+            doc = self.create_document(output_path)
+            
+            # 创建内容
+            story = list(header)
+            
             # 处理内容
             valid_content = False  # 用于标记是否有有效内容
-            for line in content.split('\n'):
-                if line.strip():
-                    try:
-                        # 转义特殊字符
-                        line = html.escape(line)
-                        story.append(Paragraph(line, content_style))
-                        story.append(Spacer(1, 6))
-                        valid_content = True
-                    except Exception as e:
-                        self.logger.warning(f"处理行失败: {str(e)}")
-                        continue
-                        
+            with self.timer.stage('flowables'):
+                for line in content.split('\n'):
+                    if line.strip():
+                        try:
+                            # 转义特殊字符
+                            line = html.escape(line)
+                            story.append(Paragraph(line, content_style))
+                            story.append(Spacer(1, 6))
+                            valid_content = True
+                        except Exception as e:
+                            self.logger.warning(f"处理行失败: {str(e)}")
+                            continue
+                            
             # 如果没有有效内容，返回False
             if not valid_content:
                 self.logger.warning(f"文件无有效内容，已跳过: {input_path}")
@@ -259,11 +495,11 @@ class PDFConverter:
             # 文档
             '.txt': self.convert_text,
             '.docx': self.convert_docx,
-            '.doc': self.convert_docx,
+            '.doc': self.convert_legacy_office,
             '.xlsx': self.convert_xlsx,
-            '.xls': self.convert_xlsx,
+            '.xls': self.convert_legacy_office,
             '.pptx': self.convert_pptx,
-            '.ppt': self.convert_pptx,
+            '.ppt': self.convert_legacy_office,
             # 图片
             '.jpg': self.convert_image,
             '.jpeg': self.convert_image,
@@ -278,6 +514,20 @@ class PDFConverter:
     def convert_text(self, input_path, output_path):
         """转换文本文件为PDF"""
         try:
+            style = ParagraphStyle(
+                'CustomText',
+                parent=self.styles['Custom'],
+                fontName=self.default_font,
+                fontSize=10,
+                leading=14,
+                spaceBefore=6,
+                spaceAfter=6
+            )
+            
+            # 大文件使用流式转换
+            if os.path.getsize(input_path) > STREAMING_THRESHOLD:
+                return self.convert_text_stream(input_path, output_path, style)
+                
             # 读取文件内容
             content = self.try_read_as_text(input_path)
             
@@ -287,40 +537,24 @@ class PDFConverter:
                 return False
                 
             # 创建PDF文档
-            doc = SimpleDocTemplate(
-                output_path,
-                pagesize=A4,
-                rightMargin=72,
-                leftMargin=72,
-                topMargin=72,
-                bottomMargin=72,
-                encoding='utf-8'
-            )
+            doc = self.create_document(output_path)
             
             story = []
-            style = ParagraphStyle(
-                'CustomText',
-                parent=self.styles['Custom'],
-                fontName=self.default_font,
-                fontSize=10,
-                leading=14,
-                spaceBefore=6,
-                spaceAfter=6
-            )
             
             # 处理内容
             valid_content = False  # 用于标记是否有有效内容
-            for line in content.split('\n'):
-                if line.strip():
-                    try:
-                        # 转义特殊字符
-                        line = html.escape(line)
-                        story.append(Paragraph(line, style))
-                        valid_content = True
-                    except Exception as e:
-                        self.logger.warning(f"处理行失败: {str(e)}")
-                        continue
-                        
+            with self.timer.stage('flowables'):
+                for line in content.split('\n'):
+                    if line.strip():
+                        try:
+                            # 转义特殊字符
+                            line = html.escape(line)
+                            story.append(Paragraph(line, style))
+                            valid_content = True
+                        except Exception as e:
+                            self.logger.warning(f"处理行失败: {str(e)}")
+                            continue
+                            
             # 如果没有有效内容，返回False
             if not valid_content:
                 self.logger.warning(f"文件无有效内容，已跳过: {input_path}")
@@ -333,153 +567,351 @@ class PDFConverter:
             self.logger.error(f"转换文本文件失败: {str(e)}")
             return False
             
-    def convert_docx(self, input_path, output_path):
-        """转换DOCX文件为PDF"""
+    def convert_text_fast(self, input_path, output_path):
+        """使用画布文本对象快速转换文本文件，保留原有的缩进和空行"""
         try:
-            doc = Document(input_path)
-            pdf_doc = SimpleDocTemplate(
-                output_path,
-                pagesize=A4,
-                rightMargin=72,
-                leftMargin=72,
-                topMargin=72,
-                bottomMargin=72,
-                encoding='utf-8'
-            )
+            encoding = self.detect_encoding(input_path) or 'utf-8'
             
-            story = []
+            # 没有中文字体时使用等宽的Courier
+            font_name = self.default_font if self.default_font != 'Helvetica' else 'Courier'
+            font_size = FAST_TEXT_FONT_SIZE
+            leading = font_size * 1.25
+            page_width, page_height = A4
+            margin = 54
+            max_width = page_width - 2 * margin
+            lines_per_page = int((page_height - 2 * margin) // leading)
             
-            # 处理段落
-            for paragraph in doc.paragraphs:
-                if paragraph.text.strip():
-                    try:
-                        text = html.escape(paragraph.text)
-                        p = Paragraph(text, self.styles['Normal'])
-                        story.append(p)
-                        story.append(Spacer(1, 6))
-                    except Exception as e:
-                        self.logger.warning(f"处理段落失败: {str(e)}")
-                        continue
-                    
-            # 处理表格
-            for table in doc.tables:
-                try:
-                    data = []
-                    for row in table.rows:
-                        row_data = []
-                        for cell in row.cells:
-                            # 转义特殊字符
-                            text = html.escape(cell.text.strip())
-                            row_data.append(text)
-                        data.append(row_data)
-                        
-                    if data:
-                        table_style = TableStyle([
-                            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                            ('FONTNAME', (0, 0), (-1, 0), self.default_font),
-                            ('FONTSIZE', (0, 0), (-1, 0), 10),
-                            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-                            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                        ])
+            base, ext = os.path.splitext(output_path)
+            volume = 1
+            pdf = None
+            written = 0
+            line_count = 0
+            text = None
+            has_content = False
+            
+            # 逐行排版文本对象的耗时计入 flowables 阶段
+            with open(input_path, 'r', encoding=encoding, errors='replace') as f, self.timer.stage('flowables'):
+                for raw_line in iter(lambda: f.readline(STREAM_LINE_CHARS), ''):
+                    line = INVISIBLE_CHARS.sub('', raw_line).rstrip().expandtabs(4)
+                    has_content = has_content or bool(line)
+                    for part in self.wrap_line(line, font_name, font_size, max_width):
+                        if pdf is None:
+                            # 内容过多时写入新的分卷，限制内存中累积的页面
+                            volume_path = output_path if volume == 1 else f"{base}.part{volume}{ext}"
+                            pdf = TimedCanvas(volume_path, pagesize=A4, stage_timer=self.timer)
+                        if text is None:
+                            text = pdf.beginText(margin, page_height - margin - font_size)
+                            text.setFont(font_name, font_size, leading)
+                        text.textLine(part)
+                        written += len(part) + 1
+                        line_count += 1
                         
-                        pdf_table = Table(data)
-                        pdf_table.setStyle(table_style)
-                        story.append(pdf_table)
-                        story.append(Spacer(1, 12))
-                except Exception as e:
-                    self.logger.warning(f"处理表格失败: {str(e)}")
-                    continue
-                    
-            # 生成PDF
-            pdf_doc.build(story)
+                        # 分页
+                        if line_count >= lines_per_page:
+                            pdf.drawText(text)
+                            pdf.showPage()
+                            text = None
+                            line_count = 0
+                            if written >= STREAM_VOLUME_CHARS:
+                                pdf.save()
+                                pdf = None
+                                written = 0
+                                volume += 1
+                                
+            # 如果没有有效内容，返回False
+            if not has_content:
+                self.logger.warning(f"文件内容为空，已跳过: {input_path}")
+                return False
+            if pdf is not None:
+                if text is not None:
+                    pdf.drawText(text)
+                pdf.save()
+            return True
+        except Exception as e:
+            self.logger.error(f"快速转换文本文件失败: {str(e)}")
+            return False
+            
+    def wrap_line(self, line, font_name, font_size, max_width):
+        """按页面宽度拆分过长的行"""
+        if font_name == 'Courier':
+            # 等宽字体的字宽固定为字号的0.6倍，直接按字符数拆分
+            max_chars = int(max_width // (font_size * 0.6))
+            return [line[i:i + max_chars] for i in range(0, len(line), max_chars)] or ['']
+        if not line or pdfmetrics.stringWidth(line, font_name, font_size) <= max_width:
+            return [line]
+        parts = []
+        start = 0
+        width = 0
+        # 逐字符测量时使用按字体缓存的字符宽度，避免对每个字符调用 stringWidth
+        char_widths = self.char_widths.setdefault((font_name, font_size), {})
+        for index, char in enumerate(line):
+            char_width = char_widths.get(char)
+            if char_width is None:
+                char_width = char_widths[char] = pdfmetrics.stringWidth(char, font_name, font_size)
+            if width + char_width > max_width and index > start:
+                parts.append(line[start:index])
+                start = index
+                width = 0
+            width += char_width
+        parts.append(line[start:])
+        return parts
+        
+    def convert_docx(self, input_path, output_path):
+        """转换DOCX文件为PDF
+        
+        按文档顺序流式读取正文中的段落和表格并逐个生成排版元素，
+        不载入完整的文档对象模型。
+        """
+        try:
+            # 图片按部件名称只读取和解码一次
+            with zipfile.ZipFile(input_path) as archive, EmbeddedImageCache(self, *self.frame_size()) as images:
+                self.create_document(output_path).build(
+                    FlowableStream(self.iter_docx_flowables(input_path, images, archive.read), timer=self.timer))
             return True
         except Exception as e:
             self.logger.error(f"转换DOCX文件失败: {str(e)}")
             return False
             
+    def iter_docx_flowables(self, input_path, images, read_part):
+        """按文档顺序生成DOCX正文的段落、图片和表格，read_part 按名称读取压缩包中的部件"""
+        table_style = TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ])
+        style = self.styles['Custom']
+        frame_width = self.frame_size()[0]
+        
+        for kind, content in iter_docx_blocks(input_path):
+            try:
+                if kind == 'paragraph':
+                    if content.strip():
+                        # 转义特殊字符，保留段落内的换行
+                        text = html.escape(self.clean_text(content)).replace('\n', '<br/>')
+                        yield Paragraph(text, style)
+                        yield Spacer(1, 6)
+                elif kind == 'image':
+                    part_name, width, height = content
+                    image = images.flowable(part_name, lambda: read_part(part_name), width, height)
+                    if image is not None:
+                        yield image
+                        yield Spacer(1, 6)
+                elif any(content):
+                    # 单元格使用可折行的段落，各列平分页面宽度
+                    width = max(len(row) for row in content)
+                    data = [[Paragraph(html.escape(self.clean_text(text)).replace('\n', '<br/>'), style)
+                             for text in row + [''] * (width - len(row))]
+                            for row in content]
+                    pdf_table = Table(data, colWidths=[frame_width / width] * width, repeatRows=1)
+                    pdf_table.setStyle(table_style)
+                    yield pdf_table
+                    yield Spacer(1, 12)
+            except Exception as e:
+                self.logger.warning(f"处理{DOCX_BLOCK_NAMES[kind]}失败: {str(e)}")
+                
     def convert_xlsx(self, input_path, output_path):
-        """转换XLSX文件为PDF"""
+        """转换XLSX文件为PDF
+        
+        每个工作表单独排版为临时PDF，再按工作表顺序合并并为每个工作表添加书签。
+        工作表较多且文件较大时由多个进程并行排版，无法并行时逐个排版。
+        """
+        sheet_count = 0
         try:
-            wb = load_workbook(input_path)
-            pdf_doc = SimpleDocTemplate(
-                output_path,
-                pagesize=A4,
-                rightMargin=72,
-                leftMargin=72,
-                topMargin=72,
-                bottomMargin=72,
-                encoding='utf-8'
-            )
-            
-            story = []
-            
-            for sheet in wb:
-                try:
-                    # 添加工作表标题
-                    title = Paragraph(f"<b>{html.escape(sheet.title)}</b>", self.styles['Heading1'])
-                    story.append(title)
-                    story.append(Spacer(1, 12))
-                    
-                    # 获取数据范围
-                    min_row = sheet.min_row
-                    max_row = min(sheet.max_row, 1000)  # 限制最大行数
-                    min_col = sheet.min_column
-                    max_col = min(sheet.max_column, 20)  # 限制最大列数
-                    
-                    # 提取数据
-                    data = []
-                    for row in range(min_row, max_row + 1):
-                        row_data = []
-                        for col in range(min_col, max_col + 1):
-                            cell = sheet.cell(row, col)
-                            value = str(cell.value if cell.value is not None else '')
-                            # 转义特殊字符
-                            value = html.escape(value)
-                            row_data.append(value)
-                        data.append(row_data)
-                        
-                    if data:
-                        # 创建表格样式
-                        table_style = TableStyle([
-                            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                            ('FONTNAME', (0, 0), (-1, 0), self.default_font),
-                            ('FONTSIZE', (0, 0), (-1, 0), 10),
-                            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                            ('BACKGROUND', (0, 0), (-1, 0), colors.grey90),
-                            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-                            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                        ])
-                        
-                        # 创建表格
-                        pdf_table = Table(data)
-                        pdf_table.setStyle(table_style)
-                        story.append(pdf_table)
-                        story.append(Spacer(1, 20))
-                except Exception as e:
-                    self.logger.warning(f"处理工作表 {sheet.title} 失败: {str(e)}")
-                    continue
-                    
-            # 生成PDF
-            pdf_doc.build(story)
+            from openpyxl import load_workbook
+            # 只读模式逐行读取，不把整个工作簿载入内存
+            wb = load_workbook(input_path, read_only=True)
+            try:
+                sheet_names = wb.sheetnames
+                sheet_count = len(sheet_names)
+                if not sheet_names:
+                    self.logger.error(f"工作簿中没有工作表: {input_path}")
+                    return False
+                volumes = None
+                workers = self.sheet_worker_count(input_path, sheet_count)
+                if workers > 1:
+                    sheets = self.render_sheets_parallel(input_path, output_path, sheet_count, workers)
+                    try:
+                        volumes = self.merge_sheets(output_path, sheet_names, sheets)
+                    except Exception as e:
+                        self.logger.warning(f"并行排版工作表失败，改为逐个排版: {str(e)}")
+                    finally:
+                        # 结束进程池
+                        sheets.close()
+                if volumes is None:
+                    sheets = (self.render_sheet(wb, index, self.sheet_output_path(output_path, index))
+                              for index in range(sheet_count))
+                    volumes = self.merge_sheets(output_path, sheet_names, sheets)
+            finally:
+                wb.close()
+            if volumes > 1:
+                self.logger.info(f"表格较大，已拆分为 {volumes} 个PDF: {input_path}")
             return True
         except Exception as e:
             self.logger.error(f"转换XLSX文件失败: {str(e)}")
             return False
+        finally:
+            # 删除出错时残留的工作表临时PDF
+            for index in range(sheet_count):
+                for path in output_volumes(self.sheet_output_path(output_path, index)):
+                    if os.path.exists(path):
+                        os.remove(path)
+                        
+    def sheet_output_path(self, output_path, index):
+        """工作表临时PDF的路径"""
+        base, ext = os.path.splitext(output_path)
+        return f"{base}.sheet{index + 1}{ext}"
+        
+    def sheet_worker_count(self, input_path, sheet_count):
+        """并行排版工作表的进程数，为1时逐个排版"""
+        if sheet_count < 2 or os.path.getsize(input_path) < XLSX_PARALLEL_BYTES:
+            return 1
+        # 守护进程（如工作表排版进程）不能再创建子进程
+        if multiprocessing.current_process().daemon:
+            return 1
+        workers = min(self.sheet_workers or os.cpu_count() or 1, sheet_count)
+        if self.sheet_worker_limit:
+            # 批量转换时只使用其他文件用不到的CPU核心
+            workers = min(workers, self.sheet_worker_limit)
+        return max(1, workers)
+        
+    def render_sheets_parallel(self, input_path, output_path, sheet_count, workers):
+        """由进程池按顺序排版所有工作表，依次生成每个工作表的临时PDF分卷列表"""
+        ctx = multiprocessing.get_context('spawn')
+        pool = ctx.Pool(processes=workers, initializer=_init_sheet_worker,
+                        initargs=(self.worker_options(), logging.getLogger().getEffectiveLevel()))
+        try:
+            jobs = [(input_path, index, self.sheet_output_path(output_path, index))
+                    for index in range(sheet_count)]
+            yield from pool.imap(_render_sheet_in_worker, jobs, chunksize=1)
+        finally:
+            pool.terminate()
+            pool.join()
             
+    def render_sheet(self, wb, index, output_path):
+        """将一个工作表排版为PDF（行数较多时拆分为多个分卷），返回分卷路径列表"""
+        with self.stream_encoding():
+            volumes = self.build_volumes(output_path, self.iter_sheet_flowables(wb.worksheets[index]))
+        return output_volumes(output_path)[:volumes]
+        
+    def merge_sheets(self, output_path, sheet_names, sheets):
+        """按顺序将工作表的临时PDF合并到输出PDF，以工作表名称作为书签，返回输出的分卷数"""
+        name = os.path.splitext(os.path.basename(output_path))[0]
+        merged = PDFBundle(os.path.dirname(output_path), name)
+        try:
+            for sheet_name, volumes in zip(sheet_names, sheets):
+                merged.append(sheet_name, volumes)
+                for path in volumes:
+                    os.remove(path)
+        finally:
+            paths = merged.close()
+        return len(paths)
+        
+    def iter_sheet_flowables(self, sheet):
+        """生成一个工作表的标题和表格，每 XLSX_VOLUME_ROWS 行插入分卷标记"""
+        table_style = TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('FONTNAME', (0, 0), (-1, -1), self.default_font),
+            ('FONTSIZE', (0, 0), (-1, -1), XLSX_FONT_SIZE),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e6e6e6')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ])
+        volume_rows = 0
+        
+        # 添加工作表标题
+        yield Paragraph(f"<b>{html.escape(sheet.title)}</b>", self.styles['Heading1'])
+        yield Spacer(1, 12)
+        
+        try:
+            rows = sheet.iter_rows(values_only=True)
+            header = None
+            widths = None
+            chunk = []
+            tables = 0
+            for row in rows:
+                values = ['' if value is None else str(value) for value in row]
+                if header is None:
+                    header = values
+                    continue
+                chunk.append(values)
+                if len(chunk) >= XLSX_TABLE_ROWS:
+                    if volume_rows >= XLSX_VOLUME_ROWS:
+                        yield VOLUME_BREAK
+                        volume_rows = 0
+                    if widths is None:
+                        # 列宽只根据表头和第一批行计算，之后的表格沿用
+                        widths = self.column_widths([header] + chunk)
+                    yield from self.sheet_tables(header, chunk, table_style, widths)
+                    volume_rows += len(chunk)
+                    tables += 1
+                    chunk = []
+                    
+            # 只有表头的工作表也输出一个表格
+            if header is not None and (chunk or tables == 0):
+                if widths is None:
+                    widths = self.column_widths([header] + chunk)
+                yield from self.sheet_tables(header, chunk, table_style, widths)
+        except Exception as e:
+            self.logger.warning(f"处理工作表 {sheet.title} 失败: {str(e)}")
+            
+    def column_widths(self, rows):
+        """根据采样行中每列最宽的内容计算列宽（不含单元格内边距）"""
+        widths = []
+        for row in rows:
+            for column, text in enumerate(row):
+                # 超长的内容会折行，只需测量开头部分
+                width = pdfmetrics.stringWidth(text[:XLSX_MEASURE_CHARS], self.default_font, XLSX_FONT_SIZE)
+                if column >= len(widths):
+                    widths.append(width)
+                elif width > widths[column]:
+                    widths[column] = width
+        return widths
+        
+    def sheet_tables(self, header, rows, table_style, widths):
+        """将一批行生成表格，列数过多时按列拆分为多个表格，每个表格都重复表头
+        
+        列宽使用预先计算的宽度，Table 不再逐个测量单元格；
+        超过 XLSX_MAX_COLUMN_WIDTH 的列按该宽度折行。
+        """
+        data = [header] + rows
+        width = max(len(row) for row in data)
+        # 采样中为空的列也保留两个字的宽度，之后出现的内容按此宽度折行
+        text_widths = [min(max(widths[column] if column < len(widths) else 0, 2 * XLSX_FONT_SIZE),
+                           XLSX_MAX_COLUMN_WIDTH)
+                       for column in range(width)]
+        for start in range(0, width, XLSX_TABLE_COLUMNS):
+            end = min(start + XLSX_TABLE_COLUMNS, width)
+            table_data = [[self.fit_cell(text, text_widths[start + column])
+                           for column, text in enumerate((row + [''] * (width - len(row)))[start:end])]
+                          for row in data]
+            if width > XLSX_TABLE_COLUMNS:
+                yield Paragraph(f"第 {start + 1}-{end} 列", self.styles['Custom'])
+            col_widths = [w + 2 * XLSX_CELL_PADDING for w in text_widths[start:end]]
+            table = Table(table_data, colWidths=col_widths, repeatRows=1)
+            table.setStyle(table_style)
+            yield table
+            yield Spacer(1, 12)
+            
+    def fit_cell(self, text, max_width):
+        """将超出列宽的单元格内容按列宽折行"""
+        # 字符宽度不超过字号，字符数足够少时无需测量
+        if len(text) * XLSX_FONT_SIZE <= max_width:
+            return text
+        lines = []
+        for line in text.split('\n'):
+            lines.extend(self.wrap_line(line, self.default_font, XLSX_FONT_SIZE, max_width))
+        return '\n'.join(lines)
+        
     def convert_pptx(self, input_path, output_path):
         """转换PPTX文件为PDF"""
         try:
+            from pptx import Presentation
+            from pptx.shapes.picture import Picture
             prs = Presentation(input_path)
-            pdf_doc = SimpleDocTemplate(
-                output_path,
-                pagesize=A4,
-                rightMargin=72,
-                leftMargin=72,
-                topMargin=72,
-                bottomMargin=72,
-                encoding='utf-8'
-            )
+            pdf_doc = self.create_document(output_path)
             
             story = []
             slide_style = ParagraphStyle(
@@ -496,72 +928,333 @@ class PDFConverter:
                 fontName=self.default_font
             )
             
-            for idx, slide in enumerate(prs.slides, 1):
-                try:
-                    # 添加幻灯片标题
-                    story.append(Paragraph(f"幻灯片 {idx}", self.styles['Heading1']))
-                    story.append(Spacer(1, 12))
-                    
-                    # 处理形状（包括文本框）
-                    for shape in slide.shapes:
-                        if hasattr(shape, "text") and shape.text.strip():
-                            # 转义特殊字符
-                            text = html.escape(shape.text)
-                            p = Paragraph(text, slide_style)
-                            story.append(p)
+            # 图片按内容哈希只解码一次，每页重复的徽标在PDF中只嵌入一次
+            with EmbeddedImageCache(self, *self.frame_size()) as images:
+                with self.timer.stage('flowables'):
+                    for idx, slide in enumerate(prs.slides, 1):
+                        try:
+                            # 添加幻灯片标题
+                            story.append(Paragraph(f"幻灯片 {idx}", self.styles['Heading1']))
+                            story.append(Spacer(1, 12))
                             
-                    story.append(Spacer(1, 20))
-                except Exception as e:
-                    self.logger.warning(f"处理幻灯片 {idx} 失败: {str(e)}")
-                    continue
-                    
-            # 生成PDF
-            pdf_doc.build(story)
+                            # 处理形状（包括文本框和图片）
+                            for shape in self.iter_slide_shapes(slide.shapes):
+                                if isinstance(shape, Picture):
+                                    image = self.slide_image(shape, images)
+                                    if image is not None:
+                                        story.append(image)
+                                        story.append(Spacer(1, 12))
+                                elif hasattr(shape, "text") and shape.text.strip():
+                                    # 转义特殊字符
+                                    text = html.escape(shape.text)
+                                    p = Paragraph(text, slide_style)
+                                    story.append(p)
+                                    
+                            story.append(Spacer(1, 20))
+                        except Exception as e:
+                            self.logger.warning(f"处理幻灯片 {idx} 失败: {str(e)}")
+                            continue
+                            
+                # 生成PDF（图片的临时文件在生成之后删除）
+                pdf_doc.build(story)
             return True
         except Exception as e:
             self.logger.error(f"转换PPTX文件失败: {str(e)}")
             return False
             
+    def iter_slide_shapes(self, shapes):
+        """依次生成幻灯片中的形状，组合形状展开为其中的形状"""
+        for shape in shapes:
+            if hasattr(shape, "shapes"):
+                yield from self.iter_slide_shapes(shape.shapes)
+            else:
+                yield shape
+                
+    def slide_image(self, shape, images):
+        """生成幻灯片中图片的排版元素，图片为外部链接等无法读取时返回None"""
+        try:
+            image = shape.image
+        except Exception as e:
+            self.logger.warning(f"读取幻灯片图片失败: {str(e)}")
+            return None
+        return images.flowable(image.sha1, lambda: image.blob,
+                               shape.width / EMU_PER_POINT, shape.height / EMU_PER_POINT)
+        
+    def convert_legacy_office(self, input_path, output_path):
+        """通过 LibreOffice 转换旧版Office文件（.doc/.xls/.ppt）"""
+        try:
+            if self.office_pool is None:
+                self.office_pool = OfficePool(self.office_workers, self.office_timeout)
+            with self.timer.stage('office'):
+                self.office_pool.convert(input_path, output_path)
+            return True
+        except Exception as e:
+            self.logger.error(f"转换旧版Office文件失败: {str(e)}")
+            return False
+            
+    def close_office_pool(self):
+        """关闭旧版Office文件的转换进程池"""
+        if self.office_pool is not None:
+            self.office_pool.close()
+            self.office_pool = None
+            
     def convert_image(self, input_path, output_path):
         """转换图片文件为PDF"""
         try:
-            # 打开图片
-            image = Image.open(input_path)
-            
-            # 如果是RGBA模式，转换为RGB
-            if image.mode == 'RGBA':
-                image = image.convert('RGB')
-                
-            # 计算图片在A4页面上的大小
+            # 计算图片在A4页面上的大小（减去边距）
             a4_width, a4_height = A4
-            img_width, img_height = image.size
-            
-            # 计算缩放比例
-            width_ratio = (a4_width - 2*72) / img_width  # 减去左右边距
-            height_ratio = (a4_height - 2*72) / img_height  # 减去上下边距
-            ratio = min(width_ratio, height_ratio)
-            
-            # 计算缩放后的尺寸
-            new_width = img_width * ratio
-            new_height = img_height * ratio
-            
+            image, new_width, new_height = self.load_image(
+                input_path, a4_width - 2*72, a4_height - 2*72)
+                
             # 创建PDF
-            c = canvas.Canvas(output_path, pagesize=A4)
+            c = TimedCanvas(output_path, pagesize=A4, stage_timer=self.timer)
             
             # 计算居中位置
             x = (a4_width - new_width) / 2
             y = (a4_height - new_height) / 2
             
             # 将图片绘制到PDF
-            c.drawImage(input_path, x, y, width=new_width, height=new_height)
+            c.drawImage(image, x, y, width=new_width, height=new_height)
             c.save()
             return True
         except Exception as e:
             self.logger.error(f"转换图片文件失败: {str(e)}")
             return False
             
-    def convert_folder(self, folder_path, log_callback, progress_callback):
+    def convert_album(self, folder_path, output_path):
+        """将目录中的所有图片按自然排序合并为一个PDF，每页排列 album_per_page 张"""
+        # 每张图片解码后立即绘制并释放，每页绘制完成后立即追加到输出文件，
+        # 内存中只保留一张解码的图片和一页的数据
+        try:
+            images = sorted((name for name in os.listdir(folder_path)
+                             if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS),
+                            key=natural_sort_key)
+            per_page = self.album_per_page
+            cols = int(math.sqrt(per_page))
+            rows = math.ceil(per_page / cols)
+            page_width, page_height = A4
+            cell_width = (page_width - 2*ALBUM_MARGIN - (cols - 1)*ALBUM_GAP) / cols
+            cell_height = (page_height - 2*ALBUM_MARGIN - (rows - 1)*ALBUM_GAP) / rows
+            
+            base, _ = os.path.splitext(output_path)
+            album = PDFBundle(os.path.dirname(output_path), os.path.basename(base))
+            loaded = self.iter_album_images(folder_path, images, cell_width, cell_height)
+            drawn = 0
+            while True:
+                buffer = None
+                for index, (name, image, width, height) in enumerate(itertools.islice(loaded, per_page)):
+                    if buffer is None:
+                        buffer = io.BytesIO()
+                        c = TimedCanvas(buffer, pagesize=A4, stage_timer=self.timer)
+                        # 书签标题为该页第一张图片的文件名
+                        title = name
+                    # 在单元格中居中
+                    row, col = divmod(index, cols)
+                    x = ALBUM_MARGIN + col*(cell_width + ALBUM_GAP) + (cell_width - width) / 2
+                    y = (page_height - ALBUM_MARGIN - (row + 1)*cell_height - row*ALBUM_GAP
+                         + (cell_height - height) / 2)
+                    c.drawImage(image, x, y, width=width, height=height)
+                    del image
+                    drawn += 1
+                if buffer is None:
+                    break
+                c.save()
+                album.append_pages(buffer.getvalue(), [title])
+            album.close()
+            
+            if not drawn:
+                self.logger.warning(f"目录中没有可以读取的图片: {folder_path}")
+                return False
+            self.logger.info(f"已将 {drawn} 张图片合并为相册: {output_path}")
+            return True
+        except Exception as e:
+            self.logger.error(f"转换相册失败: {str(e)}")
+            return False
+            
+    def iter_album_images(self, folder_path, names, max_width, max_height):
+        """依次加载相册中的图片，跳过无法读取的文件，生成 (文件名, 图片, 宽度, 高度)"""
+        for name in names:
+            try:
+                image, width, height = self.load_image(os.path.join(folder_path, name),
+                                                       max_width, max_height)
+            except Exception as e:
+                self.logger.warning(f"读取图片失败 {name}: {str(e)}")
+                continue
+            yield name, image, width, height
+            
+    @timed('image')
+    def load_image(self, input_path, max_width, max_height):
+        """按页面区域加载图片，返回 (传给 drawImage 的图片, 绘制宽度, 绘制高度)"""
+        from reportlab.lib.utils import ImageReader
+        image, is_jpeg, new_width, new_height = self.fit_image(input_path, max_width, max_height)
+        if image is None:
+            return input_path, new_width, new_height
+        if is_jpeg:
+            buffer = io.BytesIO()
+            image.save(buffer, 'JPEG', quality=self.jpeg_quality)
+            buffer.seek(0)
+            return ImageReader(buffer), new_width, new_height
+        return ImageReader(image), new_width, new_height
+        
+    @timed('image')
+    def fit_image(self, source, max_width, max_height):
+        """按页面区域解码并缩小图片，返回 (图片, 是否为JPEG, 绘制宽度, 绘制高度)
+        
+        source 为文件路径或文件对象。可以直接嵌入原始数据的JPEG不解码，返回的图片为None。
+        """
+        # 图片只解码一次：尺寸不超过目标DPI的JPEG直接嵌入原始数据，不解码；
+        # 较大的JPEG使用 draft 模式在解码时按1/2、1/4、1/8缩小，再缩放到目标DPI并重新压缩；
+        # 其他格式缩放后无损嵌入
+        from PIL import Image, ImageOps
+        image = Image.open(source)
+        
+        # 按EXIF方向旋转后的尺寸计算布局
+        orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+        img_width, img_height = image.size
+        if orientation in (5, 6, 7, 8):
+            img_width, img_height = img_height, img_width
+            
+        # 计算缩放比例
+        ratio = min(max_width / img_width, max_height / img_height)
+        new_width = img_width * ratio
+        new_height = img_height * ratio
+        
+        # 目标DPI下需要的像素数
+        target = (img_width, img_height)
+        if self.image_dpi:
+            target = (math.ceil(new_width / 72 * self.image_dpi),
+                      math.ceil(new_height / 72 * self.image_dpi))
+        downscale = target[0] < img_width and target[1] < img_height
+        is_jpeg = image.format == 'JPEG'
+        
+        if is_jpeg and not downscale and orientation == 1 and image.mode in ('RGB', 'L', 'CMYK'):
+            return None, True, new_width, new_height
+            
+        if is_jpeg and downscale:
+            draft_size = target if orientation not in (5, 6, 7, 8) else target[::-1]
+            image.draft('RGB', draft_size)
+        image = ImageOps.exif_transpose(image)
+        
+        # 透明图片合成到白色背景上，RGBA、调色板等其他模式转换为RGB
+        if image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        if downscale:
+            image.thumbnail(target, Image.LANCZOS)
+        return image, is_jpeg, new_width, new_height
+        
+    def known_extensions(self):
+        """有专用转换器的扩展名，其余文件按未知类型尝试以文本读取"""
+        return set(self.supported_extensions) | self.fast_text_extensions
+        
+    def convert_file(self, input_path, output_path):
+        """转换单个文件，返回转换状态
+        
+        file_info 中记录输入字节数、总耗时和各阶段耗时（毫秒），转换成功时还记录输出字节数和页数；
+        启用 profile 时该文件属于本进程最慢的文件之一则记录 cProfile 结果的路径。
+        """
+        self.file_info = {}
+        self.timer.reset()
+        start = time.perf_counter()
+        profiler = None
+        if self.profile:
+            if self.profile_dir is None:
+                self.profile_dir = tempfile.mkdtemp(prefix='anyfiletopdf_profile_')
+            if self.profiles is None or self.profiles.directory != self.profile_dir:
+                self.profiles = ProfileKeeper(self.profile_dir)
+            profiler = self.profiles.start()
+        try:
+            status = self.convert_input(input_path, output_path)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if profiler is not None:
+                profile_path = self.profiles.offer(profiler, elapsed_ms)
+                if profile_path:
+                    self.file_info['profile'] = profile_path
+            self.file_info['input_bytes'] = self.input_size(input_path)
+            self.file_info['total_ms'] = round(elapsed_ms, 2)
+            self.file_info['stages_ms'] = self.timer.stages_ms()
+            
+        if status in ('converted', 'text'):
+            self.record_output_info(output_path)
+        return status
+        
+    def input_size(self, input_path):
+        """输入文件的大小；相册任务为目录中图片的总大小"""
+        try:
+            if os.path.isdir(input_path):
+                with os.scandir(input_path) as entries:
+                    return sum(entry.stat().st_size for entry in entries
+                               if os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS)
+            return os.path.getsize(input_path)
+        except OSError:
+            return 0
+            
+    def convert_input(self, input_path, output_path):
+        """选择转换器转换单个文件（或相册目录），返回转换状态"""
+        _, ext = os.path.splitext(input_path)
+        ext = ext.lower()
+        converter = self.supported_extensions.get(ext)
+        if ext in self.fast_text_extensions:
+            converter = self.convert_text_fast
+        
+        if os.path.isdir(input_path):
+            # 相册任务：目录中的所有图片合并为一个PDF
+            converter = self.convert_album
+            
+        # 确保输出目录存在
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        # 删除上次转换的输出：分卷数可能变化，且输出可能是指向转换缓存的硬链接，不能覆盖写入
+        for path in output_volumes(output_path):
+            if os.path.exists(path):
+                os.remove(path)
+                
+        with self.stream_encoding():
+            if converter:
+                # 使用对应的转换器转换文件
+                status = 'converted' if converter(input_path, output_path) else 'failed'
+            else:
+                # 对于不支持的文件类型，尝试作为文本文件处理
+                status = 'text' if self.convert_unknown_file(input_path, output_path) else 'unconvertible'
+        return status
+        
+    @contextlib.contextmanager
+    def stream_encoding(self):
+        """ASCII85编码使数据流增大25%，紧凑模式下直接写入二进制（ReportLab 在保存时读取该全局设置）
+        
+        工作表排版进程中也需设置，使并行和逐个排版的结果相同。
+        """
+        use_a85 = rl_config.useA85
+        rl_config.useA85 = 0 if self.compact else use_a85
+        try:
+            yield
+        finally:
+            rl_config.useA85 = use_a85
+        
+    def record_output_info(self, output_path):
+        """记录输出PDF（含分卷）的总大小和页数"""
+        try:
+            volumes = [path for path in output_volumes(output_path) if os.path.exists(path)]
+            self.file_info['output_bytes'] = sum(os.path.getsize(path) for path in volumes)
+            self.file_info['pages'] = sum(count_pdf_pages(path) for path in volumes)
+        except OSError as e:
+            self.logger.warning(f"统计输出文件失败 {output_path}: {str(e)}")
+            
+            
+    def convert_folder(self, folder_path, log_callback, progress_callback, max_workers=None,
+                       incremental=False, use_cache=False, bundle_name=None, album=False,
+                       file_filter=None):
         """转换文件夹中的所有文件"""
+        # max_workers 为并行转换的进程数，默认为CPU核心数，为1时在当前进程中顺序转换；
+        # incremental 为True时只转换新增或修改过的文件，并删除源文件已不存在的PDF；
+        # use_cache 为True时内容相同的文件直接使用转换缓存中的PDF；
+        # bundle_name 不为空时将所有结果按顺序合并为 outputsPDF/<bundle_name>.pdf（带书签），不保留单个PDF；
+        # album 为True时每个目录中的图片合并为该目录的 album.pdf；
+        # file_filter 为转换前筛选文件的规则（FileFilter），默认只跳过二进制文件
         self.cancel_flag = False
         self.log_callback = log_callback
         self.progress_callback = progress_callback
@@ -570,62 +1263,34 @@ class PDFConverter:
         output_dir = os.path.join(folder_path, 'outputsPDF')
         os.makedirs(output_dir, exist_ok=True)
         
-        # 获取所有文件
-        all_files = []
-        for root, _, files in os.walk(folder_path):
-            # 跳过outputsPDF目录
-            if 'outputsPDF' in root:
-                continue
-                
-            for file in files:
-                if not file.endswith('.pdf'):  # 排除PDF文件
-                    file_path = os.path.join(root, file)
-                    all_files.append(file_path)
-                    
-        total_files = len(all_files)
-        if total_files == 0:
+        # 扫描一次文件夹，任务列表和进度估计共用同一个文件索引
+        index = FileIndex([folder_path])
+        index.scan(cancelled=lambda: self.cancel_flag)
+        tasks = collect_folder_tasks(folder_path, output_dir, album, index)
+        if file_filter is None:
+            file_filter = FileFilter(known_extensions=self.known_extensions())
+        tasks, skipped = file_filter.filter_tasks(tasks)
+        if format_skipped(skipped):
+            self.log_callback(format_skipped(skipped))
+        
+        if bundle_name and incremental:
+            self.log_callback("合并模式不支持增量转换，将转换所有文件")
+            incremental = False
+            
+        manifest = ConversionManifest(output_dir, self.settings_signature()) if incremental else None
+        if not tasks and manifest is None:
             self.log_callback("未找到可转换的文件！")
             return
             
-        self.log_callback(f"找到 {total_files} 个文件")
+        bundle = None
+        if bundle_name:
+            bundle = PDFBundle(output_dir, bundle_name)
+            tasks = bundle.stage(tasks)
+            
+        self.log_callback(f"找到 {len(tasks)} 个文件")
         
         # 开始转换
-        converted_count = 0
-        for index, file_path in enumerate(all_files, 1):
-            if self.cancel_flag:
-                self.log_callback("转换已取消！")
-                break
-                
-            try:
-                _, ext = os.path.splitext(file_path)
-                converter = self.supported_extensions.get(ext.lower())
-                
-                # 创建相对路径保持目录结构
-                rel_path = os.path.relpath(file_path, folder_path)
-                output_path = os.path.join(output_dir, rel_path + '.pdf')
-                
-                # 确保输出目录存在
-                os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                
-                if converter:
-                    # 使用对应的转换器转换文件
-                    converter(file_path, output_path)
-                    converted_count += 1
-                    self.log_callback(f"成功转换 ({index}/{total_files}): {rel_path}")
-                else:
-                    # 对于不支持的文件类型，尝试作为文本文件处理
-                    self.log_callback(f"尝试读取文件内容 ({index}/{total_files}): {rel_path}")
-                    if self.convert_unknown_file(file_path, output_path):
-                        converted_count += 1
-                        self.log_callback(f"成功转换为文本 ({index}/{total_files}): {rel_path}")
-                    else:
-                        self.log_callback(f"无法转换文件 ({index}/{total_files}): {rel_path}")
-                    
-                progress = (index / total_files) * 100
-                self.progress_callback(progress)
-                
-            except Exception as e:
-                self.log_callback(f"处理文件失败 ({index}/{total_files}): {os.path.basename(file_path)}")
-                self.log_callback(f"错误信息: {str(e)}")
-                
-        self.log_callback(f"\n转换完成！共转换 {converted_count}/{total_files} 个文件") 
\ No newline at end of file
+        cache = ConversionCache() if use_cache else None
+        return run_batch(self, tasks, self.log_callback, self.progress_callback, max_workers,
+                         manifest, cache, bundle, report_path=os.path.join(output_dir, REPORT_NAME),
+                         size_of=index.size_of)
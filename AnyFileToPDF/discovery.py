@@ -0,0 +1,291 @@
+import os
+import codecs
+import fnmatch
+import logging
+from collections import namedtuple
+from utils import natural_sort_key
+
+# 扫描时不进入的目录（转换结果的输出目录）
+SKIP_DIRS = ('outputsPDF',)
+# 默认也不进入的版本控制和依赖目录
+DEFAULT_EXCLUDE_DIRS = ('.git', '.svn', '.hg', 'node_modules', '__pycache__')
+# 判断是否为二进制文件时读取的字节数
+SNIFF_BYTES = 8192
+# 控制字符超过此比例时视为二进制文件
+BINARY_CONTROL_RATIO = 0.3
+# 以BOM开头的UTF-16/UTF-32文本含有NUL字节，不能视为二进制
+TEXT_BOMS = (codecs.BOM_UTF32_LE, codecs.BOM_UTF32_BE, codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)
+# 文本中常见的控制字符：退格、制表、换行、换页、回车和ESC
+TEXT_CONTROLS = {8, 9, 10, 12, 13, 27}
+
+# 索引中的一个文件：完整路径、大小（字节）、修改时间（纳秒）和小写的扩展名
+FileRecord = namedtuple('FileRecord', ['path', 'size', 'mtime', 'ext'])
+
+
+class DirectoryListing:
+    """一个目录的内容
+
+    dirs 为按自然顺序排列的子目录名称，links 为其中的符号链接（不进入）；
+    files 为 文件名 -> (大小, 修改时间)，按文件名的自然顺序排列。
+    """
+    __slots__ = ('mtime', 'dirs', 'links', 'files')
+
+    def __init__(self, mtime, dirs, links, files):
+        self.mtime = mtime
+        self.dirs = dirs
+        self.links = links
+        self.files = files
+
+    def subdirs(self, skip_dirs=SKIP_DIRS):
+        """需要继续扫描的子目录名称"""
+        return [name for name in self.dirs if name not in skip_dirs and name not in self.links]
+
+
+class FileIndex:
+    """一组输入路径（文件或文件夹）的文件索引
+
+    用 os.scandir 遍历一次文件夹，按目录保存子目录以及文件的大小和修改时间，
+    文件树、进度估计和转换任务都从索引中读取，不再各自遍历文件夹。
+    再次扫描时只重新读取修改时间发生变化的目录，其余目录沿用已有的列表。
+    exclude_dirs 中的目录（默认为版本控制和依赖目录）与 outputsPDF 一样不进入；
+    exclude_paths 为不进入的目录路径，例如位于输入文件夹中的自定义输出目录。
+    """
+
+    def __init__(self, paths, exclude_dirs=DEFAULT_EXCLUDE_DIRS, exclude_paths=()):
+        self.logger = logging.getLogger(__name__)
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.skip_dirs = frozenset(SKIP_DIRS + tuple(exclude_dirs))
+        self.exclude_paths = frozenset(os.path.abspath(path) for path in exclude_paths)
+        # 目录路径 -> DirectoryListing
+        self.listings = {}
+        # 作为输入路径的单个文件 -> (大小, 修改时间)
+        self.file_stats = {}
+
+    def scan(self, progress=None, cancelled=None):
+        """扫描（或重新扫描）所有输入路径，返回是否扫描完成
+
+        每读取一个目录调用一次 progress(目录路径, DirectoryListing)；
+        cancelled() 返回True时停止扫描，已读取的目录保留在索引中。
+        """
+        seen = set()
+        for path in self.paths:
+            if os.path.isdir(path):
+                if not self.scan_tree(path, seen, progress, cancelled):
+                    return False
+                continue
+            try:
+                stat = os.stat(path)
+                self.file_stats[path] = (stat.st_size, stat.st_mtime_ns)
+            except OSError as e:
+                self.logger.warning(f"读取文件状态失败 {path}: {str(e)}")
+                self.file_stats.pop(path, None)
+        # 删除已不存在的目录
+        for path in list(self.listings):
+            if path not in seen:
+                del self.listings[path]
+        return True
+
+    def scan_tree(self, root, seen, progress=None, cancelled=None):
+        """按深度优先顺序扫描文件夹及其子目录"""
+        stack = [root]
+        while stack:
+            if cancelled is not None and cancelled():
+                return False
+            path = stack.pop()
+            if path in seen:
+                continue
+            seen.add(path)
+            listing = self.read_directory(path)
+            if listing is None:
+                continue
+            if progress is not None:
+                progress(path, listing)
+            stack.extend(reversed(self.subdir_paths(path, listing)))
+        return True
+
+    def read_directory(self, path):
+        """读取一个目录，修改时间未变化时返回已有的列表，无法读取时返回None"""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError as e:
+            self.logger.warning(f"读取文件夹失败 {path}: {str(e)}")
+            return None
+        listing = self.listings.get(path)
+        if listing is not None and listing.mtime == mtime:
+            return listing
+
+        dirs, links, files = [], [], []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        dirs.append(entry.name)
+                        # 与 os.walk 一致，不进入指向目录的符号链接
+                        if entry.is_symlink():
+                            links.append(entry.name)
+                        continue
+                    try:
+                        stat = entry.stat()
+                        files.append((entry.name, (stat.st_size, stat.st_mtime_ns)))
+                    except OSError:
+                        # 失效的符号链接等
+                        files.append((entry.name, (0, 0)))
+        except OSError as e:
+            self.logger.warning(f"读取文件夹失败 {path}: {str(e)}")
+            self.listings.pop(path, None)
+            return None
+        dirs.sort(key=natural_sort_key)
+        files.sort(key=lambda item: natural_sort_key(item[0]))
+        listing = DirectoryListing(mtime, dirs, frozenset(links), dict(files))
+        self.listings[path] = listing
+        return listing
+
+    def subdir_paths(self, path, listing):
+        """目录中需要继续扫描的子目录路径"""
+        paths = [os.path.join(path, name) for name in listing.subdirs(self.skip_dirs)]
+        return [path for path in paths if path not in self.exclude_paths] if self.exclude_paths else paths
+
+    def listing(self, path):
+        """返回目录的列表，目录尚未扫描时返回None"""
+        return self.listings.get(os.path.abspath(path))
+
+    def walk(self, root):
+        """按深度优先顺序生成已扫描的 (目录路径, DirectoryListing)，不访问磁盘"""
+        stack = [os.path.abspath(root)]
+        while stack:
+            path = stack.pop()
+            listing = self.listings.get(path)
+            if listing is None:
+                continue
+            yield path, listing
+            stack.extend(reversed(self.subdir_paths(path, listing)))
+
+    def records(self, paths=None):
+        """按顺序生成输入路径（默认为全部输入路径）中所有文件的 FileRecord
+
+        不在索引中的路径（例如未扫描的目录）在此时读取。
+        """
+        for path in (self.paths if paths is None else [os.path.abspath(path) for path in paths]):
+            if os.path.isdir(path):
+                if path not in self.listings:
+                    self.scan_tree(path, set())
+                for root, listing in self.walk(path):
+                    for name, (size, mtime) in listing.files.items():
+                        yield FileRecord(os.path.join(root, name), size, mtime,
+                                         os.path.splitext(name)[1].lower())
+                continue
+            stat = self.file_stat(path)
+            if stat is not None:
+                yield FileRecord(path, stat[0], stat[1], os.path.splitext(path)[1].lower())
+
+    def file_stat(self, path):
+        """返回文件的 (大小, 修改时间)，优先使用索引中的记录"""
+        if path in self.file_stats:
+            return self.file_stats[path]
+        listing = self.listings.get(os.path.dirname(path))
+        if listing is not None and os.path.basename(path) in listing.files:
+            return listing.files[os.path.basename(path)]
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def size_of(self, path):
+        """文件的大小；目录为其中文件（不含子目录）的总大小，用于估计转换进度"""
+        listing = self.listings.get(path)
+        if listing is not None:
+            return sum(size for size, _ in listing.files.values())
+        stat = self.file_stat(path)
+        return stat[0] if stat is not None else 0
+
+
+def matches(rel_path, patterns):
+    """判断相对路径或文件名是否匹配任一通配符模式"""
+    rel_path = rel_path.replace(os.sep, '/')
+    name = os.path.basename(rel_path)
+    return any(fnmatch.fnmatch(rel_path, p) or fnmatch.fnmatch(name, p) for p in patterns)
+
+
+def is_binary_file(path, sniff_bytes=SNIFF_BYTES):
+    """只读取文件开头判断是否为二进制文件：含有NUL字节或控制字符过多"""
+    with open(path, 'rb') as f:
+        head = f.read(sniff_bytes)
+    if not head or head.startswith(TEXT_BOMS):
+        return False
+    if b'\0' in head:
+        return True
+    controls = sum(1 for byte in head if byte < 32 and byte not in TEXT_CONTROLS)
+    return controls / len(head) > BINARY_CONTROL_RATIO
+
+
+def normalize_extensions(extensions):
+    """将 'py' 或 '.PY' 形式的扩展名统一为 '.py'"""
+    return {ext.lower() if ext.startswith('.') else '.' + ext.lower() for ext in extensions if ext}
+
+
+class FileFilter:
+    """转换前筛选文件的规则
+
+    include/exclude 为匹配相对路径或文件名的通配符模式；extensions 不为空时只保留这些扩展名，
+    exclude_extensions 中的扩展名被跳过。skip_binary 为True时，没有专用转换器
+    （不在 known_extensions 中、需要按文本读取）的文件先读取开头判断，二进制文件不再转换。
+    """
+
+    def __init__(self, include=(), exclude=(), extensions=(), exclude_extensions=(),
+                 known_extensions=(), skip_binary=True):
+        self.logger = logging.getLogger(__name__)
+        self.include = list(include)
+        self.exclude = list(exclude)
+        self.extensions = normalize_extensions(extensions)
+        self.exclude_extensions = normalize_extensions(exclude_extensions)
+        self.known_extensions = normalize_extensions(known_extensions)
+        self.skip_binary = skip_binary
+
+    def check(self, input_path, rel_path):
+        """返回跳过文件的原因（'excluded' 或 'binary'），文件需要转换时返回None"""
+        # 相册任务以目录为输入，不筛选
+        if os.path.isdir(input_path):
+            return None
+        ext = os.path.splitext(input_path)[1].lower()
+        if self.extensions and ext not in self.extensions:
+            return 'excluded'
+        if ext in self.exclude_extensions:
+            return 'excluded'
+        if self.include and not matches(rel_path, self.include):
+            return 'excluded'
+        if self.exclude and matches(rel_path, self.exclude):
+            return 'excluded'
+        if self.skip_binary and ext not in self.known_extensions:
+            try:
+                if is_binary_file(input_path):
+                    return 'binary'
+            except OSError as e:
+                self.logger.warning(f"读取文件失败 {rel_path}: {str(e)}")
+        return None
+
+    def filter_tasks(self, tasks):
+        """过滤转换任务，返回 (保留的任务, {'excluded': 排除数量, 'binary': 二进制文件数量})"""
+        kept = []
+        skipped = {'excluded': 0, 'binary': 0}
+        for task in tasks:
+            reason = self.check(task[0], task[2])
+            if reason is None:
+                kept.append(task)
+            else:
+                skipped[reason] += 1
+        return kept, skipped
+
+
+def format_skipped(skipped):
+    """将 FileFilter.filter_tasks 返回的跳过数量格式化为日志消息，没有跳过的文件时返回None"""
+    parts = []
+    if skipped.get('excluded'):
+        parts.append(f"{skipped['excluded']} 个被规则排除的文件")
+    if skipped.get('binary'):
+        parts.append(f"{skipped['binary']} 个二进制文件")
+    return f"跳过 {'，'.join(parts)}" if parts else None
@@ -0,0 +1,156 @@
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+from embedded_images import EMU_PER_POINT
+
+# 正文部分及其关系部件在DOCX压缩包中的路径
+DOCUMENT_PART = 'word/document.xml'
+DOCUMENT_RELS = 'word/_rels/document.xml.rels'
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+MC = '{http://schemas.openxmlformats.org/markup-compatibility/2006}'
+A = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+R = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+WP = '{http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing}'
+REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+BODY = W + 'body'
+PARAGRAPH = W + 'p'
+TABLE = W + 'tbl'
+# 内容控件（常见于合同模板），其中的块位于 w:sdtContent 中
+CONTENT_CONTROL = W + 'sdt'
+CONTENT = W + 'sdtContent'
+ROW = W + 'tr'
+CELL = W + 'tc'
+TEXT = W + 't'
+GRID_SPAN = W + 'gridSpan'
+CELL_PROPERTIES = W + 'tcPr'
+VAL = W + 'val'
+DRAWING = W + 'drawing'
+BLIP = A + 'blip'
+EMBED = R + 'embed'
+EXTENT = WP + 'extent'
+# 输出为制表符和换行的元素
+TAB_TAGS = {W + 'tab', W + 'ptab'}
+BREAK_TAGS = {W + 'br', W + 'cr'}
+# 不输出其中文本的元素：兼容性备选内容（与 mc:Choice 重复）、段落属性和修订属性
+SKIP_TAGS = {MC + 'Fallback', W + 'pPr', W + 'rPr', W + 'tcPr', W + 'trPr', W + 'tblPr'}
+
+
+def element_text(element, images=None):
+    """按文档顺序提取元素中的文本
+
+    提供 images 列表时，同时按顺序收集其中图片的 (关系ID, 宽度, 高度)，尺寸单位为pt。
+    """
+    parts = []
+
+    def walk(node):
+        for child in node:
+            tag = child.tag
+            if tag in SKIP_TAGS:
+                continue
+            if tag == TEXT:
+                parts.append(child.text or '')
+            elif tag in TAB_TAGS:
+                parts.append('\t')
+            elif tag in BREAK_TAGS:
+                parts.append('\n')
+            elif tag == DRAWING:
+                if images is not None:
+                    images.extend(drawing_images(child))
+                # 文本框中的文字仍然输出
+                walk(child)
+            elif tag == PARAGRAPH:
+                # 嵌套的段落（文本框、表格单元格）之间换行
+                if parts and not parts[-1].endswith('\n'):
+                    parts.append('\n')
+                walk(child)
+            else:
+                walk(child)
+
+    walk(element)
+    return ''.join(parts)
+
+
+def drawing_images(drawing):
+    """返回图形中图片的 (关系ID, 宽度, 高度)"""
+    extent = drawing.find(f'.//{EXTENT}')
+    width = height = None
+    if extent is not None:
+        width = int(extent.get('cx', 0)) / EMU_PER_POINT
+        height = int(extent.get('cy', 0)) / EMU_PER_POINT
+    return [(blip.get(EMBED), width, height) for blip in drawing.iter(BLIP) if blip.get(EMBED)]
+
+
+def read_relationships(archive):
+    """读取正文的关系部件，返回 关系ID -> 压缩包中的部件名称（不包括外部链接）"""
+    try:
+        data = archive.read(DOCUMENT_RELS)
+    except KeyError:
+        return {}
+    targets = {}
+    for rel in ET.fromstring(data).iter(REL + 'Relationship'):
+        if rel.get('TargetMode') == 'External':
+            continue
+        target = rel.get('Target', '')
+        if target.startswith('/'):
+            name = target.lstrip('/')
+        else:
+            name = posixpath.normpath(posixpath.join(posixpath.dirname(DOCUMENT_PART), target))
+        targets[rel.get('Id')] = name
+    return targets
+
+
+def table_rows(table):
+    """提取表格每行的单元格文本，合并的单元格在其后补空白单元格使列对齐"""
+    rows = []
+    for row in table.findall(ROW):
+        cells = []
+        for cell in row.findall(CELL):
+            cells.append(element_text(cell).strip())
+            span = cell.find(f'{CELL_PROPERTIES}/{GRID_SPAN}')
+            if span is not None:
+                cells.extend([''] * (int(span.get(VAL, '1')) - 1))
+        rows.append(cells)
+    return rows
+
+
+def block_items(element, relationships):
+    """将正文的一个直接子元素转换为块，内容控件展开为其中的块"""
+    if element.tag == PARAGRAPH:
+        images = []
+        yield 'paragraph', element_text(element, images)
+        for rel_id, width, height in images:
+            if rel_id in relationships:
+                yield 'image', (relationships[rel_id], width, height)
+    elif element.tag == TABLE:
+        yield 'table', table_rows(element)
+    elif element.tag == CONTENT_CONTROL:
+        content = element.find(CONTENT)
+        for child in (content if content is not None else ()):
+            yield from block_items(child, relationships)
+
+
+def iter_docx_blocks(path):
+    """按文档顺序逐个生成正文中的段落、图片和表格，内存中只保留当前块
+
+    生成 ('paragraph', 文本)、('image', (部件名称, 宽度, 高度)) 或 ('table', 行列表)，
+    段落中的图片在段落文本之后生成。正文XML以流式方式解析，
+    处理完的块立即从树中移除，不构建整个文档的对象模型。
+    """
+    with zipfile.ZipFile(path) as archive, archive.open(DOCUMENT_PART) as part:
+        relationships = read_relationships(archive)
+        depth = 0
+        body = None
+        for event, element in ET.iterparse(part, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if element.tag == BODY:
+                    body = element
+                continue
+            depth -= 1
+            # 只处理正文的直接子元素（document/body/块），嵌套的段落由所在的块处理
+            if depth != 2 or body is None:
+                continue
+            yield from block_items(element, relationships)
+            body.clear()
@@ -0,0 +1,105 @@
+import io
+import os
+import shutil
+import hashlib
+import logging
+import tempfile
+from reportlab.platypus import Flowable
+
+# 1pt = 12700 EMU（Office文档中的长度单位）
+EMU_PER_POINT = 12700
+
+
+class EmbeddedImage(Flowable):
+    """按文件名绘制已准备好的图片
+
+    ReportLab 以文件名识别图片，同一文件在文档中只嵌入一次，之后的绘制只引用已有的图片对象。
+    """
+
+    def __init__(self, path, width, height):
+        super().__init__()
+        self.path = path
+        self.width = width
+        self.height = height
+
+    def wrap(self, available_width, available_height):
+        return self.width, self.height
+
+    def draw(self):
+        self.canv.drawImage(self.path, 0, 0, self.width, self.height)
+
+
+class EmbeddedImageCache:
+    """单个DOCX/PPTX文档的嵌入图片缓存
+
+    图片按部件名称（或调用方提供的其他键）只读取和解码一次，按页面区域缩小后写入临时目录；
+    内容相同的图片共用一个文件，因此在PDF中也只嵌入一次。
+    """
+
+    def __init__(self, converter, max_width, max_height):
+        self.logger = logging.getLogger(__name__)
+        self.converter = converter
+        self.max_width = max_width
+        self.max_height = max_height
+        self.temp_dir = None
+        # 键 -> (文件路径, 宽度, 高度)，无法解码的图片为None
+        self.images = {}
+        # 内容哈希 -> (文件路径, 宽度, 高度)
+        self.files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """删除临时目录，应在PDF生成之后调用"""
+        if self.temp_dir is not None:
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
+            self.temp_dir = None
+
+    def prepare(self, key, load):
+        """返回键对应图片的 (文件路径, 宽度, 高度)，第一次遇到时调用 load() 读取图片数据"""
+        if key in self.images:
+            return self.images[key]
+        try:
+            data = load()
+            digest = hashlib.sha1(data).hexdigest()
+            if digest not in self.files:
+                self.files[digest] = self.write(digest, data)
+            self.images[key] = self.files[digest]
+        except Exception as e:
+            self.logger.warning(f"读取嵌入图片失败 {key}: {str(e)}")
+            self.images[key] = None
+        return self.images[key]
+
+    def write(self, digest, data):
+        """按页面区域缩小图片并写入临时目录"""
+        if self.temp_dir is None:
+            self.temp_dir = tempfile.mkdtemp(prefix='anyfiletopdf_images_')
+        image, is_jpeg, width, height = self.converter.fit_image(io.BytesIO(data), self.max_width, self.max_height)
+        path = os.path.join(self.temp_dir, digest + ('.jpg' if is_jpeg else '.png'))
+        if image is None:
+            # 无需缩小的JPEG直接写入原始数据
+            with open(path, 'wb') as f:
+                f.write(data)
+        elif is_jpeg:
+            image.save(path, 'JPEG', quality=self.converter.jpeg_quality)
+        else:
+            image.save(path, 'PNG')
+        return path, width, height
+
+    def flowable(self, key, load, width=None, height=None):
+        """生成绘制图片的元素，width 和 height 为文档中的显示尺寸（pt），按页面区域等比缩小
+
+        没有显示尺寸时使用适应页面区域的尺寸，图片无法读取时返回None。
+        """
+        prepared = self.prepare(key, load)
+        if prepared is None:
+            return None
+        path, fit_width, fit_height = prepared
+        if not width or not height:
+            width, height = fit_width, fit_height
+        ratio = min(1, self.max_width / width, self.max_height / height)
+        return EmbeddedImage(path, width * ratio, height * ratio)
@@ -0,0 +1,163 @@
+import os
+import sys
+import logging
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+# 额外的字体搜索路径（目录或字体文件），多个路径用系统路径分隔符分隔
+FONT_PATH_ENV = 'ANYFILETOPDF_FONT_PATH'
+# 没有可用的中文字体时使用的内置字体
+FALLBACK_FONT = 'Helvetica'
+# 不嵌入字体时使用的中文字体：ReportLab 自带字形度量的CID字体，不嵌入字体数据，
+# 由阅读器使用系统中的宋体显示
+NO_EMBED_FONT = 'STSong-Light'
+
+# 按优先级排列的中文字体文件名（ReportLab 只支持TrueType轮廓，不包含CFF轮廓的OTF/TTC）
+CJK_FONT_FILES = [
+    'msyh.ttf',  # 微软雅黑
+    'msyh.ttc',
+    'simsun.ttc',  # 宋体
+    'simhei.ttf',  # 黑体
+    'STSONG.TTF',  # 华文宋体
+    'STKAITI.TTF',  # 华文楷体
+    'wqy-microhei.ttc',  # 文泉驿微米黑
+    'wqy-zenhei.ttc',  # 文泉驿正黑
+    'NotoSansSC-Regular.ttf',
+    'DroidSansFallbackFull.ttf',
+    'Arial Unicode.ttf',
+]
+# 用户指定的字体目录中作为候选的字体文件扩展名
+FONT_EXTENSIONS = ('.ttf', '.ttc', '.otf')
+
+
+def system_font_dirs():
+    """当前系统的字体目录"""
+    if sys.platform == 'win32':
+        windir = os.environ.get('WINDIR', 'C:/Windows')
+        dirs = [os.path.join(windir, 'Fonts')]
+        if os.environ.get('LOCALAPPDATA'):
+            dirs.append(os.path.join(os.environ['LOCALAPPDATA'], 'Microsoft', 'Windows', 'Fonts'))
+        return dirs
+    if sys.platform == 'darwin':
+        return [os.path.expanduser('~/Library/Fonts'), '/Library/Fonts', '/System/Library/Fonts',
+                '/System/Library/Fonts/Supplemental']
+    # 与 fontconfig 默认配置相同的目录
+    data_home = os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share')
+    return [os.path.join(data_home, 'fonts'), os.path.expanduser('~/.fonts'),
+            '/usr/local/share/fonts', '/usr/share/fonts']
+
+
+class FontRegistry:
+    """进程内共享的字体和样式注册表
+
+    字体文件只在第一次需要时查找和解析，样式表按字体缓存，
+    同一进程中的所有转换器共享同一个注册表。
+    """
+
+    def __init__(self, search_paths=()):
+        self.logger = logging.getLogger(__name__)
+        env_paths = [p for p in os.environ.get(FONT_PATH_ENV, '').split(os.pathsep) if p]
+        # 用户指定的路径优先于系统字体目录
+        self.user_paths = list(search_paths) + env_paths
+        self.search_paths = self.user_paths + system_font_dirs()
+        self._default_font = None
+        self._styles = {}
+
+    def candidate_fonts(self):
+        """按优先级生成候选字体文件路径
+
+        先按搜索路径的顺序生成用户指定的字体文件以及用户指定目录中的所有字体文件
+        （目录中 CJK_FONT_FILES 列出的字体在前，其余按文件名排列），
+        再按 CJK_FONT_FILES 的顺序生成系统字体目录中的中文字体。
+        """
+        rank = {name.lower(): i for i, name in enumerate(CJK_FONT_FILES)}
+        seen = set()
+        for path in self.user_paths:
+            if os.path.isfile(path):
+                fonts = [path]
+            elif os.path.isdir(path):
+                fonts = [os.path.join(root, name) for root, _, files in os.walk(path)
+                         for name in files if name.lower().endswith(FONT_EXTENSIONS)]
+                fonts.sort(key=lambda font: (rank.get(os.path.basename(font).lower(), len(rank)), font))
+            else:
+                continue
+            for font in fonts:
+                if font not in seen:
+                    seen.add(font)
+                    yield font
+
+        index = {}
+        for path in self.search_paths[len(self.user_paths):]:
+            if os.path.isdir(path):
+                for root, _, files in os.walk(path):
+                    for name in files:
+                        index.setdefault(name.lower(), os.path.join(root, name))
+        for name in CJK_FONT_FILES:
+            font = index.get(name.lower())
+            if font is not None and font not in seen:
+                yield font
+
+    def default_font(self):
+        """返回默认字体名称，首次调用时注册找到的第一个可用中文字体"""
+        if self._default_font is not None:
+            return self._default_font
+
+        for font_path in self.candidate_fonts():
+            font_name = os.path.splitext(os.path.basename(font_path))[0]
+            if font_name in pdfmetrics.getRegisteredFontNames():
+                self._default_font = font_name
+                return font_name
+            try:
+                pdfmetrics.registerFont(TTFont(font_name, font_path))
+                self.logger.info(f"成功注册字体: {font_name}")
+                self._default_font = font_name
+                return font_name
+            except Exception as e:
+                self.logger.warning(f"注册字体失败 {font_name}: {str(e)}")
+
+        # 如果没有找到中文字体，使用默认的Helvetica
+        self.logger.warning("未找到中文字体，使用Helvetica")
+        self._default_font = FALLBACK_FONT
+        return FALLBACK_FONT
+
+    def no_embed_font(self):
+        """返回不嵌入字体时使用的字体名称，首次调用时注册"""
+        if NO_EMBED_FONT not in pdfmetrics.getRegisteredFontNames():
+            from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+            pdfmetrics.registerFont(UnicodeCIDFont(NO_EMBED_FONT))
+        return NO_EMBED_FONT
+
+    def stylesheet(self, font_name):
+        """返回使用指定字体的样式表（按字体缓存，调用方不应修改）"""
+        styles = self._styles.get(font_name)
+        if styles is None:
+            styles = getSampleStyleSheet()
+            # 添加自定义样式
+            styles.add(ParagraphStyle(
+                name='Custom',
+                parent=styles['Normal'],
+                fontSize=10,
+                leading=14,
+                firstLineIndent=0,
+                fontName=font_name,
+                wordWrap='CJK',  # 支持中文换行
+                encoding='utf-8',
+                allowWidows=0,
+                allowOrphans=0,
+                alignment=0,  # 左对齐
+            ))
+            self._styles[font_name] = styles
+        return styles
+
+
+# 搜索路径 -> 注册表
+_registries = {}
+
+
+def get_font_registry(search_paths=()):
+    """获取指定搜索路径对应的进程内共享注册表"""
+    key = tuple(search_paths)
+    if key not in _registries:
+        _registries[key] = FontRegistry(key)
+    return _registries[key]
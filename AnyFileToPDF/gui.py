@@ -1,13 +1,23 @@
 import sys
 import os
+import time
 import logging
+import threading
 import traceback
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                            QPushButton, QProgressBar, QTextEdit, QLabel,
-                            QMessageBox, QFrame, QTreeWidget, QTreeWidgetItem)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer
+                            QPushButton, QProgressBar, QPlainTextEdit, QLabel,
+                            QMessageBox, QFrame, QTreeView, QCheckBox)
+from PyQt5.QtCore import Qt, QThread, QObject, pyqtSignal, QTimer, QAbstractItemModel, QModelIndex
 from PyQt5.QtGui import QPalette, QColor, QIcon
 from converter import PDFConverter
+from batch import run_batch, REPORT_NAME
+from manifest import ConversionManifest
+from cache import ConversionCache
+from bundle import PDFBundle
+from discovery import FileIndex, FileFilter, format_skipped
+
+# 每次转换的完整日志保存在 outputsPDF 目录中，界面中只保留最近的日志
+LOG_NAME = 'conversion_log.txt'
 
 class DropArea(QFrame):
     """可拖放的区域"""
@@ -54,7 +64,7 @@ class DropArea(QFrame):
         """)
         format_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(format_label)
-
+        
     def dragEnterEvent(self, event):
         """拖入文件时的处理"""
         if event.mimeData().hasUrls():
@@ -149,206 +159,545 @@ class DropArea(QFrame):
         if paths:
             self.dropped.emit(paths)
 
-class FileTreeWidget(QTreeWidget):
-    """文件树控件"""
+class FileNode:
+    """文件树中的一个节点，目录的子节点在展开时才读取
+    
+    子孙节点只保存名称，完整路径由顶层节点的路径拼接得到。
+    """
+    __slots__ = ('name', 'top_path', 'is_dir', 'parent', 'row', 'children', 'loaded', 'scanner')
+    
+    def __init__(self, name, is_dir, parent=None, row=0, top_path=None):
+        self.name = name
+        self.top_path = top_path
+        self.is_dir = is_dir
+        self.parent = parent
+        self.row = row
+        self.children = []
+        self.loaded = False  # 子节点是否已全部读取
+        self.scanner = None  # 正在读取子节点的线程
+        
+    @property
+    def path(self):
+        if self.top_path is not None or self.parent is None:
+            return self.top_path
+        return os.path.join(self.parent.path, self.name)
+        
+    def append(self, name, is_dir, top_path=None):
+        child = FileNode(name, is_dir, self, len(self.children), top_path)
+        self.children.append(child)
+        return child
+
+class DirectoryScanThread(QThread):
+    """在后台线程中读取一个目录，分批发送其中的条目
+    
+    目录已在文件索引中时直接使用索引中的列表，不再读取磁盘。
+    """
+    entries_signal = pyqtSignal(object, list)  # (线程, [(名称, 是否为目录), ...])
+    done_signal = pyqtSignal(object)
+    
+    # 每批发送的条目数，界面按批插入，读取大目录时不会长时间阻塞
+    BATCH_SIZE = 256
+    
+    def __init__(self, node, file_index=None):
+        super().__init__()
+        self.node = node
+        self.path = node.path
+        self.file_index = file_index
+        
+    def iter_entries(self):
+        """生成目录中的 (名称, 是否为目录)"""
+        listing = self.file_index.listing(self.path) if self.file_index is not None else None
+        if listing is not None:
+            for name in listing.dirs:
+                yield name, True
+            for name in listing.files:
+                yield name, False
+            return
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                yield entry.name, is_dir
+                
+    def run(self):
+        batch = []
+        try:
+            for entry in self.iter_entries():
+                if self.isInterruptionRequested():
+                    return
+                batch.append(entry)
+                if len(batch) >= self.BATCH_SIZE:
+                    self.entries_signal.emit(self, batch)
+                    batch = []
+        except OSError as e:
+            logging.getLogger(__name__).warning(f"读取文件夹失败 {self.path}: {str(e)}")
+        if batch:
+            self.entries_signal.emit(self, batch)
+        self.done_signal.emit(self)
+
+class FileTreeModel(QAbstractItemModel):
+    """按需加载的文件树模型
+    
+    只为已展开的目录保存子节点：目录第一次展开时在后台线程中读取，条目分批插入；
+    目录折叠时释放其子节点，再次展开时重新读取，内存占用与界面中展开的内容成正比。
+    """
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.root = FileNode('', True)
+        self.root.loaded = True
+        # 共享的文件索引，已扫描的目录直接使用索引中的列表
+        self.file_index = None
+        # 正在运行的读取线程，线程结束前保持引用
+        self.scanners = set()
+        
+    def node(self, index):
+        return index.internalPointer() if index.isValid() else self.root
+        
+    def index(self, row, column, parent=QModelIndex()):
+        node = self.node(parent)
+        if column != 0 or not 0 <= row < len(node.children):
+            return QModelIndex()
+        return self.createIndex(row, column, node.children[row])
+        
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is None or parent is self.root:
+            return QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+        
+    def rowCount(self, parent=QModelIndex()):
+        return len(self.node(parent).children)
+        
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+        
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == Qt.DisplayRole:
+            return ("📁 " if node.is_dir else "📄 ") + node.name
+        if role == Qt.UserRole:
+            return node.path  # 完整路径
+        if role == Qt.ToolTipRole:
+            return node.path
+        return None
+        
+    def hasChildren(self, parent=QModelIndex()):
+        node = self.node(parent)
+        # 未读取的目录显示展开标记，读取后为空的目录不再显示
+        return node.is_dir and (bool(node.children) or not node.loaded)
+        
+    def canFetchMore(self, parent):
+        node = self.node(parent)
+        return node.is_dir and not node.loaded and node.scanner is None
+        
+    def fetchMore(self, parent):
+        """在后台线程中读取目录"""
+        node = self.node(parent)
+        if not self.canFetchMore(parent):
+            return
+        scanner = DirectoryScanThread(node, self.file_index)
+        scanner.entries_signal.connect(self.insert_entries)
+        scanner.done_signal.connect(self.finish_scan)
+        scanner.finished.connect(lambda: self.scanners.discard(scanner))
+        node.scanner = scanner
+        self.scanners.add(scanner)
+        scanner.start()
+        
+    def node_index(self, node):
+        if node is self.root:
+            return QModelIndex()
+        return self.createIndex(node.row, 0, node)
+        
+    def insert_entries(self, scanner, entries):
+        """插入读取线程发送的一批条目，已被取消的读取结果丢弃"""
+        node = scanner.node
+        if node.scanner is not scanner:
+            return
+        first = len(node.children)
+        self.beginInsertRows(self.node_index(node), first, first + len(entries) - 1)
+        for name, is_dir in entries:
+            node.append(name, is_dir)
+        self.endInsertRows()
+        
+    def finish_scan(self, scanner):
+        node = scanner.node
+        if node.scanner is not scanner:
+            return
+        node.scanner = None
+        node.loaded = True
+        if not node.children:
+            # 空目录：通知视图去掉展开标记
+            index = self.node_index(node)
+            self.dataChanged.emit(index, index)
+            
+    def add_path(self, path):
+        """添加顶层的文件或文件夹，返回其索引"""
+        row = len(self.root.children)
+        self.beginInsertRows(QModelIndex(), row, row)
+        node = self.root.append(os.path.basename(os.path.normpath(path)), os.path.isdir(path), path)
+        self.endInsertRows()
+        return self.node_index(node)
+        
+    def cancel_scans(self, node):
+        """取消节点及其已加载的子孙节点的读取"""
+        if node.scanner is not None:
+            node.scanner.requestInterruption()
+            node.scanner = None
+        for child in node.children:
+            if child.is_dir:
+                self.cancel_scans(child)
+                
+    def unload(self, index):
+        """释放目录的子节点，再次展开时重新读取"""
+        node = self.node(index)
+        self.cancel_scans(node)
+        if node.children:
+            self.beginRemoveRows(index, 0, len(node.children) - 1)
+            node.children = []
+            self.endRemoveRows()
+        node.loaded = False
+        
+    def clear(self):
+        self.beginResetModel()
+        self.cancel_scans(self.root)
+        self.root.children = []
+        self.endResetModel()
+        
+    def shutdown(self):
+        """停止所有读取线程并等待其结束"""
+        self.cancel_scans(self.root)
+        for scanner in list(self.scanners):
+            scanner.wait()
+
+class FileTreeWidget(QTreeView):
+    """文件树控件
+    
+    文件夹只在展开时读取，添加包含大量文件的文件夹不会阻塞界面。
+    """
+    # 展开/折叠动画会把整个子树绘制到一张图片中，文件夹中的项目超过此数量时关闭动画
+    ANIMATION_MAX_ROWS = 500
+    
     def __init__(self):
         super().__init__()
+        self.file_model = FileTreeModel(self)
+        self.setModel(self.file_model)
         self.setMinimumHeight(150)
         self.setHeaderHidden(True)  # 隐藏表头
         self.setStyleSheet("""
-            QTreeWidget {
+            QTreeView {
                 border: 1px solid #cccccc;
                 border-radius: 5px;
                 background-color: white;
                 padding: 5px;
                 show-decoration-selected: 1;
             }
-            QTreeWidget::item {
+            QTreeView::item {
                 padding: 5px;
                 color: #333333;
             }
-            QTreeWidget::item:selected {
+            QTreeView::item:selected {
                 background-color: #e3f2fd;
                 color: #1976d2;
             }
-            QTreeWidget::item:hover {
+            QTreeView::item:hover {
                 background-color: #f5f5f5;
             }
         """)
         self.setIndentation(20)  # 设置缩进
-        self.setSelectionMode(QTreeWidget.ExtendedSelection)
-        self.setVerticalScrollMode(QTreeWidget.ScrollPerPixel)  # 平滑滚动
+        self.setSelectionMode(QTreeView.ExtendedSelection)
+        self.setVerticalScrollMode(QTreeView.ScrollPerPixel)  # 平滑滚动
+        self.setUniformRowHeights(True)  # 行高相同，视图只为可见的行计算布局
         self.setAnimated(True)  # 启用动画效果
         
+        self.file_model.rowsInserted.connect(self.handle_rows_inserted)
+        
         # 连接点击信号
-        self.itemClicked.connect(self.handle_item_clicked)
+        self.clicked.connect(self.handle_item_clicked)
         # 连接展开信号
-        self.itemExpanded.connect(self.handle_item_expanded)
+        self.expanded.connect(self.handle_item_expanded)
         # 连接折叠信号
-        self.itemCollapsed.connect(self.handle_item_collapsed)
+        self.collapsed.connect(self.handle_item_collapsed)
         
-    def handle_item_clicked(self, item, column):
+    def handle_item_clicked(self, index):
         """处理项目点击事件"""
-        # 如果点击的是文件夹（有子项的项目）
-        if item.childCount() > 0:
+        # 如果点击的是文件夹
+        if self.file_model.node(index).is_dir:
             # 切换展开/折叠状态
-            item.setExpanded(not item.isExpanded())
+            self.setExpanded(index, not self.isExpanded(index))
             
-    def handle_item_expanded(self, item):
+    def handle_rows_inserted(self, parent, first, last):
+        """文件夹中的项目较多时关闭展开/折叠动画"""
+        if last + 1 > self.ANIMATION_MAX_ROWS:
+            self.setAnimated(False)
+            
+    def handle_item_expanded(self, index):
         """处理项目展开事件"""
-        # 计算需要显示的区域
-        rect = self.visualItemRect(item)
         # 确保展开的项目可见
-        self.scrollTo(self.indexFromItem(item), QTreeWidget.PositionAtTop)
+        self.scrollTo(index, QTreeView.PositionAtTop)
         # 等待一小段时间，让展开动画完成
-        QTimer.singleShot(100, lambda: self.ensure_children_visible(item))
+        QTimer.singleShot(100, lambda: self.ensure_children_visible(index))
         
-    def handle_item_collapsed(self, item):
+    def handle_item_collapsed(self, index):
         """处理项目折叠事件"""
         # 确保折叠后的项目可见
-        self.scrollTo(self.indexFromItem(item))
+        self.scrollTo(index)
+        self.release_children(index)
+        
+    def release_children(self, index):
+        """折叠的文件夹中没有选中的项目时释放其子节点"""
+        node = self.file_model.node(index)
+        for selected in self.selectionModel().selectedIndexes():
+            parent = self.file_model.node(selected).parent
+            while parent is not None:
+                if parent is node:
+                    return
+                parent = parent.parent
+        self.file_model.unload(index)
         
-    def ensure_children_visible(self, item):
+    def ensure_children_visible(self, index):
         """确保子项目可见"""
         # 获取最后一个子项
-        if item.childCount() > 0:
-            last_child = item.child(item.childCount() - 1)
+        rows = self.file_model.rowCount(index)
+        if index.isValid() and rows > 0:
+            last_child = self.file_model.index(rows - 1, 0, index)
             # 计算需要显示的区域
-            rect = self.visualItemRect(last_child)
+            rect = self.visualRect(last_child)
             # 如果最后一个子项不在可见区域内，滚动到合适位置
             viewport_height = self.viewport().height()
             if rect.bottom() > viewport_height:
-                self.scrollTo(self.indexFromItem(last_child), QTreeWidget.PositionAtBottom)
+                self.scrollTo(last_child, QTreeView.PositionAtBottom)
                 
+    def collapseAll(self):
+        """折叠所有项目并释放顶层文件夹的子节点"""
+        super().collapseAll()
+        for row in range(self.file_model.rowCount()):
+            self.release_children(self.file_model.index(row, 0))
+            
     def mousePressEvent(self, event):
         """处理鼠标点击事件"""
-        item = self.itemAt(event.pos())
-        if not item:
+        index = self.indexAt(event.pos())
+        if not index.isValid():
             # 如果点击空白区域，取消所有选择
             self.clearSelection()
         super().mousePressEvent(event)
         
     def add_path(self, path):
-        """添加文件或文件夹到树中"""
+        """添加文件或文件夹到树中，文件夹的内容在后台读取"""
         if os.path.exists(path):
-            item = QTreeWidgetItem()
-            item.setData(0, Qt.UserRole, path)  # 存储完整路径
-            name = os.path.basename(path)
-            
-            if os.path.isdir(path):
-                item.setText(0, "📁 " + name)
-                self.add_folder_contents(item, path)
-                item.setExpanded(True)  # 默认展开文件夹
-            else:
-                item.setText(0, "📄 " + name)
-            
-            self.addTopLevelItem(item)
+            index = self.file_model.add_path(path)
+            if self.file_model.node(index).is_dir:
+                self.expand(index)  # 默认展开文件夹
             # 确保新添加的项目可见
-            self.scrollToItem(item)
-            return item
-            
-    def add_folder_contents(self, parent_item, folder_path):
-        """递归添加文件夹内容"""
-        try:
-            for entry in os.scandir(folder_path):
-                child = QTreeWidgetItem(parent_item)
-                child.setData(0, Qt.UserRole, entry.path)  # 存储完整路径
-                
-                if entry.is_dir():
-                    child.setText(0, "📁 " + entry.name)
-                    self.add_folder_contents(child, entry.path)
-                else:
-                    child.setText(0, "📄 " + entry.name)
-        except Exception as e:
-            print(f"Error reading folder {folder_path}: {str(e)}")
+            self.scrollTo(index)
+            return index
             
+    def clear(self):
+        """清空文件树"""
+        self.file_model.clear()
+        self.setAnimated(True)
+        
+    def set_file_index(self, file_index):
+        """使用共享的文件索引，已扫描的文件夹展开时不再读取磁盘"""
+        self.file_model.file_index = file_index
+        
+    def shutdown(self):
+        """窗口关闭时停止后台读取"""
+        self.file_model.shutdown()
+        
     def get_selected_paths(self):
         """获取所有选中项的路径"""
         paths = []
-        for item in self.selectedItems():
-            path = item.data(0, Qt.UserRole)
+        for index in self.selectionModel().selectedRows():
+            path = self.file_model.node(index).path
             if os.path.exists(path):
                 paths.append(path)
         return paths
 
+class DiscoveryThread(QThread):
+    """在后台扫描拖入的路径，建立文件索引"""
+    progress_signal = pyqtSignal(object, int, int)  # (线程, 已发现的文件数, 字节数)
+    done_signal = pyqtSignal(object, bool)  # (线程, 是否扫描完成)
+    
+    # 发送扫描进度的最短间隔（秒）
+    PROGRESS_INTERVAL = 0.2
+    
+    def __init__(self, file_index):
+        super().__init__()
+        self.file_index = file_index
+        
+    def run(self):
+        files = size = 0
+        last = 0
+        
+        def progress(path, listing):
+            nonlocal files, size, last
+            files += len(listing.files)
+            size += sum(file_size for file_size, _ in listing.files.values())
+            now = time.monotonic()
+            if now - last >= self.PROGRESS_INTERVAL:
+                last = now
+                self.progress_signal.emit(self, files, size)
+                
+        try:
+            completed = self.file_index.scan(progress, self.isInterruptionRequested)
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"扫描文件失败: {str(e)}")
+            completed = False
+        self.done_signal.emit(self, completed)
+
+class LogChannel(QObject):
+    """日志和进度的缓冲通道
+    
+    任意线程都可以调用 log 和 set_progress，消息先放入缓冲区，由界面线程按固定间隔一次性
+    追加到日志控件，进度只显示最新的值。日志控件最多保留 MAX_LINES 行，更早的行被丢弃；
+    打开日志文件后完整日志在 log 时同时写入文件，日志文件可在任意线程中关闭。
+    """
+    # 刷新界面的间隔（毫秒）
+    FLUSH_INTERVAL_MS = 100
+    # 日志控件保留的最大行数
+    MAX_LINES = 5000
+    
+    def __init__(self, log_widget, progress_bar, parent=None):
+        super().__init__(parent)
+        self.log_widget = log_widget
+        self.log_widget.setMaximumBlockCount(self.MAX_LINES)
+        self.progress_bar = progress_bar
+        self.lock = threading.Lock()
+        self.pending = []  # 尚未显示的消息
+        self.progress = None  # 尚未显示的最新进度
+        self.log_file = None
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.flush)
+        self.timer.start(self.FLUSH_INTERVAL_MS)
+        
+    def log(self, message):
+        """添加一条日志消息"""
+        with self.lock:
+            self.pending.append(message)
+            if self.log_file is not None:
+                self.log_file.write(message + '\n')
+                
+    def set_progress(self, value):
+        """记录最新进度（0-100）"""
+        self.progress = value
+        
+    def open_log_file(self, path):
+        """将之后的完整日志写入文件"""
+        with self.lock:
+            self.close_file()
+            try:
+                self.log_file = open(path, 'w', encoding='utf-8')
+            except OSError as e:
+                self.pending.append(f"无法创建日志文件 {path}: {str(e)}")
+                
+    def close_log_file(self):
+        """关闭日志文件（可在任意线程中调用），未显示的消息仍由定时器显示"""
+        with self.lock:
+            self.close_file()
+            
+    def close_file(self):
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+            
+    def flush(self):
+        """将缓冲的消息一次性追加到日志控件并更新进度（在界面线程中调用）"""
+        with self.lock:
+            messages, self.pending = self.pending, []
+            progress, self.progress = self.progress, None
+            if messages and self.log_file is not None:
+                self.log_file.flush()
+        if messages:
+            # 超出日志控件容量的消息只写入日志文件
+            self.log_widget.appendPlainText('\n'.join(messages[-self.MAX_LINES:]))
+        if progress is not None:
+            self.progress_bar.setValue(int(progress))
+
 class ConversionThread(QThread):
     """转换线程"""
     progress_signal = pyqtSignal(float)
     log_signal = pyqtSignal(str)
+    log_file_signal = pyqtSignal(str)  # 本次转换的完整日志文件路径
     error_signal = pyqtSignal(str)
     finished_signal = pyqtSignal()
     
-    def __init__(self, file_paths, converter):
+    def __init__(self, file_paths, converter, max_workers=None, incremental=False,
+                 use_cache=False, bundle_name=None, file_index=None):
         super().__init__()
-        self.file_paths = file_paths
+        self.file_paths = file_paths  # 要转换的文件或文件夹
         self.converter = converter
+        self.max_workers = max_workers  # 并行转换的进程数，None表示使用CPU核心数
+        self.incremental = incremental  # 是否跳过未修改的文件
+        self.use_cache = use_cache  # 是否使用按内容寻址的转换缓存
+        self.bundle_name = bundle_name  # 合并PDF的名称，None表示每个文件单独输出
+        self.file_index = file_index  # 拖入路径的文件索引，None表示重新扫描
         
     def run(self):
         try:
-            total_files = len(self.file_paths)
-            converted_count = 0
+            self.converter.cancel_flag = False
             
+            # 刷新文件索引：只重新读取修改过的目录
+            file_index = self.file_index or FileIndex(self.file_paths)
+            file_index.scan(cancelled=lambda: self.converter.cancel_flag)
+            # 同时选中文件夹及其中的文件时只转换一次
+            file_paths = list(dict.fromkeys(record.path for record in file_index.records(self.file_paths)))
+            if not file_paths:
+                self.log_signal.emit("所选路径中没有可转换的文件！")
+                return
+                
             # 创建输出目录
-            first_file_dir = os.path.dirname(self.file_paths[0])
+            first_file_dir = os.path.dirname(file_paths[0])
             output_dir = os.path.join(first_file_dir, 'outputsPDF')
             os.makedirs(output_dir, exist_ok=True)
+            self.log_file_signal.emit(os.path.join(output_dir, LOG_NAME))
             
-            for index, file_path in enumerate(self.file_paths, 1):
-                if self.converter.cancel_flag:
-                    self.log_signal.emit("转换已取消！")
-                    break
-                    
-                try:
-                    # 获取文件扩展名
-                    _, ext = os.path.splitext(file_path)
-                    ext = ext.lower()
-                    
-                    # 创建输出文件路径
-                    rel_path = os.path.relpath(file_path, first_file_dir)
-                    output_path = os.path.join(output_dir, rel_path + '.pdf')
-                    
-                    # 确保输出目录存在
-                    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                    
-                    # 获取对应的转换方法
-                    converter_method = self.converter.supported_extensions.get(ext)
-                    
-                    if converter_method:
-                        # 使用对应的转换器
-                        if converter_method(file_path, output_path):
-                            converted_count += 1
-                            self.log_signal.emit(f"成功转换 ({index}/{total_files}): {rel_path}")
-                        else:
-                            self.log_signal.emit(f"转换失败 ({index}/{total_files}): {rel_path}")
-                    else:
-                        # 尝试作为文本文件处理
-                        self.log_signal.emit(f"尝试读取文件内容 ({index}/{total_files}): {rel_path}")
-                        if self.converter.convert_unknown_file(file_path, output_path):
-                            converted_count += 1
-                            self.log_signal.emit(f"成功转换为文本 ({index}/{total_files}): {rel_path}")
-                        else:
-                            self.log_signal.emit(f"无法转换文件 ({index}/{total_files}): {rel_path}")
-                            
-                except Exception as e:
-                    self.log_signal.emit(f"处理文件失败 ({index}/{total_files}): {rel_path} - {str(e)}")
-                    continue
-                    
-                # 更新进度
-                progress = (index / total_files) * 100
-                self.progress_signal.emit(progress)
+            tasks = []
+            for file_path in file_paths:
+                # 创建输出文件路径
+                rel_path = os.path.relpath(file_path, first_file_dir)
+                output_path = os.path.join(output_dir, rel_path + '.pdf')
+                tasks.append((file_path, output_path, rel_path))
                 
-            # 转换完成
-            self.log_signal.emit(f"转换完成！共转换 {converted_count}/{total_files} 个文件")
-            self.finished_signal.emit()
+            # 跳过二进制文件
+            file_filter = FileFilter(known_extensions=self.converter.known_extensions())
+            tasks, skipped = file_filter.filter_tasks(tasks)
+            if format_skipped(skipped):
+                self.log_signal.emit(format_skipped(skipped))
+                
+            manifest = None
+            if self.incremental and not self.bundle_name:
+                manifest = ConversionManifest(output_dir, self.converter.settings_signature())
+            cache = ConversionCache() if self.use_cache else None
+            bundle = None
+            if self.bundle_name:
+                bundle = PDFBundle(output_dir, self.bundle_name)
+                tasks = bundle.stage(tasks)
+            
+            # 并行转换，结果按完成顺序回报
+            run_batch(self.converter, tasks, self.log_signal.emit,
+                      self.progress_signal.emit, self.max_workers, manifest, cache, bundle,
+                      report_path=os.path.join(output_dir, REPORT_NAME), size_of=file_index.size_of)
             
         except Exception as e:
             self.error_signal.emit(str(e))
+        finally:
+            # 出错时同样关闭日志文件并恢复界面
+            self.finished_signal.emit()
 
 class PDFConverterGUI(QMainWindow):
     def __init__(self):
         super().__init__()
         self.converter = PDFConverter()
-        self.selected_paths = []
+        self.selected_paths = []  # 拖入或选择的文件和文件夹
+        self.file_index = None  # 所选路径的文件索引
+        self.discovery_thread = None
         self.setup_ui()
         self.setup_logging()
         
@@ -473,10 +822,10 @@ class PDFConverterGUI(QMainWindow):
             """)
             layout.addWidget(log_label)
             
-            self.log_text = QTextEdit()
+            self.log_text = QPlainTextEdit()
             self.log_text.setReadOnly(True)
             self.log_text.setStyleSheet("""
-                QTextEdit {
+                QPlainTextEdit {
                     border: 1px solid #cccccc;
                     border-radius: 5px;
                     padding: 10px;
@@ -485,6 +834,8 @@ class PDFConverterGUI(QMainWindow):
                 }
             """)
             layout.addWidget(self.log_text)
+            # 日志和进度经缓冲后按固定间隔刷新到界面
+            self.log_channel = LogChannel(self.log_text, self.progress_bar, self)
             
             # 按钮区域
             button_layout = QHBoxLayout()
@@ -533,6 +884,36 @@ class PDFConverterGUI(QMainWindow):
             self.cancel_button.clicked.connect(self.cancel_conversion)
             self.cancel_button.setEnabled(False)
             
+            # 增量转换选项
+            self.incremental_checkbox = QCheckBox("增量转换（跳过未修改的文件）")
+            self.incremental_checkbox.setStyleSheet("""
+                QCheckBox {
+                    color: #333333;
+                    font-size: 12px;
+                }
+            """)
+            
+            # 转换缓存选项
+            self.cache_checkbox = QCheckBox("使用转换缓存（相同内容的文件只转换一次）")
+            self.cache_checkbox.setStyleSheet("""
+                QCheckBox {
+                    color: #333333;
+                    font-size: 12px;
+                }
+            """)
+            
+            # 合并输出选项
+            self.bundle_checkbox = QCheckBox("合并为一个PDF（每个文件一个书签）")
+            self.bundle_checkbox.setStyleSheet("""
+                QCheckBox {
+                    color: #333333;
+                    font-size: 12px;
+                }
+            """)
+            
+            button_layout.addWidget(self.incremental_checkbox)
+            button_layout.addWidget(self.cache_checkbox)
+            button_layout.addWidget(self.bundle_checkbox)
             button_layout.addStretch()
             button_layout.addWidget(self.start_button)
             button_layout.addWidget(self.cancel_button)
@@ -579,58 +960,73 @@ class PDFConverterGUI(QMainWindow):
         """处理选中的文件或文件夹"""
         try:
             self.file_tree.clear()  # 清空现有列表
+            self.stop_discovery()
             
-            for path in paths:
-                if os.path.exists(path):
-                    self.file_tree.add_path(path)
-                    self.log_message(f"已添加: {path}")
-            
-            # 获取所有文件路径（包括子文件夹中的文件）
-            self.selected_paths = self.get_all_file_paths(paths)
-            
-            if self.selected_paths:
-                self.start_button.setEnabled(True)
-            else:
-                self.show_error("错误", "所选路径中没有可转换的文件！")
+            self.selected_paths = [path for path in paths if os.path.exists(path)]
+            # 在后台扫描一次所选路径，文件树和转换共用扫描结果
+            self.file_index = FileIndex(self.selected_paths)
+            self.file_tree.set_file_index(self.file_index)
+            for path in self.selected_paths:
+                self.file_tree.add_path(path)
+                self.log_message(f"已添加: {path}")
+                
+            self.start_button.setEnabled(False)
+            self.progress_bar.setRange(0, 0)  # 扫描期间显示忙碌状态
+            self.discovery_thread = DiscoveryThread(self.file_index)
+            self.discovery_thread.progress_signal.connect(self.discovery_progress)
+            self.discovery_thread.done_signal.connect(self.discovery_finished)
+            self.discovery_thread.start()
         except Exception as e:
             self.show_error("选择文件失败", str(e))
             
-    def get_all_file_paths(self, paths):
-        """获取所有文件路径，包括子文件夹中的文件"""
-        all_files = []
-        for path in paths:
-            if os.path.isfile(path):
-                all_files.append(path)
-            elif os.path.isdir(path):
-                for root, _, files in os.walk(path):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        all_files.append(file_path)
-        return all_files
-        
-    def log_message(self, message):
-        """记录日志消息"""
-        try:
-            self.log_text.append(message)
-        except Exception as e:
-            self.show_error("日志记录失败", str(e))
+    def discovery_progress(self, thread, files, size):
+        """显示扫描进度"""
+        if thread is self.discovery_thread:
+            self.progress_bar.setFormat(f"正在扫描… 已发现 {files} 个文件（{size / 1024 / 1024:.1f}MB）")
             
-    def update_progress(self, value):
-        """更新进度条"""
-        try:
-            self.progress_bar.setValue(int(value))
-        except Exception as e:
-            self.show_error("更新进度失败", str(e))
+    def discovery_finished(self, thread, completed):
+        """扫描完成的处理"""
+        if thread is not self.discovery_thread:
+            return
+        self.discovery_thread = None
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.progress_bar.resetFormat()
+        if not completed:
+            return
+        files = size = 0
+        for listing in self.file_index.listings.values():
+            files += len(listing.files)
+            size += sum(file_size for file_size, _ in listing.files.values())
+        for file_size, _ in self.file_index.file_stats.values():
+            files += 1
+            size += file_size
+        self.log_message(f"共发现 {files} 个文件（{size / 1024 / 1024:.1f}MB）")
+        if files:
+            self.start_button.setEnabled(True)
+        else:
+            self.show_error("错误", "所选路径中没有可转换的文件！")
+            
+    def stop_discovery(self):
+        """停止正在进行的扫描"""
+        if self.discovery_thread is not None:
+            self.discovery_thread.requestInterruption()
+            self.discovery_thread.wait()
+            self.discovery_thread = None
+            self.progress_bar.setRange(0, 100)
+            self.progress_bar.resetFormat()
             
+    def log_message(self, message):
+        """记录日志消息"""
+        self.log_channel.log(message)
+        
     def start_conversion(self):
         """开始转换"""
         try:
-            # 获取当前选中的文件
-            selected_paths = self.file_tree.get_selected_paths()
-            if selected_paths:
-                self.selected_paths = self.get_all_file_paths(selected_paths)
+            # 获取当前选中的文件，没有选中时转换所有拖入的路径
+            paths = self.file_tree.get_selected_paths() or self.selected_paths
             
-            if not self.selected_paths:
+            if not paths:
                 self.show_error("错误", "请选择要转换的文件！")
                 return
                 
@@ -639,15 +1035,22 @@ class PDFConverterGUI(QMainWindow):
             self.drop_area.setEnabled(False)
             self.file_tree.setEnabled(False)  # 禁用文件树
             
-            # 创建输出目录
-            output_dir = os.path.join(os.path.dirname(self.selected_paths[0]), 'outputsPDF')
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # 创建并启动转换线程
-            self.conversion_thread = ConversionThread(self.selected_paths, self.converter)
-            self.conversion_thread.progress_signal.connect(self.update_progress)
-            self.conversion_thread.log_signal.connect(self.log_message)
+            # 创建并启动转换线程，文件列表在转换线程中从文件索引读取
+            self.conversion_thread = ConversionThread(
+                paths, self.converter,
+                incremental=self.incremental_checkbox.isChecked(),
+                use_cache=self.cache_checkbox.isChecked(),
+                bundle_name='bundle' if self.bundle_checkbox.isChecked() else None,
+                file_index=self.file_index)
+            # 日志和进度信号直接写入缓冲通道，不为每条消息向界面线程发送事件
+            self.conversion_thread.progress_signal.connect(self.log_channel.set_progress, Qt.DirectConnection)
+            self.conversion_thread.log_signal.connect(self.log_channel.log, Qt.DirectConnection)
+            self.conversion_thread.log_file_signal.connect(self.log_channel.open_log_file, Qt.DirectConnection)
+            # 错误信息同时写入日志，日志文件在转换线程结束前关闭（包括出错的情况）
+            self.conversion_thread.error_signal.connect(
+                lambda e: self.log_channel.log(f"转换错误: {e}"), Qt.DirectConnection)
             self.conversion_thread.error_signal.connect(lambda e: self.show_error("转换错误", e))
+            self.conversion_thread.finished_signal.connect(self.log_channel.close_log_file, Qt.DirectConnection)
             self.conversion_thread.finished_signal.connect(self.conversion_finished)
             self.conversion_thread.start()
             
@@ -678,4 +1081,11 @@ class PDFConverterGUI(QMainWindow):
                 self.drop_area.setEnabled(True)
                 self.file_tree.setEnabled(True)  # 启用文件树
         except Exception as e:
-            self.show_error("取消转换失败", str(e)) 
\ No newline at end of file
+            self.show_error("取消转换失败", str(e)) 
+            
+    def closeEvent(self, event):
+        """关闭窗口时停止后台扫描和文件树的后台读取"""
+        self.stop_discovery()
+        self.file_tree.shutdown()
+        self.log_channel.close_log_file()
+        super().closeEvent(event)
\ No newline at end of file
@@ -1,8 +1,7 @@
 import sys
 import traceback
 import logging
-from PyQt5.QtWidgets import QApplication
-from gui import PDFConverterGUI
+import multiprocessing
 
 def setup_logging():
     logging.basicConfig(
@@ -22,6 +21,10 @@ def main():
         # 设置异常处理器
         sys.excepthook = handle_exception
         
+        # 界面模块只在主进程中导入，避免转换工作进程加载PyQt5
+        from PyQt5.QtWidgets import QApplication
+        from gui import PDFConverterGUI
+        
         # 创建应用实例
         app = QApplication(sys.argv)
         
@@ -37,4 +40,6 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
+    # 打包后的程序需要此调用才能正确启动转换工作进程
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
@@ -0,0 +1,110 @@
+import os
+import json
+import logging
+from utils import hash_file, output_volumes
+
+# 清单文件保存在 outputsPDF 目录中
+MANIFEST_NAME = '.conversion_manifest.json'
+
+
+class ConversionManifest:
+    """增量转换清单
+
+    记录每个源文件的路径、大小、修改时间、内容哈希、转换器设置和输出路径，
+    用于跳过自上次转换以来未发生变化的文件。
+    """
+
+    def __init__(self, output_dir, signature):
+        self.logger = logging.getLogger(__name__)
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.signature = signature
+        self.entries = {}
+        self.load()
+
+    def load(self):
+        """读取清单，文件损坏时从空清单开始"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get('files', {})
+        except Exception as e:
+            self.logger.warning(f"读取转换清单失败，将重新转换所有文件: {str(e)}")
+            self.entries = {}
+
+    def save(self):
+        """写入清单（先写临时文件再替换，避免中断时损坏）"""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'files': self.entries}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def is_up_to_date(self, input_path, output_path, rel_path):
+        """判断文件自上次转换后是否未变化"""
+        # 相册任务以目录为输入，无法判断目录中的图片是否变化，总是重新转换
+        if os.path.isdir(input_path):
+            return False
+        entry = self.entries.get(rel_path)
+        if not entry or entry.get('converter') != self.signature:
+            return False
+        if entry.get('output') != output_path or not os.path.exists(output_path):
+            return False
+
+        stat = os.stat(input_path)
+        if stat.st_size != entry.get('size'):
+            return False
+        if stat.st_mtime_ns == entry.get('mtime'):
+            return True
+
+        # 修改时间变化但大小相同，比较内容哈希
+        if hash_file(input_path) != entry.get('hash'):
+            return False
+        entry['mtime'] = stat.st_mtime_ns
+        return True
+
+    def record(self, input_path, output_path, rel_path, content_hash=None):
+        """记录一次成功的转换，已知输入文件的内容哈希时传入 content_hash，不再读取文件"""
+        if os.path.isdir(input_path):
+            return
+        stat = os.stat(input_path)
+        self.entries[rel_path] = {
+            'path': input_path,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'hash': content_hash or hash_file(input_path),
+            'converter': self.signature,
+            'output': output_path,
+        }
+
+    def filter_tasks(self, tasks):
+        """过滤掉未变化的文件，返回 (待转换任务, 跳过数量)"""
+        pending = []
+        skipped = 0
+        for task in tasks:
+            input_path, output_path, rel_path = task
+            try:
+                if self.is_up_to_date(input_path, output_path, rel_path):
+                    skipped += 1
+                    continue
+            except OSError as e:
+                self.logger.warning(f"检查文件状态失败 {rel_path}: {str(e)}")
+            pending.append(task)
+        return pending, skipped
+
+    def prune(self):
+        """删除源文件已不存在的记录及其输出的PDF，返回删除的数量"""
+        removed = 0
+        for rel_path, entry in list(self.entries.items()):
+            if os.path.exists(entry.get('path', '')):
+                continue
+            output_path = entry.get('output')
+            try:
+                for path in output_volumes(output_path) if output_path else []:
+                    if os.path.exists(path):
+                        os.remove(path)
+            except OSError as e:
+                self.logger.warning(f"删除过期的PDF失败 {output_path}: {str(e)}")
+                continue
+            del self.entries[rel_path]
+            removed += 1
+        return removed
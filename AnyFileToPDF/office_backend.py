@@ -0,0 +1,386 @@
+"""旧版Office文件（.doc/.xls/.ppt）的转换后端
+
+转换由常驻的辅助进程完成，每个辅助进程启动一个无界面的 LibreOffice 实例并通过UNO接口
+逐个转换文件，多个文件复用同一个实例，不必每个文件都重新启动 LibreOffice。
+辅助进程组成大小可配置的进程池，单个文件超时时终止对应的辅助进程及其 LibreOffice 实例，
+下一个文件使用新启动的辅助进程。
+
+辅助进程以 multiprocessing 的 spawn 方式启动（打包后的程序同样可用），通过管道交换字典：
+    启动完成 -> {'ready': True} 或 {'ready': False, 'error': '...'}
+    请求 {'input': 输入路径, 'output': 输出路径} -> {'ok': True} 或 {'ok': False, 'error': '...'}
+    请求 None -> 辅助进程退出
+
+设置 ANYFILETOPDF_OFFICE_BACKEND=stub 时使用不依赖 LibreOffice 的测试后端，
+它为每个文件生成一页说明PDF，可通过 ANYFILETOPDF_OFFICE_STUB_DELAY 模拟转换耗时。
+"""
+import os
+import sys
+import glob
+import time
+import queue
+import shutil
+import signal
+import logging
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+from multiprocessing.managers import BaseManager
+
+# 旧版格式 -> LibreOffice 的PDF导出过滤器
+LEGACY_FORMATS = {
+    '.doc': 'writer_pdf_Export',
+    '.xls': 'calc_pdf_Export',
+    '.ppt': 'impress_pdf_Export',
+}
+# 转换后端：soffice（默认）或 stub
+BACKEND_ENV = 'ANYFILETOPDF_OFFICE_BACKEND'
+# stub 后端每个文件的模拟耗时（秒）
+STUB_DELAY_ENV = 'ANYFILETOPDF_OFFICE_STUB_DELAY'
+# 默认的进程池大小和单个文件的超时时间（秒）
+OFFICE_WORKERS = 1
+OFFICE_TIMEOUT = 120
+# 等待 LibreOffice 监听的最长时间（秒）
+SOFFICE_START_TIMEOUT = 60
+
+
+class OfficeError(Exception):
+    """旧版Office文件转换失败"""
+
+
+def office_backend_name():
+    """当前使用的转换后端名称"""
+    return os.environ.get(BACKEND_ENV, 'soffice')
+
+
+def is_legacy_office(path):
+    """判断文件是否为需要通过 LibreOffice 转换的旧版Office格式"""
+    return os.path.splitext(path)[1].lower() in LEGACY_FORMATS
+
+
+def find_soffice():
+    """查找 LibreOffice 的可执行文件，未安装时返回None"""
+    for name in ('soffice', 'libreoffice'):
+        path = shutil.which(name)
+        if path:
+            return path
+    if sys.platform == 'win32':
+        for root in (os.environ.get('PROGRAMFILES', 'C:/Program Files'),
+                     os.environ.get('PROGRAMFILES(X86)', 'C:/Program Files (x86)')):
+            path = os.path.join(root, 'LibreOffice', 'program', 'soffice.exe')
+            if os.path.exists(path):
+                return path
+    elif sys.platform == 'darwin':
+        path = '/Applications/LibreOffice.app/Contents/MacOS/soffice'
+        if os.path.exists(path):
+            return path
+    return None
+
+
+class OfficeWorker:
+    """一个常驻的辅助进程"""
+
+    def __init__(self, backend, timeout, soffice=None):
+        self.backend = backend
+        self.timeout = timeout
+        # 与批量转换的工作进程一样以 spawn 方式启动，打包后的程序同样可用
+        ctx = multiprocessing.get_context('spawn')
+        self.conn, child_conn = ctx.Pipe()
+        # 不使用守护进程，进程池运行在工作进程或管理进程中时也可以启动辅助进程
+        self.process = ctx.Process(target=serve, args=(backend, child_conn, soffice))
+        self.process.start()
+        child_conn.close()
+        ready = self.receive(max(timeout, SOFFICE_START_TIMEOUT))
+        if not ready.get('ready'):
+            self.kill()
+            raise OfficeError(ready.get('error', '转换进程启动失败'))
+
+    def receive(self, timeout):
+        """读取一条响应，超时时终止辅助进程"""
+        try:
+            if not self.conn.poll(timeout):
+                self.kill()
+                raise OfficeError(f"转换超时（{timeout}秒）")
+            return self.conn.recv()
+        except (EOFError, OSError):
+            self.kill()
+            raise OfficeError("转换进程意外退出")
+
+    def convert(self, input_path, output_path):
+        """转换一个文件，失败时抛出 OfficeError"""
+        try:
+            self.conn.send({'input': input_path, 'output': output_path})
+        except OSError:
+            self.kill()
+            raise OfficeError("转换进程意外退出")
+        result = self.receive(self.timeout)
+        if not result.get('ok'):
+            raise OfficeError(result.get('error', '转换失败'))
+
+    @property
+    def alive(self):
+        return self.process.is_alive()
+
+    def kill(self):
+        """终止辅助进程及其启动的 LibreOffice"""
+        try:
+            if sys.platform == 'win32':
+                if self.process.is_alive():
+                    subprocess.run(['taskkill', '/F', '/T', '/PID', str(self.process.pid)],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            else:
+                # 辅助进程是进程组组长，已退出时其启动的 LibreOffice 仍在原进程组中
+                os.killpg(self.process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def close(self):
+        """通知辅助进程正常退出，未及时退出时强制终止"""
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=10)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+
+class OfficePool:
+    """常驻辅助进程池，可在多个线程中同时使用
+
+    辅助进程在需要时才启动，最多 size 个；超时或异常退出的辅助进程被丢弃，之后按需重新启动。
+    """
+
+    def __init__(self, size=OFFICE_WORKERS, timeout=OFFICE_TIMEOUT, backend=None):
+        self.logger = logging.getLogger(__name__)
+        self.backend = backend or office_backend_name()
+        self.timeout = timeout
+        # LibreOffice 只在创建进程池时查找一次
+        self.soffice = find_soffice() if self.backend == 'soffice' else None
+        self.idle = queue.Queue()
+        # 可以再启动的辅助进程数
+        self.slots = threading.Semaphore(max(1, size))
+        self.workers = []
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """取得一个空闲的辅助进程，没有空闲的进程时启动新进程或等待"""
+        while True:
+            try:
+                return self.idle.get_nowait()
+            except queue.Empty:
+                pass
+            if self.slots.acquire(timeout=0.1):
+                try:
+                    worker = OfficeWorker(self.backend, self.timeout, self.soffice)
+                except Exception:
+                    self.slots.release()
+                    raise
+                with self.lock:
+                    self.workers.append(worker)
+                return worker
+
+    def release(self, worker):
+        """归还辅助进程，已退出的进程被丢弃"""
+        if worker.alive:
+            self.idle.put(worker)
+            return
+        with self.lock:
+            self.workers.remove(worker)
+        self.slots.release()
+
+    def convert(self, input_path, output_path):
+        """转换一个旧版Office文件为PDF，失败时抛出 OfficeError"""
+        if self.backend == 'soffice' and self.soffice is None:
+            raise OfficeError("未找到 LibreOffice（soffice），无法转换旧版Office文件")
+        worker = self.acquire()
+        try:
+            worker.convert(os.path.abspath(input_path), os.path.abspath(output_path))
+        finally:
+            self.release(worker)
+
+    def close(self):
+        """关闭所有辅助进程，仍在转换的辅助进程直接终止"""
+        idle = set()
+        while True:
+            try:
+                idle.add(self.idle.get_nowait())
+            except queue.Empty:
+                break
+        with self.lock:
+            workers, self.workers = self.workers, []
+        for worker in workers:
+            if worker in idle:
+                worker.close()
+            else:
+                worker.kill()
+
+
+class OfficeManager(BaseManager):
+    """在单独的管理进程中运行 OfficePool，使进程池可以在批量转换的工作进程之间共享"""
+
+
+OfficeManager.register('OfficePool', OfficePool)
+
+
+def start_office_manager():
+    """启动管理进程，返回的管理器用完后应调用 shutdown"""
+    manager = OfficeManager(ctx=multiprocessing.get_context('spawn'))
+    manager.start()
+    return manager
+
+
+def soffice_profile(profile_dir):
+    """LibreOffice 用户配置目录参数，每个实例使用独立的目录才能同时运行"""
+    return '-env:UserInstallation=' + 'file:///' + profile_dir.replace('\\', '/').lstrip('/')
+
+
+class SofficeServer:
+    """辅助进程中的 LibreOffice 实例
+
+    可以导入 uno 模块时启动一个常驻的监听实例并通过UNO接口转换；否则每个文件调用一次
+    soffice --convert-to，但复用同一个用户配置目录，省去每次初始化配置的时间。
+    """
+
+    def __init__(self, soffice=None):
+        self.soffice = soffice or find_soffice()
+        if self.soffice is None:
+            raise OfficeError("未找到 LibreOffice（soffice），无法转换旧版Office文件")
+        self.profile_dir = tempfile.mkdtemp(prefix='anyfiletopdf_soffice_')
+        self.process = None
+        self.desktop = None
+        try:
+            import uno
+        except ImportError:
+            return
+        pipe_name = f'anyfiletopdf_{os.getpid()}'
+        self.process = subprocess.Popen(
+            [self.soffice, soffice_profile(self.profile_dir), '--headless', '--invisible', '--nologo',
+             '--norestore', '--nodefault', '--nolockcheck',
+             f'--accept=pipe,name={pipe_name};urp;StarOffice.ComponentContext'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext('com.sun.star.bridge.UnoUrlResolver', local)
+        deadline = time.monotonic() + SOFFICE_START_TIMEOUT
+        while True:
+            try:
+                context = resolver.resolve(f'uno:pipe,name={pipe_name};urp;StarOffice.ComponentContext')
+                break
+            except Exception:
+                if time.monotonic() > deadline or self.process.poll() is not None:
+                    raise OfficeError("LibreOffice 启动失败")
+                time.sleep(0.2)
+        self.desktop = context.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', context)
+
+    def convert(self, input_path, output_path):
+        filter_name = LEGACY_FORMATS[os.path.splitext(input_path)[1].lower()]
+        if self.desktop is None:
+            self.convert_with_cli(input_path, output_path)
+            return
+        import uno
+        from com.sun.star.beans import PropertyValue
+
+        def prop(name, value):
+            p = PropertyValue()
+            p.Name = name
+            p.Value = value
+            return p
+
+        document = self.desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(input_path), '_blank', 0, (prop('Hidden', True), prop('ReadOnly', True)))
+        if document is None:
+            raise OfficeError("LibreOffice 无法打开文件")
+        try:
+            document.storeToURL(uno.systemPathToFileUrl(output_path), (prop('FilterName', filter_name),))
+        finally:
+            document.close(True)
+
+    def convert_with_cli(self, input_path, output_path):
+        """调用 soffice --convert-to 转换，输出到临时目录后移动到输出路径"""
+        out_dir = tempfile.mkdtemp(prefix='anyfiletopdf_out_', dir=self.profile_dir)
+        try:
+            subprocess.run([self.soffice, soffice_profile(self.profile_dir), '--headless', '--norestore',
+                            '--convert-to', 'pdf', '--outdir', out_dir, input_path],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+            results = glob.glob(os.path.join(out_dir, '*.pdf'))
+            if not results:
+                raise OfficeError("LibreOffice 没有生成PDF")
+            shutil.move(results[0], output_path)
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+    def close(self):
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+class StubServer:
+    """测试用的转换后端：为每个文件生成一页说明PDF"""
+
+    def __init__(self):
+        self.delay = float(os.environ.get(STUB_DELAY_ENV, '0'))
+
+    def convert(self, input_path, output_path):
+        from reportlab.pdfgen import canvas
+        time.sleep(self.delay)
+        pdf = canvas.Canvas(output_path)
+        pdf.drawString(72, 770, f"stub office backend: {os.path.basename(input_path)}")
+        pdf.save()
+
+    def close(self):
+        pass
+
+
+def watch_parent(parent_pid):
+    """辅助进程的监视线程：启动它的进程退出（如被看门狗终止）后终止辅助进程及其 LibreOffice"""
+    while os.getppid() == parent_pid:
+        time.sleep(1)
+    if sys.platform != 'win32':
+        try:
+            os.killpg(os.getpgid(0), signal.SIGKILL)
+        except OSError:
+            pass
+    os._exit(1)
+
+
+def serve(backend, conn, soffice=None):
+    """辅助进程主循环：逐个接收请求并转换，收到None或管道关闭时退出"""
+    if sys.platform != 'win32':
+        # 成为进程组组长，超时时连同启动的 LibreOffice 一起终止
+        os.setpgrp()
+    threading.Thread(target=watch_parent, args=(os.getppid(),), daemon=True).start()
+    try:
+        server = StubServer() if backend == 'stub' else SofficeServer(soffice)
+    except Exception as e:
+        conn.send({'ready': False, 'error': str(e)})
+        return
+    conn.send({'ready': True})
+    try:
+        while True:
+            try:
+                request = conn.recv()
+            except EOFError:
+                break
+            if request is None:
+                break
+            try:
+                server.convert(request['input'], request['output'])
+                conn.send({'ok': True})
+            except Exception as e:
+                conn.send({'ok': False, 'error': str(e)})
+    finally:
+        server.close()
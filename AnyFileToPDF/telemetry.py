@@ -0,0 +1,239 @@
+import os
+import time
+import heapq
+import shutil
+import cProfile
+import functools
+
+# 转换的各个阶段（报告中的键 -> 日志中的名称），不属于任何阶段的耗时计为 other
+STAGE_NAMES = {
+    'read': '读取',
+    'detect': '编码检测',
+    'clean': '文本清理',
+    'flowables': '生成排版元素',
+    'build': '排版',
+    'write': '写入',
+    'image': '图片处理',
+    'office': 'LibreOffice转换',
+    'other': '其他',
+}
+# 转换结束时列出（以及保留性能分析结果）的最慢文件数
+SLOWEST_FILES = 10
+# 最慢文件的性能分析结果保存在 outputsPDF 下的此目录中
+PROFILE_DIR = 'profiles'
+
+
+class _Stage:
+    """StageTimer.stage 返回的计时上下文"""
+    __slots__ = ('timer', 'name')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.timer.enter(self.name)
+
+    def __exit__(self, *exc):
+        self.timer.exit()
+
+
+class StageTimer:
+    """按阶段累计单个文件的转换耗时
+
+    阶段可以嵌套（例如排版时按需生成段落，生成段落时清理文本），耗时只计入最内层的阶段，
+    各阶段的耗时之和不超过文件的总耗时。
+    """
+
+    def __init__(self):
+        self.totals = {}  # 阶段 -> 累计秒数
+        self.stack = []
+        self.started = 0.0
+        self.stages = {}
+
+    def reset(self):
+        """开始记录一个新文件"""
+        self.totals = {}
+        self.stack = []
+
+    def stage(self, name):
+        """返回计时上下文：with timer.stage('read'): ..."""
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = _Stage(self, name)
+        return stage
+
+    def enter(self, name):
+        now = time.perf_counter()
+        if self.stack:
+            # 暂停外层阶段
+            parent = self.stack[-1]
+            self.totals[parent] = self.totals.get(parent, 0.0) + now - self.started
+        self.stack.append(name)
+        self.started = now
+
+    def exit(self):
+        now = time.perf_counter()
+        name = self.stack.pop()
+        self.totals[name] = self.totals.get(name, 0.0) + now - self.started
+        self.started = now
+
+    def iterate(self, iterable, name):
+        """逐个生成元素，取出每个元素的耗时计入 name 阶段"""
+        iterator = iter(iterable)
+        while True:
+            self.enter(name)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.exit()
+            yield item
+
+    def stages_ms(self):
+        """各阶段的耗时（毫秒）"""
+        return {name: round(seconds * 1000, 2) for name, seconds in self.totals.items()}
+
+
+def timed(name):
+    """方法装饰器：调用耗时计入转换器 timer 的 name 阶段"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.timer.stage(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class ProfileKeeper:
+    """保存当前进程中最慢的若干个文件的 cProfile 结果
+
+    每个文件转换时都启用性能分析，只有进入本进程最慢的 keep 个文件时才写入磁盘，
+    被更慢的文件挤出的结果随即删除。全部进程中最慢的文件一定在各进程保留的结果中，
+    由 RunTelemetry.collect_profiles 在转换结束后挑选。
+    """
+
+    def __init__(self, directory, keep=SLOWEST_FILES):
+        self.directory = directory
+        self.keep = keep
+        self.heap = []  # (耗时, 文件路径)
+        self.count = 0
+
+    def start(self):
+        """开始分析一个文件，已有其他分析器在运行时返回None"""
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            return None
+        return profiler
+
+    def offer(self, profiler, elapsed):
+        """停止分析，文件属于本进程最慢的文件时保存结果并返回其路径，否则返回None"""
+        profiler.disable()
+        if len(self.heap) >= self.keep and elapsed <= self.heap[0][0]:
+            return None
+        self.count += 1
+        path = os.path.join(self.directory, f"{os.getpid()}_{self.count}.prof")
+        try:
+            profiler.dump_stats(path)
+        except OSError:
+            return None
+        heapq.heappush(self.heap, (elapsed, path))
+        if len(self.heap) > self.keep:
+            _, evicted = heapq.heappop(self.heap)
+            try:
+                os.remove(evicted)
+            except OSError:
+                pass
+        return path
+
+
+class RunTelemetry:
+    """汇总一次批量转换中每个文件的耗时、各阶段耗时、输入输出字节数和页数"""
+
+    def __init__(self, slowest=SLOWEST_FILES):
+        self.started = time.perf_counter()
+        self.slowest = slowest
+        self.files = 0
+        self.total_ms = 0.0
+        self.stages_ms = {}
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.pages = 0
+        self.heap = []  # (耗时, 序号, 文件记录)，只保留最慢的 slowest 个
+
+    def add(self, rel_path, status, info):
+        """记录一个文件的转换信息（PDFConverter.file_info），没有计时信息的结果（如缓存命中）不计入"""
+        if 'total_ms' not in info:
+            return
+        self.files += 1
+        self.total_ms += info['total_ms']
+        self.input_bytes += info.get('input_bytes', 0)
+        self.output_bytes += info.get('output_bytes', 0)
+        self.pages += info.get('pages', 0)
+        stages = dict(info.get('stages_ms', {}))
+        stages['other'] = round(max(0.0, info['total_ms'] - sum(stages.values())), 2)
+        for name, ms in stages.items():
+            self.stages_ms[name] = self.stages_ms.get(name, 0.0) + ms
+
+        if len(self.heap) < self.slowest or info['total_ms'] > self.heap[0][0]:
+            record = {'path': rel_path, 'status': status, 'total_ms': info['total_ms'],
+                      'stages_ms': stages, 'input_bytes': info.get('input_bytes', 0),
+                      'output_bytes': info.get('output_bytes', 0), 'pages': info.get('pages', 0)}
+            if info.get('profile'):
+                record['profile'] = info['profile']
+            item = (info['total_ms'], self.files, record)
+            if len(self.heap) < self.slowest:
+                heapq.heappush(self.heap, item)
+            else:
+                heapq.heapreplace(self.heap, item)
+
+    def slowest_files(self):
+        """最慢的文件记录，按耗时从长到短排列"""
+        return [record for _, _, record in sorted(self.heap, key=lambda item: item[0], reverse=True)]
+
+    def collect_profiles(self, target_dir):
+        """将最慢文件的性能分析结果移到 target_dir，按排名命名"""
+        os.makedirs(target_dir, exist_ok=True)
+        # 删除上次转换的结果
+        for name in os.listdir(target_dir):
+            if name.endswith('.prof'):
+                os.remove(os.path.join(target_dir, name))
+        for rank, (_, _, record) in enumerate(sorted(self.heap, key=lambda item: item[0], reverse=True), 1):
+            path = record.pop('profile', None)
+            if path and os.path.exists(path):
+                name = f"{rank:02d}_{os.path.basename(record['path'])}.prof"
+                shutil.move(path, os.path.join(target_dir, name))
+                record['profile'] = os.path.join(PROFILE_DIR, name)
+
+    def summary(self):
+        """写入转换报告的统计信息"""
+        return {'seconds': round(time.perf_counter() - self.started, 2),
+                'files': self.files,
+                'total_ms': round(self.total_ms, 2),
+                'stages_ms': {name: round(ms, 2) for name, ms in self.stages_ms.items()},
+                'input_bytes': self.input_bytes,
+                'output_bytes': self.output_bytes,
+                'pages': self.pages,
+                'slowest': self.slowest_files()}
+
+    def format_lines(self):
+        """转换结束时输出的耗时汇总和最慢文件列表"""
+        if not self.files:
+            return []
+        lines = [f"转换耗时 {time.perf_counter() - self.started:.1f} 秒：读取 {self.input_bytes / 1024 / 1024:.1f}MB，"
+                 f"输出 {self.output_bytes / 1024 / 1024:.1f}MB，共 {self.pages} 页"]
+        stages = sorted(self.stages_ms.items(), key=lambda item: item[1], reverse=True)
+        total = self.total_ms or 1
+        # 占比不到0.5%的阶段不列出
+        lines.append("各阶段耗时：" + "，".join(
+            f"{STAGE_NAMES.get(name, name)} {ms / 1000:.2f}s（{ms / total:.0%}）" for name, ms in stages if ms / total >= 0.005))
+        lines.append(f"最慢的 {len(self.heap)} 个文件：")
+        for record in self.slowest_files():
+            stages = sorted(record['stages_ms'].items(), key=lambda item: item[1], reverse=True)[:3]
+            detail = "，".join(f"{STAGE_NAMES.get(name, name)} {ms:.0f}ms" for name, ms in stages if ms >= 0.5)
+            lines.append(f"  {record['path']}: {record['total_ms']:.0f}ms" + (f"（{detail}）" if detail else ''))
+        return lines
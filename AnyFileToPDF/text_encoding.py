@@ -0,0 +1,109 @@
+import os
+import codecs
+
+# 每个采样窗口的大小，分别取文件开头、中间和结尾
+SAMPLE_WINDOW = 32 * 1024
+# chardet 结果的最低可信度
+CHARDET_CONFIDENCE = 0.7
+# 检测失败时依次尝试的编码（gb2312 和 ascii 分别是 gbk 和 utf-8 的子集，无需单独尝试）
+FALLBACK_ENCODINGS = ['utf-8', 'gbk', 'gb18030', 'big5']
+
+# UTF-32 的BOM以UTF-16的BOM开头，需要先判断
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+
+def sniff_bom(data):
+    """根据BOM判断编码，没有BOM时返回None"""
+    for bom, encoding in BOMS:
+        if data.startswith(bom):
+            return encoding
+    return None
+
+
+def sample_windows(raw_data, window=SAMPLE_WINDOW):
+    """从内存中的数据取开头、中间和结尾的采样窗口"""
+    if len(raw_data) <= window * 3:
+        return [raw_data]
+    middle = len(raw_data) // 2
+    return [raw_data[:window], raw_data[middle:middle + window], raw_data[-window:]]
+
+
+def read_windows(file_path, window=SAMPLE_WINDOW):
+    """从文件中读取开头、中间和结尾的采样窗口，不读取整个文件"""
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        if size <= window * 3:
+            return [f.read()]
+        windows = [f.read(window)]
+        for offset in (size // 2, size - window):
+            f.seek(offset)
+            windows.append(f.read(window))
+        return windows
+
+
+def decodes(windows, encoding):
+    """判断采样窗口能否用指定编码解码"""
+    for index, window in enumerate(windows):
+        # 中间和结尾的窗口可能从多字节字符中间开始，允许跳过开头的几个字节
+        offsets = (0,) if index == 0 else (0, 1, 2, 3)
+        for offset in offsets:
+            try:
+                # 窗口末尾可能截断多字节字符，使用增量解码器容忍不完整的结尾
+                codecs.getincrementaldecoder(encoding)().decode(window[offset:], final=False)
+                break
+            except (UnicodeDecodeError, LookupError):
+                continue
+        else:
+            return False
+    return True
+
+
+class EncodingDetector:
+    """快速编码检测
+
+    依次使用BOM、UTF-8有效性检查、同目录文件的编码缓存和对采样窗口运行
+    chardet 进行检测，避免对整个文件运行 chardet。
+    """
+
+    def __init__(self):
+        # 目录 -> 该目录中上一个文件检测出的编码
+        self.directory_cache = {}
+
+    def detect(self, file_path, raw_data=None):
+        """检测文件编码，返回 (编码, 检测方式)，无法确定时编码为None"""
+        if raw_data is not None:
+            windows = sample_windows(raw_data)
+        else:
+            windows = read_windows(file_path)
+
+        encoding = sniff_bom(windows[0])
+        if encoding:
+            return encoding, 'BOM'
+
+        # UTF-8 的检查很严格，先于缓存判断，避免宽松的GBK等编码误解码UTF-8文件
+        if decodes(windows, 'utf-8'):
+            return 'utf-8', 'UTF-8检查'
+
+        directory = os.path.dirname(os.path.abspath(file_path))
+        cached = self.directory_cache.get(directory)
+        if cached and decodes(windows, cached):
+            return cached, '目录缓存'
+
+        # chardet 导入较慢，大多数文件在前面的步骤就能确定编码，需要时才导入
+        import chardet
+        method = 'chardet'
+        result = chardet.detect(b''.join(windows))
+        encoding = result['encoding'] if result['confidence'] > CHARDET_CONFIDENCE else None
+        if not encoding or not decodes(windows, encoding):
+            method = '回退'
+            encoding = next((enc for enc in FALLBACK_ENCODINGS if decodes(windows, enc)), None)
+
+        if encoding:
+            self.directory_cache[directory] = encoding
+        return encoding, method
@@ -1,12 +1,20 @@
 import os
 import logging
+import hashlib
+import re
 from pathlib import Path
 
+# 可以作为图片转换的扩展名
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp')
+
+# 日志格式
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
 def setup_logging(log_file='conversion.log'):
     """设置日志配置"""
     logging.basicConfig(
         level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        format=LOG_FORMAT,
         handlers=[
             logging.FileHandler(log_file),
             logging.StreamHandler()
@@ -14,6 +22,10 @@ def setup_logging(log_file='conversion.log'):
     )
     return logging.getLogger(__name__)
 
+def setup_worker_logging(level):
+    """在工作进程中使用与主进程相同的日志级别（spawn 启动的进程不继承主进程的日志配置）"""
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+
 def ensure_dir(directory):
     """确保目录存在，如果不存在则创建"""
     Path(directory).mkdir(parents=True, exist_ok=True)
@@ -28,4 +40,44 @@ def is_hidden_file(file_path):
 
 def get_safe_filename(filename):
     """获取安全的文件名"""
-    return "".join([c for c in filename if c.isalpha() or c.isdigit() or c in (' ', '-', '_', '.')]).rstrip() 
\ No newline at end of file
+    return "".join([c for c in filename if c.isalpha() or c.isdigit() or c in (' ', '-', '_', '.')]).rstrip() 
+
+def hash_file(file_path, chunk_size=1024 * 1024):
+    """计算文件内容的SHA-256哈希值"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def output_volumes(output_path):
+    """返回输出PDF及其已存在的分卷（xxx.part2.pdf 等）的路径列表"""
+    base, ext = os.path.splitext(output_path)
+    paths = [output_path]
+    volume = 2
+    while os.path.exists(f"{base}.part{volume}{ext}"):
+        paths.append(f"{base}.part{volume}{ext}")
+        volume += 1
+    return paths
+
+def count_pdf_pages(file_path, chunk_size=1024 * 1024):
+    """统计PDF页数：匹配未压缩的页面字典，支持 ReportLab 的 "/Type /Page" 和 LibreOffice 的 "/Type/Page" 写法"""
+    # 页面对象在对象流中压缩存储的PDF无法这样统计，本程序转换和合并得到的PDF都不使用对象流
+    pattern = re.compile(rb'/Type\s{0,16}/Page(?!s)')
+    # 每块只统计起始位置在末尾 overlap 字节之前的匹配，末尾的数据留到下一块，
+    # 跨块的匹配不会遗漏也不会重复计数，且判断 "/Pages" 时总能看到下一个字节
+    overlap = 32
+    pages = 0
+    tail = b''
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            data = tail + chunk
+            limit = max(0, len(data) - overlap)
+            pages += sum(1 for match in pattern.finditer(data) if match.start() < limit)
+            tail = data[limit:]
+    pages += len(pattern.findall(tail))
+    return pages
+
+def natural_sort_key(name):
+    """自然排序的键：数字部分按数值比较，使 img2 排在 img10 之前"""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', name)]
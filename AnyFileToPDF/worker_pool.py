@@ -0,0 +1,257 @@
+import os
+import sys
+import time
+import signal
+import logging
+import subprocess
+import threading
+import multiprocessing
+from multiprocessing.connection import wait
+
+# 单个文件的默认基础转换时间上限（秒）和工作进程的默认内存上限（MB），为0时不限制
+FILE_TIMEOUT = 600
+# 时间上限按输入大小增加：每MB另加的秒数（流式转换大文本约需8秒/MB，留出数倍余量）
+FILE_TIMEOUT_PER_MB = 30
+FILE_MEMORY_MB = 2048
+# 工作进程内存超过上限时的退出码
+MEMORY_EXIT_CODE = 86
+# 工作进程检查内存占用的间隔（秒）
+MEMORY_CHECK_INTERVAL = 0.25
+
+
+def current_rss_mb():
+    """当前进程的常驻内存（MB），不支持的平台返回None"""
+    try:
+        if sys.platform.startswith('linux'):
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+        if sys.platform == 'win32':
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                            ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                            ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize / 1024 / 1024
+            return None
+        # macOS 只能取得峰值内存（字节）
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 / 1024
+    except (OSError, ValueError, ImportError, AttributeError):
+        return None
+
+
+def _watch_memory(limit_mb):
+    """工作进程中的监视线程：内存超过上限时立即退出进程"""
+    while True:
+        rss = current_rss_mb()
+        if rss is not None and rss > limit_mb:
+            os._exit(MEMORY_EXIT_CODE)
+        time.sleep(MEMORY_CHECK_INTERVAL)
+
+
+def _supervised_worker(options, conn, memory_limit_mb, cache, hash_inputs, log_level):
+    """工作进程主循环：逐个接收 (任务, 可用于排版工作表的进程数) 并返回结果，收到None时退出"""
+    from utils import setup_worker_logging
+    setup_worker_logging(log_level)
+    from converter import PDFConverter
+    from batch import convert_task
+    from office_backend import watch_parent
+    if sys.platform != 'win32':
+        # 成为进程组组长，终止工作进程时一并终止它启动的工作表排版进程
+        os.setpgrp()
+    # 主进程退出后终止工作进程（及其进程组）
+    threading.Thread(target=watch_parent, args=(os.getppid(),), daemon=True).start()
+    if memory_limit_mb:
+        threading.Thread(target=_watch_memory, args=(memory_limit_mb,), daemon=True).start()
+    converter = PDFConverter(**options)
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        task, converter.sheet_worker_limit = message
+        conn.send(convert_task(converter, task, cache, hash_inputs))
+
+
+class SupervisedWorker:
+    """一个工作进程及其正在转换的任务"""
+
+    def __init__(self, ctx, options, memory_limit_mb, cache=None, hash_inputs=False, log_level=logging.WARNING):
+        self.conn, child_conn = ctx.Pipe()
+        # 不使用守护进程，使工作进程可以启动并行排版工作表的子进程；
+        # 工作进程在主进程退出后自行退出，终止时连同其进程组一起终止
+        self.process = ctx.Process(target=_supervised_worker,
+                                   args=(options, child_conn, memory_limit_mb, cache, hash_inputs, log_level))
+        self.process.start()
+        child_conn.close()
+        self.task = None
+        self.started = None
+        self.time_limit = 0
+
+    def submit(self, task, time_limit=0, sheet_workers=1):
+        self.task = task
+        self.started = time.monotonic()
+        self.time_limit = time_limit
+        self.conn.send((task, sheet_workers))
+
+    def kill(self):
+        """终止工作进程及其启动的子进程"""
+        try:
+            if sys.platform == 'win32':
+                if self.process.is_alive():
+                    subprocess.run(['taskkill', '/F', '/T', '/PID', str(self.process.pid)],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            else:
+                # 工作进程已退出（如内存超限）时其子进程仍在原进程组中
+                os.killpg(self.process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.kill()
+
+
+class SupervisedPool:
+    """带看门狗的工作进程池
+
+    每个工作进程同时只转换一个文件。转换超过时间上限或工作进程内存超过上限时终止该进程，
+    将该文件记录为失败并启动新的工作进程继续转换其余文件；工作进程异常退出时同样处理。
+    每个文件的时间上限为 time_limit 加上输入每MB FILE_TIMEOUT_PER_MB 秒，
+    size_of（输入路径 -> 字节数）未传入时读取文件大小。
+    传入 cache（ConversionCache）时工作进程在转换前查找转换缓存，转换成功后写入缓存；
+    hash_inputs 为True时工作进程计算输入文件的内容哈希并随结果返回（增量转换清单使用）。
+    分发任务时将其他工作进程用不到的CPU核心数告知工作进程，供并行排版电子表格的工作表使用，
+    批量转换接近结束、只剩少数文件时大型电子表格仍可并行排版。
+    工作进程使用创建进程池时主进程的日志级别。
+    """
+
+    def __init__(self, workers, options, time_limit=FILE_TIMEOUT, memory_limit_mb=FILE_MEMORY_MB,
+                 size_of=None, cache=None, hash_inputs=False):
+        self.logger = logging.getLogger(__name__)
+        # 使用spawn方式启动进程，避免在GUI线程中fork
+        self.ctx = multiprocessing.get_context('spawn')
+        self.size = workers
+        self.options = options
+        self.time_limit = time_limit
+        self.memory_limit_mb = memory_limit_mb
+        self.size_of = size_of
+        self.cache = cache
+        self.hash_inputs = hash_inputs
+        self.log_level = logging.getLogger().getEffectiveLevel()
+        self.cpu_count = os.cpu_count() or 1
+        self.workers = []
+
+    def start_worker(self):
+        worker = SupervisedWorker(self.ctx, self.options, self.memory_limit_mb, self.cache, self.hash_inputs,
+                                  self.log_level)
+        self.workers.append(worker)
+        return worker
+
+    def task_time_limit(self, task):
+        """单个任务的转换时间上限（秒），为0时不限制"""
+        if not self.time_limit:
+            return 0
+        if self.size_of is not None:
+            size = self.size_of(task[0])
+        else:
+            try:
+                size = os.path.getsize(task[0])
+            except OSError:
+                size = 0
+        return self.time_limit + size / 1024 / 1024 * FILE_TIMEOUT_PER_MB
+
+    def replace(self, worker):
+        """终止工作进程，返回其正在转换的任务"""
+        task = worker.task
+        worker.kill()
+        self.workers.remove(worker)
+        return task
+
+    def run(self, tasks, cancelled):
+        """转换所有任务，按完成顺序生成 (相对路径, 状态, 错误信息, 转换信息)
+
+        cancelled() 返回True时不再分发新任务，生成已完成的结果后终止所有工作进程。
+        """
+        pending = list(reversed(tasks))
+        idle = [self.start_worker() for _ in range(min(self.size, len(tasks)))]
+        busy = []
+        while pending or busy:
+            if cancelled():
+                for worker in list(busy):
+                    if worker.conn.poll():
+                        busy.remove(worker)
+                        yield worker.conn.recv()
+                return
+            while pending and idle:
+                worker = idle.pop()
+                task = pending.pop()
+                # 其他正在转换以及即将分发任务的工作进程各占一个核心
+                sheet_workers = max(1, self.cpu_count - len(busy) - min(len(pending), len(idle)))
+                worker.submit(task, self.task_time_limit(task), sheet_workers)
+                busy.append(worker)
+
+            ready = wait([w.conn for w in busy] + [w.process.sentinel for w in busy], timeout=0.2)
+            now = time.monotonic()
+            for worker in list(busy):
+                result = None
+                if worker.conn in ready or worker.process.sentinel in ready:
+                    try:
+                        if worker.conn.poll():
+                            result = worker.conn.recv()
+                    except (EOFError, OSError):
+                        pass
+                    if result is not None:
+                        busy.remove(worker)
+                        worker.task = None
+                        idle.append(worker)
+                        yield result
+                        continue
+                    if worker.process.is_alive():
+                        continue
+                    # 工作进程在返回结果前退出
+                    exitcode = worker.process.exitcode
+                    busy.remove(worker)
+                    rel_path = self.replace(worker)[2]
+                    if exitcode == MEMORY_EXIT_CODE:
+                        yield rel_path, 'memory', f"内存占用超过 {self.memory_limit_mb}MB", {}
+                    else:
+                        yield rel_path, 'crashed', f"工作进程异常退出（退出码 {exitcode}）", {}
+                elif worker.time_limit and now - worker.started > worker.time_limit:
+                    busy.remove(worker)
+                    time_limit = worker.time_limit
+                    rel_path = self.replace(worker)[2]
+                    yield rel_path, 'timeout', f"转换超过 {time_limit:.0f} 秒", {}
+                else:
+                    continue
+                if pending:
+                    idle.append(self.start_worker())
+
+    def close(self, terminate=False):
+        """关闭所有工作进程，terminate 为True时直接终止"""
+        for worker in self.workers:
+            if terminate or worker.task is not None:
+                worker.kill()
+            else:
+                worker.close()
+        self.workers = []
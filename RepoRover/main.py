@@ -2,9 +2,9 @@
 import sys
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                            QHBoxLayout, QLabel, QLineEdit, QPushButton, 
-                           QTextEdit, QFileDialog, QProgressBar, QMessageBox,
-                           QCheckBox)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+                           QFileDialog, QProgressBar, QMessageBox,
+                           QCheckBox, QPlainTextEdit)
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QObject, QTimer
 import os
 from github import Github
 from github import RateLimitExceededException, UnknownObjectException, GithubException
@@ -17,6 +17,108 @@ import time
 from datetime import datetime
 import json
 import base64
+import tempfile
+
+class LogChannel(QObject):
+    """
+    日志和进度的缓冲通道
+    下载线程直接调用 log 和 set_progress，消息先放入缓冲区，由界面线程按固定间隔
+    一次性追加到日志窗口，进度只显示最新的值；日志窗口最多保留 MAX_LINES 行，
+    完整日志在 log 时写入日志文件，日志文件可在任意线程中关闭
+    """
+    # 刷新界面的间隔（毫秒）
+    FLUSH_INTERVAL_MS = 100
+    # 日志窗口保留的最大行数
+    MAX_LINES = 5000
+
+    def __init__(self, log_widget, progress_label, progress_bar, parent=None):
+        """
+        初始化缓冲通道并启动刷新定时器
+        :param log_widget: 日志窗口（QPlainTextEdit）
+        :param progress_label: 进度标签
+        :param progress_bar: 进度条
+        """
+        super().__init__(parent)
+        self.log_widget = log_widget
+        self.log_widget.setMaximumBlockCount(self.MAX_LINES)
+        self.progress_label = progress_label
+        self.progress_bar = progress_bar
+        self.lock = threading.Lock()
+        self.pending = []  # 尚未显示的消息
+        self.progress = None  # 尚未显示的最新进度 (当前, 总数)
+        self.log_file = None
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.flush)
+        self.timer.start(self.FLUSH_INTERVAL_MS)
+
+    def log(self, message):
+        """
+        添加一条日志消息，可在任意线程中调用
+        :param message: 日志消息
+        """
+        with self.lock:
+            self.pending.append(message)
+            if self.log_file is not None:
+                self.log_file.write(message + '\n')
+
+    def set_progress(self, current, total):
+        """
+        记录最新进度，可在任意线程中调用
+        :param current: 当前进度
+        :param total: 总数
+        """
+        self.progress = (current, total)
+
+    def open_log_file(self, path):
+        """
+        将之后的完整日志写入文件
+        :param path: 日志文件路径
+        """
+        with self.lock:
+            self.close_file()
+            try:
+                self.log_file = open(path, 'w', encoding='utf-8')
+            except OSError as e:
+                self.pending.append(f"无法创建日志文件 {path}: {str(e)}")
+
+    def close_log_file(self):
+        """
+        关闭日志文件，可在任意线程中调用，未显示的消息仍由定时器显示
+        """
+        with self.lock:
+            self.close_file()
+
+    def close_file(self):
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+
+    def clear(self):
+        """
+        清空日志窗口以及未显示的消息和进度
+        """
+        with self.lock:
+            self.pending = []
+            self.progress = None
+        self.log_widget.clear()
+
+    def flush(self):
+        """
+        将缓冲的消息一次性追加到日志窗口并更新进度（在界面线程中调用）
+        """
+        with self.lock:
+            messages, self.pending = self.pending, []
+            progress, self.progress = self.progress, None
+            if messages and self.log_file is not None:
+                self.log_file.flush()
+        if messages:
+            # 超出日志窗口容量的消息只写入日志文件
+            self.log_widget.appendPlainText('\n'.join(messages[-self.MAX_LINES:]))
+        if progress is not None:
+            current, total = progress
+            self.progress_label.setText(f"下载进度: {current}/{total}")
+            if total > 0:
+                self.progress_bar.setValue(int(current * 100 / total))
 
 class DownloadThread(QThread):
     """
@@ -69,19 +171,14 @@ class DownloadThread(QThread):
         filename = filename.strip()
         patterns = [p.strip() for p in patterns if p and p.strip()]
         
-        self.log_signal.emit(f"检查文件: {filename}")
-        self.log_signal.emit(f"匹配模式: {patterns}")
-        
         for pattern in patterns:
             # 1. 完整文件名匹配
             if pattern == filename:
-                self.log_signal.emit(f"✓ 完整文件名匹配: {filename} == {pattern}")
                 return True
                 
             # 2. 以点号开头的模式（作为文件扩展名）
             if pattern.startswith('.'):
                 if filename.lower().endswith(pattern.lower()):
-                    self.log_signal.emit(f"✓ 扩展名匹配: {filename} 以 {pattern} 结尾")
                     return True
                     
             # 3. 不以点号开头的模式
@@ -89,15 +186,11 @@ class DownloadThread(QThread):
                 # 如果模式包含点号，作为完整文件名匹配
                 if '.' in pattern:
                     if filename.lower() == pattern.lower():
-                        self.log_signal.emit(f"✓ 完整文件名匹配（不区分大小写）: {filename} == {pattern}")
                         return True
                 # 否则作为扩展名匹配（自动添加点号）
                 else:
                     if filename.lower().endswith(f".{pattern.lower()}"):
-                        self.log_signal.emit(f"✓ 扩展名匹配（添加点号）: {filename} 以 .{pattern} 结尾")
                         return True
-        
-        self.log_signal.emit(f"✗ 文件 {filename} 不匹配任何模式")
         return False
 
     def parse_file_path(self, href):
@@ -236,14 +329,8 @@ class DownloadThread(QThread):
                     blob_index = parts.index('blob')
                     file_path = '/'.join(parts[blob_index + 2:])
                     
-                    self.log_signal.emit(f"\n发现文件:")
-                    self.log_signal.emit(f"- 名称: {file_name}")
-                    self.log_signal.emit(f"- 路径: {file_path}")
-                    
                     if self.is_file_match(file_name, self.suffixes):
                         raw_url = f"https://raw.githubusercontent.com{href.replace('/blob/', '/')}"
-                        self.log_signal.emit(f"找到匹配文件!")
-                        self.log_signal.emit(f"- 下载URL: {raw_url}")
                         
                         files.append({
                             'name': file_name,
@@ -673,10 +760,12 @@ class MainWindow(QMainWindow):
         
         # 日志显示
         log_label = QLabel("下载日志:")
-        self.log_text = QTextEdit()
+        self.log_text = QPlainTextEdit()
         self.log_text.setReadOnly(True)
         layout.addWidget(log_label)
         layout.addWidget(self.log_text)
+        # 日志和进度经缓冲后按固定间隔刷新到界面
+        self.log_channel = LogChannel(self.log_text, self.progress_label, self.progress_bar, self)
         
         # 下载模式选择
         mode_layout = QHBoxLayout()
@@ -704,17 +793,7 @@ class MainWindow(QMainWindow):
         添加日志消息到日志窗口
         :param message: 日志消息
         """
-        self.log_text.append(message)
-
-    def update_progress(self, current, total):
-        """
-        更新进度条和进度标签
-        :param current: 当前进度
-        :param total: 总数
-        """
-        self.progress_label.setText(f"下载进度: {current}/{total}")
-        if total > 0:
-            self.progress_bar.setValue(int(current * 100 / total))
+        self.log_channel.log(message)
 
     def validate_inputs(self):
         """
@@ -764,13 +843,22 @@ class MainWindow(QMainWindow):
         # 重置进度
         self.progress_bar.setValue(0)
         self.progress_label.setText("下载进度: 0/0")
-        self.log_text.clear()
+        self.log_channel.clear()
+        # 完整日志写入临时目录，日志窗口只保留最近的消息
+        log_path = os.path.join(tempfile.gettempdir(), f"RepoRover_{datetime.now():%Y%m%d_%H%M%S}.log")
+        self.log_channel.open_log_file(log_path)
+        self.log_message(f"完整日志: {log_path}")
         
         # 创建并启动下载线程
+        # 日志和进度信号直接写入缓冲通道，不为每条消息向界面线程发送事件
+        # 错误信息同时写入日志，日志文件在下载线程结束前关闭（包括出错的情况）
         self.download_thread = DownloadThread(url, suffixes, output_path, token, use_api)
-        self.download_thread.progress_signal.connect(self.update_progress)
-        self.download_thread.log_signal.connect(self.log_message)
+        self.download_thread.progress_signal.connect(self.log_channel.set_progress, Qt.DirectConnection)
+        self.download_thread.log_signal.connect(self.log_channel.log, Qt.DirectConnection)
+        self.download_thread.error_signal.connect(
+            lambda title, message: self.log_channel.log(f"{title}: {message}"), Qt.DirectConnection)
         self.download_thread.error_signal.connect(self.show_error)
+        self.download_thread.finished_signal.connect(self.log_channel.close_log_file, Qt.DirectConnection)
         self.download_thread.finished_signal.connect(self.download_finished)
         
         self.start_button.setEnabled(False)
@@ -790,6 +878,17 @@ class MainWindow(QMainWindow):
         """
         self.start_button.setEnabled(True)
 
+    def closeEvent(self, event):
+        """
+        关闭窗口时停止下载线程并关闭日志文件
+        :param event: 关闭事件
+        """
+        if self.download_thread and self.download_thread.isRunning():
+            self.download_thread.stop()
+            self.download_thread.wait()
+        self.log_channel.close_log_file()
+        super().closeEvent(event)
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = MainWindow()